@@ -6,7 +6,7 @@ from re import A
 from threading import Thread
 import time
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from backend.exceptions.EnvironmentalVariableNotFoundError import (
     EnvironmentalVariableNotFoundError,
 )
@@ -26,6 +26,9 @@ from backend.specialized_databases.SpecializedDatabasePersistenceService import
 from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
     TimeseriesPersistenceService,
 )
+from backend.specialized_databases.timeseries.TimeseriesQueryCache import (
+    TimeseriesQueryCache,
+)
 from graph_domain.expert_annotations.AnnotationInstanceNode import (
     AnnotationInstanceNodeFlat,
 )
@@ -86,25 +89,27 @@ class AnnotationDetector(abc.ABC):
         self.annotations_dao: AnnotationNodesDao = AnnotationNodesDao.instance()
         self.persistence_services = persistence_services
 
-        # Get original timeseries excerpt:
+        # Get original timeseries excerpt (one query per database for all time-series):
         self.original_ts_dataframes: Dict[str, pd.DataFrame] = dict()
-        for ts_iri in self.scanned_timeseries_iris.keys():
-            service: TimeseriesPersistenceService = self.persistence_services.get(
-                ts_iri
-            )
-            dataframe = service.read_period_to_dataframe(
-                iri=ts_iri,
+        for service, ts_iris in self._group_iris_by_persistence_service(
+            list(self.scanned_timeseries_iris.keys())
+        ):
+            # The annotated excerpt is historical: cached for detector restarts
+            dataframes = TimeseriesQueryCache.instance().read_periods_to_dataframes(
+                service=service,
+                iris=ts_iris,
                 begin_time=self.scanned_annotation_instance.occurance_start_date_time,
                 end_time=self.scanned_annotation_instance.occurance_end_date_time,
             )
 
-            # Convert bools to integers to allow comparison
-            if len(dataframe["value"]) > 0 and isinstance(
-                dataframe["value"][0], np.bool_
-            ):
-                dataframe["value"] = dataframe["value"].astype(int)
+            for ts_iri, dataframe in dataframes.items():
+                # Convert bools to integers to allow comparison
+                if len(dataframe["value"]) > 0 and isinstance(
+                    dataframe["value"][0], np.bool_
+                ):
+                    dataframe["value"] = dataframe["value"].astype(int)
 
-            self.original_ts_dataframes[ts_iri] = dataframe
+                self.original_ts_dataframes[ts_iri] = dataframe
 
         # Detection precision
         self.scanned_timeseries_detection_precisions_relative: Dict[str, float] = dict()
@@ -118,18 +123,26 @@ class AnnotationDetector(abc.ABC):
                 ts_iri
             ] = matcher.detection_precision
 
-        # Min max
+        # Min max (one query per database for all time-series)
+        timeseries_statistics: Dict[str, Dict] = dict()
+        for service, ts_iris in self._group_iris_by_persistence_service(
+            list(self.scanned_timeseries_iris.keys())
+        ):
+            statistics = service.period_statistics_for_iris(iris=ts_iris)
+            if statistics is not None:
+                timeseries_statistics.update(statistics)
+
         self.timeseries_min_values_for_original: Dict[str, float] = dict()
         self.timeseries_min_values_for_scanned: Dict[str, float] = dict()
         self.timeseries_max_values_for_original: Dict[str, float] = dict()
         self.timeseries_max_values_for_scanned: Dict[str, float] = dict()
         for ts_iri in self.scanned_timeseries_iris.keys():
-            self.timeseries_max_values_for_original[
-                ts_iri
-            ] = self.persistence_services.get(ts_iri).max_value_for_period(ts_iri)
-            self.timeseries_min_values_for_original[
-                ts_iri
-            ] = self.persistence_services.get(ts_iri).min_value_for_period(ts_iri)
+            self.timeseries_max_values_for_original[ts_iri] = timeseries_statistics.get(
+                ts_iri, dict()
+            ).get("max")
+            self.timeseries_min_values_for_original[ts_iri] = timeseries_statistics.get(
+                ts_iri, dict()
+            ).get("min")
             self.timeseries_min_values_for_scanned[
                 self.scanned_timeseries_iris.get(ts_iri)
             ] = self.timeseries_min_values_for_original.get(ts_iri)
@@ -141,6 +154,22 @@ class AnnotationDetector(abc.ABC):
 
         self.runtime_con_container = RuntimeConnectionContainer.instance()
 
+    def _group_iris_by_persistence_service(
+        self, ts_iris: List[str]
+    ) -> List[Tuple[TimeseriesPersistenceService, List[str]]]:
+        """Groups the time-series by their database, so that they can be queried together"""
+        services: Dict[int, TimeseriesPersistenceService] = dict()
+        iris_per_service: Dict[int, List[str]] = dict()
+        for ts_iri in ts_iris:
+            service = self.persistence_services.get(ts_iri)
+            services[id(service)] = service
+            iris_per_service.setdefault(id(service), []).append(ts_iri)
+
+        return [
+            (services.get(service_id), iris)
+            for service_id, iris in iris_per_service.items()
+        ]
+
     @abc.abstractmethod
     def _handle_new_reading(self, reading):
         pass
@@ -250,8 +279,10 @@ class AnnotationDetector(abc.ABC):
 
         # Register handlers in order to receive new time-series data
         rt_con_container = RuntimeConnectionContainer.instance()
-        for ts_iri in self.scanned_timeseries_iris.values():
-            ts_input = rt_con_container.get_timeseries_input_by_iri(ts_iri)
+        ts_inputs = rt_con_container.get_timeseries_inputs_by_iris(
+            list(self.scanned_timeseries_iris.values())
+        )
+        for ts_input in ts_inputs.values():
             ts_input.register_handler(
                 self._reading_handler, handler_id=self.input_handler_id
             )
@@ -270,10 +301,11 @@ class AnnotationDetector(abc.ABC):
         )
         # stop handlers
         rt_con_container = RuntimeConnectionContainer.instance()
-        for ts_iri in self.scanned_timeseries_iris.values():
-            ts_input = rt_con_container.get_timeseries_input_by_iri(ts_iri)
-            if ts_input is not None:
-                ts_input.remove_handler(handler_id=self.input_handler_id)
+        ts_inputs = rt_con_container.get_timeseries_inputs_by_iris(
+            list(self.scanned_timeseries_iris.values())
+        )
+        for ts_input in ts_inputs.values():
+            ts_input.remove_handler(handler_id=self.input_handler_id)
 
         # send stop signal
         self.detector_stop_queue.put(True)
@@ -1,5 +1,5 @@
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, List, Set, Tuple
 from backend.annotation_detection.AnnotationDetector import AnnotationDetector
 from backend.annotation_detection.EuclidianDistanceAnnotationDetector import (
     EuclidianDistanceAnnotationDetector,
@@ -32,6 +32,10 @@ from graph_domain.main_digital_twin.TimeseriesNode import (
     TimeseriesNodeDeep,
 )
 from backend.runtime_connections.RuntimeConnection import RuntimeConnection
+from backend.runtime_connections.RuntimeConnectionContainer import (
+    RuntimeConnectionContainer,
+)
+from backend.runtime_connections.sharding.ShardCoordinator import ShardCoordinator
 from backend.exceptions.EnvironmentalVariableNotFoundError import (
     EnvironmentalVariableNotFoundError,
 )
@@ -72,6 +76,8 @@ class AnnotationDetectorContainer:
 
         # Dict: (instance_iri, asset_iri) -> AnnotationDetector
         self.detectors: Dict[Tuple[str, str, float], AnnotationDetector] = {}
+        # Detectors run by other backend instances (sharded runtime connections). Re-checked if the inputs change
+        self._remote_detector_tuples: Set[Tuple[str, str, float]] = set()
         self._active_detectors_status_thread = None
 
     def start_active_detectors_status_thread(self):
@@ -80,30 +86,40 @@ class AnnotationDetectorContainer:
         )
         self._active_detectors_status_thread.start()
 
-    def refresh_annotation_detectors(self):
-        """Refreshes the annotation detectors, creating new ones if available in the graph, or deleting old ones."""
+    def refresh_annotation_detectors(
+        self, changed_timeseries_iris: Set[str] | None = None
+    ):
+        """Refreshes the annotation detectors, creating new ones if available in the graph, or deleting old ones.
+
+        If the runtime connections are sharded across several backend instances, each detector is run by the
+        instance owning the input of the first scanned time-series.
+
+        Args:
+            changed_timeseries_iris (Set[str] | None): time-series inputs that were removed or recreated. Detectors
+            scanning them are restarted, as they are registered at the inputs. None, if the inputs did not change
+        """
         annotations_dao: AnnotationNodesDao = AnnotationNodesDao.instance()
-        updated_instance_nodes_flat: List[
-            AnnotationInstanceNodeFlat
-        ] = annotations_dao.get_annotation_instances(only_active_scanned_instances=True)
-
-        updated_detector_tuples: List[Tuple[str, str, float]] = []
-        for instance in updated_instance_nodes_flat:
-            updated_detector_tuples.extend(
-                [
-                    # Precision sum used so that the detectors will be reinstantiated if one of the values was changed (sum as to only use one value in the tuple)
-                    (
-                        instance.iri,
-                        asset.iri,
-                        annotations_dao.get_detection_precision_sum_for_instance(
-                            instance.iri
-                        ),
-                    )
-                    for asset in annotations_dao.get_scanned_assets_for_annotation_instance(
-                        instance.iri
-                    )
-                ]
-            )
+        # Precision sum used so that the detectors will be reinstantiated if one of the values was changed (sum as to only use one value in the tuple)
+        updated_detector_tuples: List[
+            Tuple[str, str, float]
+        ] = annotations_dao.get_scanned_instance_asset_tuples()
+
+        if changed_timeseries_iris is not None:
+            # Inputs might have moved between the backend instances
+            self._remote_detector_tuples = set()
+        if changed_timeseries_iris:
+            restarted_detector_tuples = [
+                detector_tuple
+                for detector_tuple, detector in self.detectors.items()
+                if any(
+                    ts_iri in changed_timeseries_iris
+                    for ts_iri in detector.scanned_timeseries_iris.values()
+                )
+            ]
+            for detector_tuple in restarted_detector_tuples:
+                detector = self.detectors.pop(detector_tuple)
+                detector.stop_detection()
+                del detector
 
         #
         # Check if detectors have been removed:
@@ -128,6 +144,7 @@ class AnnotationDetectorContainer:
             tuple
             for tuple in updated_detector_tuples
             if tuple not in self.detectors.keys()
+            and tuple not in self._remote_detector_tuples
         ]
 
         for new_tuple in new_detector_tuples:
@@ -137,10 +154,36 @@ class AnnotationDetectorContainer:
                 )
             )
 
+            if not self._runs_locally(new_detector):
+                self._remote_detector_tuples.add(new_tuple)
+                del new_detector
+                continue
+
             self.detectors[new_tuple] = new_detector
 
             new_detector.start_detection()
 
+    def _runs_locally(self, detector: AnnotationDetector) -> bool:
+        if not ShardCoordinator.instance().enabled:
+            return True
+        scanned_iris = list(detector.scanned_timeseries_iris.values())
+        if len(scanned_iris) == 0:
+            return False
+        local_inputs = (
+            RuntimeConnectionContainer.instance().get_timeseries_inputs_by_iris(
+                scanned_iris
+            )
+        )
+        if min(scanned_iris) not in local_inputs:
+            return False
+        if len(local_inputs) < len(set(scanned_iris)):
+            logger.warning(
+                f"Detection of {detector.scanned_annotation_instance.caption} on {detector.scanned_asset.caption}: "
+                f"{len(set(scanned_iris)) - len(local_inputs)} scanned time-series are owned by other backend "
+                f"instances and not scanned"
+            )
+        return True
+
     def get_active_detectors_count(self) -> int:
 
         return len(
@@ -1,11 +1,9 @@
 from backend.annotation_detection.AnnotationDetector import AnnotationDetector
+from backend.annotation_detection.SlidingWindow import SlidingWindow
 import pandas as pd
 import numpy as np
 from typing import Dict
 from util.log import logger
-from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
-    TimeseriesPersistenceService,
-)
 from util.environment_and_configuration import (
     ConfigGroups,
     get_configuration,
@@ -15,6 +13,11 @@ from dateutil import tz
 
 DATETIME_STRF_FORMAT_CAPTION = "%d.%m.%Y, %H:%M:%S"
 DATETIME_STRF_FORMAT_ID = "%Y_%m_%d_%H_%M_%S_%f"
+# Time after a detection, in which further matches are ignored
+DETECTION_COOLDOWN = timedelta(seconds=30)
+# Relative tolerance of the distance lower bounds (rounding errors of the running sums). Bounds only skip the exact
+# calculation if clearly above the threshold, so that the detections are the same as with exact calculation
+LOWER_BOUND_TOLERANCE = 1e-6
 
 
 class EuclidianDistanceAnnotationDetector(AnnotationDetector):
@@ -22,6 +25,10 @@ class EuclidianDistanceAnnotationDetector(AnnotationDetector):
     Annotation detector scanning the related time-series inputs of one asset for occurances of a annotation instance
 
     Based on the Euclidian Distance Similarity Measure
+
+    The windows of the scanned time-series are kept in circular buffers with running sums. From those, a lower bound
+    of each distance is known per reading without iterating the windows (||a - b|| >= | ||a|| - ||b|| |).
+    The distances are only calculated, if no bound exceeds its threshold and no recent detection blocks new ones
     """
 
     # override
@@ -30,106 +37,121 @@ class EuclidianDistanceAnnotationDetector(AnnotationDetector):
         value = reading[1]
         time = reading[2]
 
-        # Load the watched array or create it
-        ts_array: np.array = self.current_ts_arrays.get(reading_iri)
-        if ts_array is None:
-            ts_array = np.array([])
-            self.current_ts_arrays[reading_iri] = ts_array
+        # Load the watched window or create it
+        window: SlidingWindow = self.current_ts_windows.get(reading_iri)
+        if window is None:
+            window = SlidingWindow(
+                capacity=self.original_ts_lens_mapped_to_scans.get(reading_iri)
+            )
+            self.current_ts_windows[reading_iri] = window
+            if window.is_full():
+                self.full_windows_count += 1
 
         # Move the watched window
-        ts_array = np.append(ts_array, [value])
-        if len(ts_array) > self.original_ts_lens_mapped_to_scans.get(reading_iri):
-            ts_array = np.delete(ts_array, 0)
-
-        self.current_ts_arrays[reading_iri] = ts_array
+        was_full = window.is_full()
+        window.append(float(value))
+        if not was_full and window.is_full():
+            self.full_windows_count += 1
+
+        if self.full_windows_count != len(self.original_ts_arrays.keys()):
+            return
+
+        # Detections within the cooldown are ignored anyway:
+        if (
+            datetime.now().timestamp()
+            <= (self.last_detection_timestamp + DETECTION_COOLDOWN).timestamp()
+        ):
+            return
+
+        # Lower bounds of the distances (from the running sums of the windows): skip calculating the distances, if
+        # one of the time-series can not match
+        for iri in self.original_ts_iris_ordered:
+            if self._distance_lower_bound_exceeds_threshold(iri):
+                return
+
+        # Individual euclidian distances:
+        euclidian_distances: Dict[str, float] = dict()
+        euclidian_distances_by_len: Dict[str, float] = dict()
+        for iri in self.original_ts_iris_ordered:
+            normalized_current = self._normalize_array(
+                self.current_ts_windows.get(
+                    self.scanned_timeseries_iris.get(iri)
+                ).values(),
+                min_value=self.timeseries_min_values_for_scanned.get(iri),
+                max_value=self.timeseries_max_values_for_scanned.get(iri),
+            )
+            euclidian_distances[iri] = np.linalg.norm(
+                self.original_ts_arrays_normalized.get(iri) - normalized_current
+            )
+            euclidian_distances_by_len[iri] = euclidian_distances.get(
+                iri
+            ) / self.original_ts_lens.get(iri)
+        logger.debug(
+            f"Euclidian distances divided by array-len for {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}: {', '.join([f'{dist[0][-20:-1]}: {str(dist[1])}' for dist in euclidian_distances_by_len.items()])}"
+        )
 
         if all(
             [
-                len(current_reading[1])
-                == self.original_ts_lens_mapped_to_scans.get(current_reading[0])
-                for current_reading in self.current_ts_arrays.items()
-            ]
-        ) and len(self.current_ts_arrays.keys()) == len(self.original_ts_arrays.keys()):
-            # current_combined_array = np.concatenate(
-            #     [
-            #         self._normalize_array(
-            #             self.current_ts_arrays.get(
-            #                 self.scanned_timeseries_iris.get(iri)
-            #             ),
-            #             min_value=self.timeseries_min_values_for_scanned.get(iri),
-            #             max_value=self.timeseries_max_values_for_scanned.get(iri),
-            #         )
-            #         for iri in self.original_ts_iris_ordered
-            #     ],
-            #     axis=0,
-            # )
-            # Overall euclidian distance:
-            # euclidian_distance = np.linalg.norm(
-            #     self.original_ts_combined_array_normalized - current_combined_array
-            # )
-            # print(
-            #     f"Matching {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}. Euclidian distance: {euclidian_distance}"
-            # )
-
-            # Individual euclidian distances:
-            euclidian_distances: Dict[str, float] = dict()
-            euclidian_distances_by_len: Dict[str, float] = dict()
-            for iri in self.original_ts_iris_ordered:
-                normalized_current = self._normalize_array(
-                    self.current_ts_arrays.get(self.scanned_timeseries_iris.get(iri)),
-                    min_value=self.timeseries_min_values_for_scanned.get(iri),
-                    max_value=self.timeseries_max_values_for_scanned.get(iri),
-                )
-                euclidian_distances[iri] = np.linalg.norm(
-                    self.original_ts_arrays_normalized.get(iri) - normalized_current
+                dist_pair[1]
+                < (
+                    1
+                    - self.scanned_timeseries_detection_precisions_relative.get(
+                        dist_pair[0]
+                    )
                 )
-                euclidian_distances_by_len[iri] = euclidian_distances.get(
-                    iri
-                ) / self.original_ts_lens.get(iri)
-            # print(
-            #     f"Euclidian distances for {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}: {', '.join([str(dist) for dist in euclidian_distances.values()])}"
-            # )
-            print(
-                f"Euclidian distances divided by array-len for {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}: {', '.join([f'{dist[0][-20:-1]}: {str(dist[1])}' for dist in euclidian_distances_by_len.items()])}"
+                for dist_pair in euclidian_distances_by_len.items()
+            ]
+        ):
+            # ignore, if just recently already detected:
+            now = datetime.now().astimezone(
+                tz.gettz(get_configuration(group=ConfigGroups.FRONTEND, key="timezone"))
             )
-
-            if all(
-                [
-                    dist_pair[1]
-                    < (
-                        1
-                        - self.scanned_timeseries_detection_precisions_relative.get(
-                            dist_pair[0]
-                        )
-                    )
-                    for dist_pair in euclidian_distances_by_len.items()
-                ]
-            ):
-                # ignore, if just recently already detected:
-                now = datetime.now().astimezone(
+            if now > self.last_detection_timestamp + DETECTION_COOLDOWN:
+                self.last_detection_timestamp = datetime.now().astimezone(
                     tz.gettz(
                         get_configuration(group=ConfigGroups.FRONTEND, key="timezone")
                     )
                 )
-                if now > self.last_detection_timestamp + timedelta(seconds=30):
-                    self.last_detection_timestamp = datetime.now().astimezone(
-                        tz.gettz(
-                            get_configuration(
-                                group=ConfigGroups.FRONTEND, key="timezone"
-                            )
-                        )
-                    )
-                    logger.info(
-                        f"Match for: {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}!"
-                    )
-                    self._create_new_detection(
-                        start_date_time=now
-                        - (
-                            self.scanned_annotation_instance.occurance_end_date_time
-                            - self.scanned_annotation_instance.occurance_start_date_time
-                        ),
-                        end_date_time=now,
-                    )
+                logger.info(
+                    f"Match for: {self.scanned_annotation_instance.caption} on {self.scanned_asset.caption}!"
+                )
+                self._create_new_detection(
+                    start_date_time=now
+                    - (
+                        self.scanned_annotation_instance.occurance_end_date_time
+                        - self.scanned_annotation_instance.occurance_start_date_time
+                    ),
+                    end_date_time=now,
+                )
+
+    def _distance_lower_bound_exceeds_threshold(self, iri: str) -> bool:
+        """
+        :param iri: original (annotated) time-series
+        :return: True, if the time-series can not match the current window of its scanned time-series
+        """
+        min_value = self.timeseries_min_values_for_scanned.get(iri)
+        max_value = self.timeseries_max_values_for_scanned.get(iri)
+        if min_value is None or max_value is None:
+            # Not normalized (see _normalize_array)
+            offset = 0.0
+            scale = 1.0
+        elif max_value == min_value:
+            # Normalizing results in nan or infinite distances, that never match
+            return True
+        else:
+            offset = min_value
+            scale = 1 / (max_value - min_value)
+
+        window = self.current_ts_windows.get(self.scanned_timeseries_iris.get(iri))
+        original_norm = self.original_ts_norms_normalized.get(iri)
+        current_norm = np.sqrt(window.squared_norm_of_offset_values(offset, scale))
+        original_len = self.original_ts_lens.get(iri)
+
+        return (
+            abs(original_norm - current_norm) / original_len
+            > (1 - self.scanned_timeseries_detection_precisions_relative.get(iri))
+            + LOWER_BOUND_TOLERANCE * (original_norm + current_norm + 1) / original_len
+        )
 
     # override
     def _prepare_original_dataset(self):
@@ -171,21 +193,14 @@ class EuclidianDistanceAnnotationDetector(AnnotationDetector):
             axis=0,
         )
 
-        # Map the arrays and lengths directly to the iris of the scanned ts:
+        self.original_ts_norms_normalized: Dict[str, float] = {
+            iri: float(np.linalg.norm(array))
+            for iri, array in self.original_ts_arrays_normalized.items()
+        }
 
-        self.current_ts_arrays: Dict[str, np.array] = dict()
-
-        # Calculate the threshold to be used for detections:
-        for ts_iri in self.scanned_timeseries_iris.keys():
-            service: TimeseriesPersistenceService = self.persistence_services.get(
-                ts_iri
-            )
-            dataframe = service.read_period_to_dataframe(
-                iri=ts_iri,
-                begin_time=self.scanned_annotation_instance.occurance_start_date_time,
-                end_time=self.scanned_annotation_instance.occurance_end_date_time,
-            )
-            self.original_ts_dataframes[ts_iri] = dataframe
+        # Windows of the scanned time-series (by their iris):
+        self.current_ts_windows: Dict[str, SlidingWindow] = dict()
+        self.full_windows_count = 0
 
     def _normalize_array(self, array: np.array, min_value, max_value) -> np.array:
         if min_value is None or max_value is None:
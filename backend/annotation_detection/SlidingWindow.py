@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class SlidingWindow:
+    """
+    Window of the most recent readings of one time-series, kept in a preallocated circular buffer.
+
+    Every value is written twice (at its slot and one capacity further), so that the window is always available as
+    contiguous view without copying. Sums of the values (centered by the first value, to avoid cancellation) are
+    maintained with every reading and recalculated exactly once per pass through the buffer
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.count = 0
+        self._buffer = np.zeros(2 * capacity)
+        self._position = 0
+        self._center = None
+        self._sum = 0.0
+        self._squared_sum = 0.0
+
+    def is_full(self) -> bool:
+        return self.count == self.capacity
+
+    def append(self, value: float):
+        if self.capacity == 0:
+            return
+        if self._center is None:
+            self._center = value
+
+        if self.is_full():
+            removed = self._buffer[self._position] - self._center
+            self._sum -= removed
+            self._squared_sum -= removed * removed
+        else:
+            self.count += 1
+        added = value - self._center
+        self._sum += added
+        self._squared_sum += added * added
+
+        self._buffer[self._position] = value
+        self._buffer[self._position + self.capacity] = value
+        self._position = (self._position + 1) % self.capacity
+
+        if self._position == 0 and self.is_full():
+            # Recalculate to bound the accumulated rounding errors (once per capacity readings)
+            centered = self._buffer[: self.capacity] - self._center
+            self._sum = float(centered.sum())
+            self._squared_sum = float(np.dot(centered, centered))
+
+    def values(self) -> np.ndarray:
+        """
+        :return: view of the current window (oldest reading first). Only valid until the next append
+        """
+        if not self.is_full():
+            return self._buffer[self._position - self.count : self._position]
+        return self._buffer[self._position : self._position + self.capacity]
+
+    def squared_norm_of_offset_values(self, offset: float, scale: float) -> float:
+        """
+        :return: sum over the window of ((value - offset) * scale) ** 2, without iterating the window
+        """
+        if self.count == 0:
+            return 0.0
+        shift = offset - self._center
+        return max(
+            0.0,
+            scale
+            * scale
+            * (self._squared_sum - 2 * shift * self._sum + self.count * shift * shift),
+        )
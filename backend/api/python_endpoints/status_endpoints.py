@@ -1,4 +1,6 @@
 from datetime import datetime
+import json
+import time
 from backend.api.python_endpoints import asset_endpoints
 from backend.api.python_endpoints import timeseries_endpoints
 from backend.knowledge_graph.dao.AnnotationNodesDao import AnnotationNodesDao
@@ -8,6 +10,14 @@ from backend.knowledge_graph.dao.RuntimeConnectionsDao import RuntimeConnections
 from backend.runtime_connections.RuntimeConnectionContainer import (
     RuntimeConnectionContainer,
 )
+from backend.runtime_connections.sharding.ShardCoordinator import get_shard_status
+from backend.specialized_databases.timeseries.TimeseriesQueryCache import (
+    TimeseriesQueryCache,
+)
+from backend.specialized_databases.timeseries.timeseries_instance_states import (
+    WRITE_METRICS_CACHE_KEY,
+    get_instance_states,
+)
 from util.inter_process_cache import memcache
 
 BASE_NODE_DAO: BaseNodeDao = BaseNodeDao.instance()
@@ -34,6 +44,33 @@ def get_rt_active_connections_count():
     return int(memcache.get("active_runtime_connections_count"))
 
 
+def get_timeseries_write_metrics():
+    """
+    :return: backend instance -> seconds since the last update and write metrics per time-series database
+    """
+    states = get_instance_states(WRITE_METRICS_CACHE_KEY)
+    return {
+        node_id: {
+            "updated_s_ago": round(time.time() - entry["updated"], 1),
+            "databases": entry["state"],
+        }
+        for node_id, entry in (states if states is not None else dict()).items()
+    }
+
+
+def get_timeseries_ingest_metrics():
+    metrics_json = memcache.get("timeseries_ingest_metrics")
+    return json.loads(metrics_json) if metrics_json is not None else dict()
+
+
+def get_runtime_connection_shards():
+    return get_shard_status()
+
+
+def get_timeseries_query_cache_metrics():
+    return TimeseriesQueryCache.instance().get_metrics()
+
+
 def get_status():
     """Combined status endpoint. Should be preferred to use less API calls.
 
@@ -1,6 +1,7 @@
 import json
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 import pandas as pd
 
 from backend.exceptions.IdNotFoundException import IdNotFoundException
@@ -9,6 +10,7 @@ from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
 )
 from backend.knowledge_graph.dao.DatabaseConnectionsDao import DatabaseConnectionsDao
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
+from backend.runtime_connections.TimeseriesHotWindow import TimeseriesHotWindow
 from backend.specialized_databases.DatabasePersistenceServiceContainer import (
     DatabasePersistenceServiceContainer,
 )
@@ -18,6 +20,15 @@ from backend.specialized_databases.timeseries.TimeseriesPersistenceService impor
 from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
     InfluxDbPersistenceService,
 )
+from backend.specialized_databases.timeseries.TimeseriesQueryCache import (
+    TimeseriesQueryCache,
+)
+from backend.specialized_databases.timeseries.timeseries_downsampling import (
+    LTTB_PRESELECTION_RATIO,
+    DownsamplingMethods,
+    downsample_dataframe,
+)
+from util.environment_and_configuration import ConfigGroups, get_configuration_int
 from util.log import logger
 
 
@@ -25,6 +36,8 @@ DB_CON_NODE_DAO: DatabaseConnectionsDao = DatabaseConnectionsDao.instance()
 
 TIMESERIES_NODES_DAO: TimeseriesNodesDao = TimeseriesNodesDao.instance()
 
+TIMESERIES_QUERY_CACHE: TimeseriesQueryCache = TimeseriesQueryCache.instance()
+
 
 def get_ts_details_flat(iri: str):
     """
@@ -40,6 +53,8 @@ def get_timeseries_current_range(
     iri: str,
     duration: float | None,
     aggregation_window_ms: int | None = None,
+    target_count: int | None = None,
+    downsampling: DownsamplingMethods = DownsamplingMethods.LTTB,
 ):
     """
     Queries the current measurements for the given duration up to the current time.
@@ -53,6 +68,8 @@ def get_timeseries_current_range(
         duration=duration,
         date_time=datetime.now(),
         aggregation_window_ms=aggregation_window_ms,
+        target_count=target_count,
+        downsampling=downsampling,
     )
 
 
@@ -84,6 +101,8 @@ def get_timeseries_range(
     date_time: datetime | None,
     duration: float | None,
     aggregation_window_ms: int | None = None,
+    target_count: int | None = None,
+    downsampling: DownsamplingMethods = DownsamplingMethods.LTTB,
 ):
     """
     Queries the measurements for the given duration up to the given date and time.
@@ -91,28 +110,298 @@ def get_timeseries_range(
     :param id_uri:
     :param date_time: date and time to be observed in iso format or None (forever)
     :param duration: timespan to query in seconds or None (forever)
+    :param target_count: if set, the readings are downsampled to this count (replaces the aggregation window)
+    :param downsampling: downsampling method used with target_count
     :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
     """
+    readings_df, _ = _read_range(
+        iri=iri,
+        date_time=date_time,
+        duration=duration,
+        aggregation_window_ms=aggregation_window_ms,
+        target_count=target_count,
+        downsampling=downsampling,
+        count_readings=False,
+    )
+    return readings_df
+
+
+def get_timeseries_range_and_count(
+    iri: str,
+    date_time: datetime | None,
+    duration: float | None,
+    aggregation_window_ms: int | None = None,
+    target_count: int | None = None,
+    downsampling: DownsamplingMethods = DownsamplingMethods.LTTB,
+) -> Tuple[pd.DataFrame | None, int | None]:
+    """
+    Queries the measurements like get_timeseries_range and additionally counts the readings in the range
+    (before downsampling or aggregating), so that no separate count request is required
+    :return: Pandas Dataframe featuring the columns "time" and "value", count of readings (None if unknown)
+    """
+    return _read_range(
+        iri=iri,
+        date_time=date_time,
+        duration=duration,
+        aggregation_window_ms=aggregation_window_ms,
+        target_count=target_count,
+        downsampling=downsampling,
+        count_readings=True,
+    )
+
 
+def _read_range(
+    iri: str,
+    date_time: datetime | None,
+    duration: float | None,
+    aggregation_window_ms: int | None,
+    target_count: int | None,
+    downsampling: DownsamplingMethods,
+    count_readings: bool,
+) -> Tuple[pd.DataFrame | None, int | None]:
+    """
+    :param count_readings: whether to count the readings, if they are not read completely (one statistics query)
+    :return: readings, count of readings in the range (None, if not requested and not known)
+    """
     try:
         # Get related timeseries-database service:
         ts_service: TimeseriesPersistenceService = (
             get_related_timeseries_database_service(iri)
         )
 
+        if not aggregation_window_ms and date_time is not None and duration is not None:
+            readings_df = _read_hot_window(
+                iri=iri,
+                begin_time=date_time - timedelta(seconds=duration),
+                end_time=date_time,
+            )
+            if readings_df is not None:
+                if target_count is not None and target_count > 0:
+                    return (
+                        downsample_dataframe(readings_df, target_count, downsampling),
+                        len(readings_df),
+                    )
+                return readings_df, len(readings_df)
+
+        if target_count is not None and target_count > 0:
+            return _read_downsampled_range(
+                ts_service=ts_service,
+                iri=iri,
+                date_time=date_time,
+                duration=duration,
+                target_count=target_count,
+                count_readings=count_readings,
+                downsampling=downsampling,
+            )
+        begin_time = (
+            date_time - timedelta(seconds=duration) if duration is not None else None
+        )
+
         # Read the actual measurements:
-        readings_df = ts_service.read_period_to_dataframe(
+        readings_df = TIMESERIES_QUERY_CACHE.read_period_to_dataframe(
+            service=ts_service,
             iri=iri,
-            begin_time=date_time - timedelta(seconds=duration)
-            if duration is not None
-            else None,
+            begin_time=begin_time,
             end_time=date_time,
             aggregation_window_ms=aggregation_window_ms,
         )
+        if readings_df is None:
+            return None, None
+        if not aggregation_window_ms:
+            return readings_df, len(readings_df)
+        if not count_readings:
+            return readings_df, None
+        statistics = ts_service.period_statistics(
+            iri=iri, begin_time=begin_time, end_time=date_time
+        )
+        return readings_df, statistics.get("count") if statistics is not None else None
+    except IdNotFoundException:
+        return pd.DataFrame(columns=["time", "value"]), 0
+
+
+def _read_hot_window(
+    iri: str, begin_time: datetime, end_time: datetime
+) -> pd.DataFrame | None:
+    """
+    Reads recent ranges from the in-memory window of the time-series input in the backend process
+    :return: None, if the range is not recent or not covered by the window
+    """
+    hot_window_duration_s = get_configuration_int(
+        group=ConfigGroups.API, key="timeseries_hot_window_duration_s"
+    )
+    if begin_time.astimezone().timestamp() < time.time() - hot_window_duration_s:
+        return None
+    return TimeseriesHotWindow.read_published(
+        iri=iri, begin_time=begin_time, end_time=end_time
+    )
+
+
+def get_timeseries_range_iter(
+    iri: str,
+    date_time: datetime | None,
+    duration: float | None,
+    chunk_size: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads the measurements for the given duration up to the given date and time in chunks with
+    bounded memory.
+    :param date_time: date and time to be observed or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :param chunk_size: max. count of readings per chunk. Default from the configuration
+    :return: Generator of Pandas Dataframes featuring the columns "time" and "value"
+    """
+    try:
+        ts_service: TimeseriesPersistenceService = (
+            get_related_timeseries_database_service(iri)
+        )
+        if not isinstance(ts_service, TimeseriesPersistenceService):
+            return
 
-        return readings_df
+        end_time = date_time if date_time is not None else datetime.now()
+        yield from ts_service.read_period_iter(
+            iri=iri,
+            begin_time=end_time - timedelta(seconds=duration)
+            if duration is not None
+            else None,
+            end_time=end_time,
+            chunk_size=chunk_size
+            if chunk_size is not None
+            else get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_stream_chunk_size"
+            ),
+        )
     except IdNotFoundException:
-        return pd.DataFrame(columns=["time", "value"])
+        return
+
+
+def _read_downsampled_range(
+    ts_service: TimeseriesPersistenceService,
+    iri: str,
+    date_time: datetime | None,
+    duration: float | None,
+    target_count: int,
+    downsampling: DownsamplingMethods,
+    count_readings: bool,
+) -> Tuple[pd.DataFrame | None, int | None]:
+    """
+    Reads the range downsampled to the target count.
+    The readings with the minimum and maximum value per time window are preselected by the database, so
+    that only a multiple of the target count is transferred. The final selection is done locally.
+    Non-numeric time-series are read completely.
+    :return: readings, count of readings in the range (from the statistics, None if not requested)
+    """
+    end_time = date_time if date_time is not None else datetime.now()
+    readings_count = None
+    if duration is not None:
+        begin_time = end_time - timedelta(seconds=duration)
+        if count_readings:
+            statistics = ts_service.period_statistics(
+                iri=iri, begin_time=begin_time, end_time=end_time
+            )
+            if statistics is None:
+                return None, None
+            readings_count = statistics.get("count")
+    else:
+        statistics = ts_service.period_statistics(iri=iri, end_time=end_time)
+        if statistics is None:
+            return None, None
+        readings_count = statistics.get("count")
+        if statistics.get("first_time") is None:
+            return pd.DataFrame(columns=["time", "value"]), 0
+        begin_time = statistics.get("first_time")
+
+    preselection_windows = (
+        target_count // 2
+        if downsampling == DownsamplingMethods.MIN_MAX
+        else target_count * LTTB_PRESELECTION_RATIO // 2
+    )
+    window_ms = (
+        end_time.astimezone() - begin_time.astimezone()
+    ).total_seconds() * 1000 / max(preselection_windows, 1)
+
+    readings_df = ts_service.read_period_min_max_to_dataframe(
+        iri=iri,
+        begin_time=begin_time,
+        end_time=end_time,
+        window_ms=int(window_ms),
+    )
+    if readings_df is None:
+        return None, None
+    if readings_df.empty:
+        # No numeric readings available: select from all readings
+        readings_df = TIMESERIES_QUERY_CACHE.read_period_to_dataframe(
+            service=ts_service, iri=iri, begin_time=begin_time, end_time=end_time
+        )
+        if readings_df is None:
+            return None, None
+        readings_count = len(readings_df)
+
+    return (
+        downsample_dataframe(
+            df=readings_df, target_count=target_count, method=downsampling
+        ),
+        readings_count,
+    )
+
+
+def _group_iris_by_database_service(
+    iris: List[str],
+) -> List[Tuple[TimeseriesPersistenceService, List[str]]]:
+    """
+    Groups the time-series by their database service, so that they can be queried together.
+    Time-series without database connection are skipped.
+    """
+    services: Dict[str, TimeseriesPersistenceService] = dict()
+    iris_per_service: Dict[str, List[str]] = dict()
+    for iri in iris:
+        try:
+            ts_service = get_related_timeseries_database_service(iri)
+        except IdNotFoundException:
+            continue
+        if not isinstance(ts_service, TimeseriesPersistenceService):
+            continue
+        services[ts_service.iri] = ts_service
+        iris_per_service.setdefault(ts_service.iri, []).append(iri)
+
+    return [
+        (services.get(service_iri), service_ts_iris)
+        for service_iri, service_ts_iris in iris_per_service.items()
+    ]
+
+
+def get_timeseries_ranges(
+    iris: List[str],
+    date_time: datetime | None,
+    duration: float | None,
+    aggregation_window_ms: int | None = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Queries the measurements of several time-series for the given duration up to the given date and
+    time. Uses one query per database.
+    :param iris:
+    :param date_time: date and time to be observed
+    :param duration: timespan to query in seconds or None (forever)
+    :return: Dict: iri -> Pandas Dataframe featuring the columns "time" and "value"
+    """
+    readings_dfs = {iri: pd.DataFrame(columns=["time", "value"]) for iri in iris}
+
+    for ts_service, service_ts_iris in _group_iris_by_database_service(iris):
+        try:
+            service_readings_dfs = TIMESERIES_QUERY_CACHE.read_periods_to_dataframes(
+                service=ts_service,
+                iris=service_ts_iris,
+                begin_time=date_time - timedelta(seconds=duration)
+                if duration is not None
+                else None,
+                end_time=date_time,
+                aggregation_window_ms=aggregation_window_ms,
+            )
+        except IdNotFoundException:
+            continue
+        if service_readings_dfs is not None:
+            readings_dfs.update(service_readings_dfs)
+
+    return readings_dfs
 
 
 def get_timeseries_entries_count(
@@ -144,6 +433,47 @@ def get_timeseries_entries_count(
         return 0
 
 
+def get_timeseries_period_statistics(
+    iri: str, date_time: datetime | None, duration: float | None
+):
+    """
+    Calculates count, min, max, mean, first and last value with one database query
+    :param iri:
+    :param date_time: end of the range or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :return: Dict with the statistics. None if the database is not available
+    """
+    return get_timeseries_period_statistics_for_iris(
+        iris=[iri], date_time=date_time, duration=duration
+    ).get(iri)
+
+
+def get_timeseries_period_statistics_for_iris(
+    iris: List[str], date_time: datetime | None, duration: float | None
+):
+    """
+    Calculates count, min, max, mean, first and last value for several time-series with one database
+    query per database
+    :param iris:
+    :param date_time: end of the range or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :return: Dict: iri -> statistics dict (None if the database is not available)
+    """
+    statistics = {iri: None for iri in iris}
+    for ts_service, service_ts_iris in _group_iris_by_database_service(iris):
+        service_statistics = ts_service.period_statistics_for_iris(
+            iris=service_ts_iris,
+            begin_time=date_time - timedelta(seconds=duration)
+            if date_time is not None and duration is not None
+            else None,
+            end_time=date_time,
+        )
+        if service_statistics is not None:
+            statistics.update(service_statistics)
+
+    return statistics
+
+
 def get_timeseries_nodes(deep: bool = True):
     if deep:
         return TIMESERIES_NODES_DAO.get_all_timeseries_nodes_deep()
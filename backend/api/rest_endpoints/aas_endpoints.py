@@ -33,6 +33,7 @@ from graph_domain.main_digital_twin.DatabaseConnectionNode import (
 )
 from util.file_name_utils import _replace_illegal_characters_from_iri
 from util.log import logger
+from backend.workers_refresh import request_workers_refresh
 from backend.knowledge_graph.dao.AssetNodesDao import AssetsDao
 
 
@@ -129,6 +130,8 @@ async def upload(file_name: str = Form(...), file_data: str = Form(...)):
     # Cleanup
     os.remove(aasx_file_name)
 
+    request_workers_refresh()
+
     return {"message": f"Successfuly imported {file_name}"}
 
     # shutil.unpack_archive(filename=aasx_file_name, extract_dir=restore_base_path)
@@ -20,6 +20,7 @@ from graph_domain.expert_annotations.AnnotationTimeseriesMatcherNode import (
     AnnotationTimeseriesMatcherNodeFlat,
 )
 from util.log import logger
+from backend.workers_refresh import request_workers_refresh
 
 
 ANNOTATIONS_DAO: AnnotationNodesDao = AnnotationNodesDao.instance()
@@ -55,6 +56,7 @@ async def patch_annotation_instance_toggle_occurance_scan(
         f"Toggling occurance scan to active: {active} for annotation instance: {instance_iri}..."
     )
     ANNOTATIONS_DAO.toggle_annotation_instance_occurance_scan(instance_iri, active)
+    request_workers_refresh()
 
 
 @app.patch("/annotation/ts_matcher/detection_precision")
@@ -65,6 +67,7 @@ async def patch_annotation_matcher_detection_precision(
         f"Changing scan precision to {detection_precision} for annotation matcher: {matcher_iri}..."
     )
     ANNOTATIONS_DAO.change_matcher_precision(matcher_iri, detection_precision)
+    request_workers_refresh()
 
 
 class AnnotationInstanceArguments(BaseModel):
@@ -110,6 +113,8 @@ def create_annotation_instance(instance: AnnotationInstanceArguments):
     ANNOTATIONS_DAO.create_annotation_occurance_scan_relationship(
         definition_iri=instance.definition_iri, asset_iri=instance.asset_iri
     )
+    # Starts the detectors of the new instance
+    request_workers_refresh()
 
     return instance_iri
 
@@ -151,6 +156,7 @@ async def delete_annotation_instance(instance_iri: str):
 
     logger.info(f"Deleting annotation instance: {instance_iri}...")
     ANNOTATIONS_DAO.delete_annotation_instance(instance_iri)
+    request_workers_refresh()
 
 
 @app.get("/annotation/ts_matcher/original_annotated_ts")
@@ -31,6 +31,10 @@ from graph_domain.main_digital_twin.DatabaseConnectionNode import (
 )
 from util.file_name_utils import _replace_illegal_characters_from_iri
 from util.log import logger
+from backend.specialized_databases.timeseries.TimeseriesQueryCache import (
+    TimeseriesQueryCache,
+)
+from backend.workers_refresh import request_workers_refresh
 
 DB_CON_NODE_DAO: DatabaseConnectionsDao = DatabaseConnectionsDao.instance()
 SUPPL_FILE_DAO: SupplementaryFileNodesDao = SupplementaryFileNodesDao.instance()
@@ -221,4 +225,8 @@ async def upload(file_name: str = Form(...), file_data: str = Form(...)):
 
     shutil.rmtree(restore_base_path)
 
+    # Other processes clear their caches when noticing the restore (see InfluxDbPersistenceService.restore):
+    TimeseriesQueryCache.instance().clear()
+    request_workers_refresh()
+
     return {"message": f"Successfuly imported {file_name}"}
@@ -36,6 +36,46 @@ async def get_rt_active_connections_count():
     return python_status_endpoints.get_rt_active_connections_count()
 
 
+@app.get("/runtime_connections/timeseries_ingest_metrics")
+async def get_timeseries_ingest_metrics():
+    """Count of received and suppressed (by the ingest filters) readings
+
+    Returns:
+        _type_: json
+    """
+    return python_status_endpoints.get_timeseries_ingest_metrics()
+
+
+@app.get("/runtime_connections/shards")
+async def get_runtime_connection_shards():
+    """Backend instances sharing the runtime connections and the owner of each connection
+
+    Returns:
+        _type_: json
+    """
+    return python_status_endpoints.get_runtime_connection_shards()
+
+
+@app.get("/database_connections/timeseries_write_metrics")
+async def get_timeseries_write_metrics():
+    """Buffer and spool metrics of the time-series writes per backend instance and database connection
+
+    Returns:
+        _type_: json
+    """
+    return python_status_endpoints.get_timeseries_write_metrics()
+
+
+@app.get("/database_connections/timeseries_query_cache_metrics")
+async def get_timeseries_query_cache_metrics():
+    """Hit and miss metrics of the time-series query cache of the answering API worker process
+
+    Returns:
+        _type_: json
+    """
+    return python_status_endpoints.get_timeseries_query_cache_metrics()
+
+
 @app.get("/status")
 async def get_status():
     """Combined status endpoint. Should be preferred to use less API calls.
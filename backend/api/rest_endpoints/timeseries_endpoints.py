@@ -1,4 +1,10 @@
 from datetime import datetime
+import json
+from typing import Dict, List
+from fastapi import Header, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import numpy as np
+import pandas as pd
 
 from backend.api.api import app
 
@@ -6,29 +12,102 @@ from backend.knowledge_graph.dao.DatabaseConnectionsDao import DatabaseConnectio
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
 
 import backend.api.python_endpoints.timeseries_endpoints as python_timeseries_endpoints
+from backend.specialized_databases.timeseries.timeseries_downsampling import (
+    DownsamplingMethods,
+)
+from util import timeseries_wire_format
+from util.log import logger
 
 
 DB_CON_NODE_DAO: DatabaseConnectionsDao = DatabaseConnectionsDao.instance()
 TIMESERIES_NODES_DAO: TimeseriesNodesDao = TimeseriesNodesDao.instance()
 
 
+def _serialize_readings(
+    df: pd.DataFrame,
+    response_format: str | None,
+    accept: str | None,
+    headers: Dict[str, str] | None = None,
+):
+    """
+    Serializes the readings to JSON, or to the binary wire format if requested.
+    Falls back to JSON for values not supported by the binary format.
+    """
+    if timeseries_wire_format.wants_binary(response_format, accept):
+        try:
+            return Response(
+                content=timeseries_wire_format.encode_dataframe(df),
+                media_type=timeseries_wire_format.MEDIA_TYPE,
+                headers=headers,
+            )
+        except ValueError:
+            pass
+    if headers is not None:
+        return JSONResponse(content=df.to_json(date_format="iso"), headers=headers)
+    return df.to_json(date_format="iso")
+
+
+def _encode_stream_frame(chunk: pd.DataFrame) -> bytes:
+    """
+    Encodes a chunk of a binary stream. Values not supported by the binary format (missing values or mixed
+    types within the chunk) cannot fall back to JSON, as the response has already been started: missing values
+    are skipped and mixed values converted to one type (floats, if all are numeric, strings otherwise)
+    """
+    try:
+        return timeseries_wire_format.encode_stream_frame(chunk)
+    except ValueError:
+        pass
+    values = chunk["value"]
+    present = values.notna()
+    if not present.all():
+        logger.warning(
+            f"Skipping {int((~present).sum())} missing values in a binary time-series stream"
+        )
+    chunk = chunk.loc[present].infer_objects()
+    try:
+        return timeseries_wire_format.encode_stream_frame(chunk)
+    except ValueError:
+        pass
+    values = chunk["value"]
+    if all(
+        isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+        for value in values
+    ):
+        values = values.astype(float)
+    else:
+        values = values.astype(str)
+    return timeseries_wire_format.encode_stream_frame(chunk.assign(value=values))
+
+
 @app.get("/timeseries/current_range")
 async def get_timeseries_current_range(
     iri: str,
     duration: float,
     aggregation_window_ms: int | None = None,
+    target_count: int | None = None,
+    downsampling: str = DownsamplingMethods.LTTB.value,
+    response_format: str | None = None,
+    accept: str | None = Header(default=None),
 ):
     """
     Queries the current measurements for the given duration up to the current time.
     :raises IdNotFoundException: If no data is available for that id at the current time
     :param id_uri:
     :param duration: timespan to query in seconds
-    :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
+    :param target_count: if set, the readings are downsampled to this count
+    :param downsampling: "lttb" (Largest-Triangle-Three-Buckets) or "min_max"
+    :param response_format: "json" or "binary" (see util.timeseries_wire_format). Alternatively, the binary
+    format can be requested with the accept header
+    :return: Pandas Dataframe serialized to JSON (or the binary format) featuring the columns "time" and "value"
     """
     df = python_timeseries_endpoints.get_timeseries_current_range(
-        iri, duration, aggregation_window_ms
+        iri,
+        duration,
+        aggregation_window_ms,
+        target_count=target_count,
+        downsampling=DownsamplingMethods(downsampling),
     )
-    return df.to_json(date_format="iso")
+    return _serialize_readings(df, response_format, accept)
 
 
 @app.get("/timeseries/range")
@@ -37,6 +116,11 @@ async def get_timeseries_range(
     date_time_str: str | None,
     duration: float | None,
     aggregation_window_ms: int | None = None,
+    target_count: int | None = None,
+    downsampling: str = DownsamplingMethods.LTTB.value,
+    include_count: bool = False,
+    response_format: str | None = None,
+    accept: str | None = Header(default=None),
 ):
     """
     Queries the measurements for the given duration up to the given date and time.
@@ -44,13 +128,123 @@ async def get_timeseries_range(
     :param id_uri:
     :param date_time: date and time to be observed in iso format or None (forever)
     :param duration: timespan to query in seconds or None (forever)
-    :return: Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
+    :param target_count: if set, the readings are downsampled to this count (instead of using an
+    aggregation window)
+    :param downsampling: "lttb" (Largest-Triangle-Three-Buckets) or "min_max"
+    :param include_count: if set, the count of readings in the range (before downsampling) is returned in the
+    X-Readings-Count header, so that no separate entries_count request is required
+    :param response_format: "json" or "binary" (see util.timeseries_wire_format). Alternatively, the binary
+    format can be requested with the accept header
+    :return: Pandas Dataframe serialized to JSON (or the binary format) featuring the columns "time" and "value"
     """
     date_time = datetime.fromisoformat(date_time_str)
-    df = python_timeseries_endpoints.get_timeseries_range(
-        iri, date_time, duration, aggregation_window_ms
+    if not include_count:
+        df = python_timeseries_endpoints.get_timeseries_range(
+            iri,
+            date_time,
+            duration,
+            aggregation_window_ms,
+            target_count=target_count,
+            downsampling=DownsamplingMethods(downsampling),
+        )
+        return _serialize_readings(df, response_format, accept)
+
+    df, readings_count = python_timeseries_endpoints.get_timeseries_range_and_count(
+        iri,
+        date_time,
+        duration,
+        aggregation_window_ms,
+        target_count=target_count,
+        downsampling=DownsamplingMethods(downsampling),
+    )
+    if df is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    return _serialize_readings(
+        df,
+        response_format,
+        accept,
+        headers=(
+            {timeseries_wire_format.READINGS_COUNT_HEADER: str(readings_count)}
+            if readings_count is not None
+            else dict()
+        ),
+    )
+
+
+@app.get("/timeseries/range_stream")
+def get_timeseries_range_stream(
+    iri: str,
+    date_time_str: str | None = None,
+    duration: float | None = None,
+    chunk_size: int | None = None,
+    response_format: str = "csv",
+):
+    """
+    Streams all measurements for the given duration up to the given date and time in chunks (chunked
+    transfer encoding), so that very large ranges can be exported with bounded memory.
+    Not async, so that the blocking database queries are run in the thread pool.
+    :param iri:
+    :param date_time_str: date and time to be observed in iso format or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :param chunk_size: max. count of readings per chunk
+    :param response_format: "csv" or "binary" (frames of util.timeseries_wire_format)
+    :return: Streaming response
+    """
+    date_time = (
+        datetime.fromisoformat(date_time_str) if date_time_str is not None else None
+    )
+    chunks = python_timeseries_endpoints.get_timeseries_range_iter(
+        iri, date_time, duration, chunk_size
+    )
+
+    if response_format == timeseries_wire_format.FORMAT_BINARY:
+        return StreamingResponse(
+            (_encode_stream_frame(chunk) for chunk in chunks),
+            media_type=timeseries_wire_format.MEDIA_TYPE,
+        )
+
+    def csv_stream():
+        yield "time,value\n"
+        for chunk in chunks:
+            yield chunk.to_csv(header=False, index=False, date_format="%Y-%m-%dT%H:%M:%S.%fZ")
+
+    return StreamingResponse(
+        csv_stream(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="timeseries.csv"'},
+    )
+
+
+@app.get("/timeseries/ranges")
+async def get_timeseries_ranges(
+    iris: List[str] = Query(),
+    date_time_str: str | None = None,
+    duration: float | None = None,
+    aggregation_window_ms: int | None = None,
+):
+    """
+    Queries the measurements of several time-series for the given duration up to the given date and time.
+    Uses one database query per database instead of one per time-series.
+    :param iris:
+    :param date_time: date and time to be observed in iso format
+    :param duration: timespan to query in seconds or None (forever)
+    :return: Dict: iri -> Pandas Dataframe serialized to JSON featuring the columns "time" and "value"
+    """
+    date_time = (
+        datetime.fromisoformat(date_time_str)
+        if date_time_str is not None
+        else datetime.now()
+    )
+    dfs = python_timeseries_endpoints.get_timeseries_ranges(
+        iris, date_time, duration, aggregation_window_ms
+    )
+    return (
+        "{"
+        + ", ".join(
+            [f"{json.dumps(iri)}: {df.to_json(date_format='iso')}" for iri, df in dfs.items()]
+        )
+        + "}"
     )
-    return df.to_json(date_format="iso")
 
 
 @app.get("/timeseries/entries_count")
@@ -71,6 +265,48 @@ async def get_timeseries_entries_count(
     )
 
 
+@app.get("/timeseries/statistics")
+async def get_timeseries_statistics(
+    iri: str, date_time_str: str | None = None, duration: float | None = None
+):
+    """
+    Calculates count, min, max, mean, first and last value for the given range with one database query.
+    Min, max and mean are only available for numeric time-series.
+    :param iri:
+    :param date_time: end of the range in iso format or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :return: Dict with the keys count, min, max, mean, first, last, first_time and last_time
+    """
+    date_time = (
+        datetime.fromisoformat(date_time_str) if date_time_str is not None else None
+    )
+    return python_timeseries_endpoints.get_timeseries_period_statistics(
+        iri, date_time, duration
+    )
+
+
+@app.get("/timeseries/statistics_for_iris")
+async def get_timeseries_statistics_for_iris(
+    iris: List[str] = Query(),
+    date_time_str: str | None = None,
+    duration: float | None = None,
+):
+    """
+    Calculates count, min, max, mean, first and last value for several time-series with one database
+    query per database.
+    :param iris:
+    :param date_time: end of the range in iso format or None (now)
+    :param duration: timespan to query in seconds or None (forever)
+    :return: Dict: iri -> statistics dict
+    """
+    date_time = (
+        datetime.fromisoformat(date_time_str) if date_time_str is not None else None
+    )
+    return python_timeseries_endpoints.get_timeseries_period_statistics_for_iris(
+        iris, date_time, duration
+    )
+
+
 @app.get("/timeseries/nodes")
 async def get_timeseries_nodes(deep: bool = True):
     if deep:
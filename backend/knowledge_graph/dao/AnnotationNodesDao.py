@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Tuple
 from py2neo import NodeMatcher, Relationship, Node
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
 from graph_domain.expert_annotations.AnnotationDefinitionNode import (
@@ -662,3 +662,39 @@ class AnnotationNodesDao(object):
     def get_detection_precision_sum_for_instance(self, instance_iri):
         matchers = self.get_matchers_for_annotation_instance(instance_iri)
         return sum([m.detection_precision for m in matchers])
+
+    def get_scanned_instance_asset_tuples(self) -> List[Tuple[str, str, float]]:
+        """
+        Queries the detectors required for the active scanned instances with one query
+        (see get_scanned_assets_for_annotation_instance and get_detection_precision_sum_for_instance).
+        :return: (instance iri, asset iri, precision sum) per scanned asset of every active instance
+        """
+        table = self.ps.graph_run(
+            "MATCH (i:"
+            + NodeTypes.ANNOTATION_INSTANCE.value
+            + ")-[:"
+            + RelationshipTypes.INSTANCE_OF.value
+            + "]->(:"
+            + NodeTypes.ANNOTATION_DEFINITION.value
+            + ")<-[:"
+            + RelationshipTypes.OCCURANCE_SCAN.value
+            + "]-(a:"
+            + NodeTypes.ASSET.value
+            + ") WHERE i.activate_occurance_scan IS NULL OR i.activate_occurance_scan = true "
+            + "OPTIONAL MATCH (i)-[:"
+            + RelationshipTypes.DETECTABLE_WITH.value
+            + "]->(m:"
+            + NodeTypes.ANNOTATION_TS_MATCHER.value
+            + ") WITH i, a, collect(m) AS matchers "
+            # Only the assets that have all time-series matched by the matchers of the instance
+            + "WHERE all(m IN matchers WHERE all(t IN [(m)-[:"
+            + RelationshipTypes.TS_MATCH.value
+            + "]->(t:"
+            + NodeTypes.TIMESERIES_INPUT.value
+            + ") | t] WHERE (a)-[:"
+            + RelationshipTypes.HAS_TIMESERIES.value
+            + "]->(t))) "
+            + "RETURN i.iri, a.iri, reduce(s = 0, m IN matchers | s + m.detection_precision)"
+        ).to_table()
+
+        return [(row[0], row[1], row[2]) for row in table]
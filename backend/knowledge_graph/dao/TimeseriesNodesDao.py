@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import Dict, List, Tuple
 
 from py2neo import Node, NodeMatcher, Relationship
 
@@ -23,6 +23,33 @@ from backend.knowledge_graph.knowledge_graph_metamodel_validator import (
     validate_result_nodes,
 )
 
+# Properties determining the runtime behaviour of time-series inputs and connections (see get_runtime_fingerprints)
+TIMESERIES_RUNTIME_PROPERTIES = [
+    "iri",
+    "connection_topic",
+    "connection_keyword",
+    "value_type",
+    "sampling_interval_ms",
+    "deadband",
+    "deadband_relative",
+    "only_changes",
+    "min_write_interval_ms",
+    "max_write_interval_ms",
+]
+RUNTIME_CONNECTION_PROPERTIES = [
+    "host_environment_variable",
+    "port_environment_variable",
+    "user_environment_variable",
+    "key_environment_variable",
+    "type",
+    "sampling_mode",
+    "sampling_interval_ms",
+    "deadband",
+    "replay_begin",
+    "replay_end",
+    "replay_speedup",
+]
+
 
 class TimeseriesNodesDao(object):
     """
@@ -97,6 +124,56 @@ class TimeseriesNodesDao(object):
         timeseries_deep_matches = self.ps.repo_match(model=TimeseriesNodeDeep)
         return timeseries_deep_matches.all()
 
+    @validate_result_nodes
+    def get_timeseries_nodes_deep(self, iris: List[str]) -> List[TimeseriesNodeDeep]:
+        """
+        Queries the specified timeseries nodes. Follows relationships to build nested objects for related nodes
+        """
+        timeseries_deep_matches = self.ps.repo_match(model=TimeseriesNodeDeep).where(
+            "_.iri IN " + json.dumps(iris)
+        )
+        return timeseries_deep_matches.all()
+
+    def get_runtime_fingerprints(
+        self,
+    ) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, str]]:
+        """
+        Queries the settings relevant for the runtime connections without loading the nodes.
+        Used for detecting changes cheaply: the fingerprints change, if settings or relationships change.
+        :return: fingerprint per timeseries iri (including its runtime and database connection iris),
+        fingerprint per runtime connection iri, runtime connection iri per timeseries iri
+        """
+        table = self.ps.graph_run(
+            "MATCH (t:"
+            + NodeTypes.TIMESERIES_INPUT.value
+            + ")-[:"
+            + RelationshipTypes.RUNTIME_ACCESS.value
+            + "]->(r:"
+            + NodeTypes.RUNTIME_CONNECTION.value
+            + ") OPTIONAL MATCH (t)-[:"
+            + RelationshipTypes.TIMESERIES_DB_ACCESS.value
+            + "]->(d:"
+            + NodeTypes.DATABASE_CONNECTION.value
+            + ") RETURN t {"
+            + ", ".join("." + key for key in TIMESERIES_RUNTIME_PROPERTIES)
+            + "}, r.iri, d.iri, r {"
+            + ", ".join("." + key for key in RUNTIME_CONNECTION_PROPERTIES)
+            + "}"
+        ).to_table()
+
+        ts_fingerprints = dict()
+        connection_fingerprints = dict()
+        connection_iris = dict()
+        for ts_settings, connection_iri, db_iri, connection_settings in table:
+            connection_iris[ts_settings["iri"]] = connection_iri
+            ts_fingerprints[ts_settings["iri"]] = json.dumps(
+                [ts_settings, connection_iri, db_iri], sort_keys=True
+            )
+            connection_fingerprints[connection_iri] = json.dumps(
+                connection_settings, sort_keys=True
+            )
+        return ts_fingerprints, connection_fingerprints, connection_iris
+
     # validator used manually because result type is json instead of node-list
     def get_timeseries_deep_json(self):
         """
@@ -0,0 +1,137 @@
+import asyncio
+import concurrent.futures
+import random
+import zlib
+from queue import Full, Queue
+from threading import Lock, Thread, get_ident
+from typing import Callable, Coroutine, Dict, Iterator, List
+
+from util.environment_and_configuration import ConfigGroups, get_configuration_int
+from util.log import logger
+
+# Delays between reconnection attempts (in s): exponentially growing up to the max., randomized
+RECONNECT_BACKOFF_INITIAL = 1
+RECONNECT_BACKOFF_MAX = 60
+
+
+def reconnect_delays() -> Iterator[float]:
+    """Delays for consecutive reconnection attempts of one connection"""
+    delay = RECONNECT_BACKOFF_INITIAL
+    while True:
+        # Randomized, so that connections to the same server do not reconnect at the same time
+        yield delay * random.uniform(0.5, 1)
+        delay = min(delay * 2, RECONNECT_BACKOFF_MAX)
+
+
+class AsyncioRuntimeEngine:
+    """
+    Runs the runtime connections of the asyncio engine (see runtime_connection_engine in the configuration)
+    as coroutines on one shared event loop in a single thread.
+
+    Received readings are handed to the inputs (and their handlers) off the loop by dispatch threads, so that
+    persistence and detection never block receiving. Work is assigned to the dispatch threads by a key
+    (e.g. the topic or node), so that the readings of one time-series stay in order.
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        AsyncioRuntimeEngine.__instance = self
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: Thread | None = None
+        self._dispatch_queues: List[Queue] = []
+        self._lock = Lock()
+
+        self.dispatch_threads_count = get_configuration_int(
+            group=ConfigGroups.API, key="runtime_connection_dispatch_threads"
+        )
+        self.dispatch_queue_size = get_configuration_int(
+            group=ConfigGroups.API, key="runtime_connection_dispatch_queue_size"
+        )
+        self.dropped_total = 0
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = Thread(
+                target=self._loop.run_forever, name="runtime-connections", daemon=True
+            )
+            self._loop_thread.start()
+
+            for i in range(self.dispatch_threads_count):
+                dispatch_queue = Queue(maxsize=self.dispatch_queue_size)
+                self._dispatch_queues.append(dispatch_queue)
+                Thread(
+                    target=self._dispatch_loop,
+                    args=(dispatch_queue,),
+                    name=f"runtime-connections-dispatch-{i}",
+                    daemon=True,
+                ).start()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self._start()
+        return self._loop
+
+    def in_loop_thread(self) -> bool:
+        return self._loop_thread is not None and self._loop_thread.ident == get_ident()
+
+    def run(self, coroutine: Coroutine) -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the loop. Can be called from any thread
+        :return: Future for the result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, function: Callable, *args):
+        """Calls a function in the loop thread (e.g. non thread-safe client methods)"""
+        if self.in_loop_thread():
+            function(*args)
+        else:
+            self.loop.call_soon_threadsafe(function, *args)
+
+    def dispatch(self, key: str, function: Callable, *args):
+        """
+        Calls the function in the dispatch thread assigned to the key.
+        Never blocks: if the queue of that thread is full, the call is dropped
+        """
+        self._start()
+        dispatch_queue = self._dispatch_queues[
+            zlib.crc32(key.encode("utf-8")) % len(self._dispatch_queues)
+        ]
+        try:
+            dispatch_queue.put_nowait((function, args))
+        except Full:
+            self.dropped_total += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "dispatch_queue_depth": sum(
+                dispatch_queue.qsize() for dispatch_queue in self._dispatch_queues
+            ),
+            "dispatch_dropped_total": self.dropped_total,
+        }
+
+    @staticmethod
+    def _dispatch_loop(dispatch_queue: Queue):
+        while True:
+            function, args = dispatch_queue.get()
+            # pylint: disable=W0703
+            try:
+                function(*args)
+            except Exception as exc:
+                # Using generic exception on purpose: one failing reading must not stop the dispatching
+                logger.warning(f"Could not handle reading: {exc}")
@@ -34,11 +34,18 @@ class RuntimeConnection(abc.ABC):
 
         self.iri = iri
         try:
-            self.host = get_environment_variable(
-                key=host_environment_variable, optional=False
+            # Host and port may be None for connections without host (e.g. replays)
+            self.host = (
+                get_environment_variable(key=host_environment_variable, optional=False)
+                if host_environment_variable is not None
+                else None
             )
-            self.port = get_environment_variable_int(
-                key=port_environment_variable, optional=False
+            self.port = (
+                get_environment_variable_int(
+                    key=port_environment_variable, optional=False
+                )
+                if port_environment_variable is not None
+                else None
             )
 
             self.user = (
@@ -82,6 +89,12 @@ class RuntimeConnection(abc.ABC):
     def is_active(self) -> bool:
         return self.active
 
+    def get_metrics(self) -> Dict:
+        """
+        :return: Metrics of the connection (empty if not supported)
+        """
+        return dict()
+
     def remove_ts_input(self, iri: str):
         del self.timeseries_inputs[iri]
 
@@ -1,6 +1,7 @@
 from threading import Thread
+import json
 import time
-from typing import Dict, List
+from typing import Dict, List, Set
 from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
 from graph_domain.main_digital_twin.RuntimeConnectionNode import (
     RuntimeConnectionNode,
@@ -14,21 +15,45 @@ from backend.runtime_connections.RuntimeConnection import RuntimeConnection
 from backend.exceptions.EnvironmentalVariableNotFoundError import (
     EnvironmentalVariableNotFoundError,
 )
+from backend.runtime_connections.AsyncioRuntimeEngine import AsyncioRuntimeEngine
+from backend.runtime_connections.TimeseriesHandlerDispatcher import (
+    HandlerQueuePolicies,
+    TimeseriesHandlerDispatcher,
+)
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from backend.runtime_connections.TimeseriesHotWindow import request_cache_key
+from backend.runtime_connections.mqtt.AsyncioMqttRuntimeConnection import (
+    AsyncioMqttRuntimeConnection,
+)
 from backend.runtime_connections.mqtt.MqttRuntimeConnection import (
     MqttRuntimeConnection,
 )
 from backend.runtime_connections.mqtt.MqttTimeseriesInput import MqttTimeseriesInput
+from backend.runtime_connections.opcua.AsyncioOpcuaRuntimeConnection import (
+    AsyncioOpcuaRuntimeConnection,
+)
 from backend.runtime_connections.opcua.OpcuaRuntimeConnection import (
     OpcuaRuntimeConnection,
 )
 from backend.runtime_connections.opcua.OpcuaTimeseriesInput import OpcuaTimeseriesInput
+from backend.runtime_connections.replay.ReplayRuntimeConnection import (
+    ReplayRuntimeConnection,
+)
+from backend.runtime_connections.replay.ReplayTimeseriesInput import (
+    ReplayTimeseriesInput,
+)
+from backend.runtime_connections.sharding.ShardCoordinator import ShardCoordinator
 from backend.specialized_databases.DatabasePersistenceServiceContainer import (
     DatabasePersistenceServiceContainer,
 )
 from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
     InfluxDbPersistenceService,
 )
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration,
+    get_configuration_int,
+)
 from util.log import logger
 
 
@@ -36,10 +61,19 @@ from util.log import logger
 RT_CONNECTION_MAPPING = {
     RuntimeConnectionTypes.MQTT.value: MqttRuntimeConnection,
     RuntimeConnectionTypes.OPC_UA.value: OpcuaRuntimeConnection,
+    RuntimeConnectionTypes.REPLAY.value: ReplayRuntimeConnection,
+}
+# Connection classes of the asyncio engine (all connections on one event loop).
+# Replays read from the databases in their own thread for both engines
+ASYNCIO_RT_CONNECTION_MAPPING = {
+    RuntimeConnectionTypes.MQTT.value: AsyncioMqttRuntimeConnection,
+    RuntimeConnectionTypes.OPC_UA.value: AsyncioOpcuaRuntimeConnection,
+    RuntimeConnectionTypes.REPLAY.value: ReplayRuntimeConnection,
 }
 RT_INPUT_MAPPING = {
     RuntimeConnectionTypes.MQTT.value: MqttTimeseriesInput,
     RuntimeConnectionTypes.OPC_UA.value: OpcuaTimeseriesInput,
+    RuntimeConnectionTypes.REPLAY.value: ReplayTimeseriesInput,
 }
 
 
@@ -63,7 +97,23 @@ class RuntimeConnectionContainer:
         RuntimeConnectionContainer.__instance = self
 
         self.connections: Dict[str, RuntimeConnection] = {}
+        # Registry of the inputs of all connections, maintained with every change of the connections:
+        self._inputs_by_iri: Dict[str, TimeseriesInput] = {}
+        self._connections_by_input_iri: Dict[str, RuntimeConnection] = {}
+        # Fingerprints of the settings the current inputs and connections were created with:
+        self._ts_fingerprints: Dict[str, str] = {}
+        self._connection_fingerprints: Dict[str, str] = {}
         self._active_connections_status_thread = None
+        self._hot_windows_publish_thread = None
+
+        self.engine = get_configuration(
+            group=ConfigGroups.API, key="runtime_connection_engine"
+        )
+        self.connection_mapping = (
+            ASYNCIO_RT_CONNECTION_MAPPING
+            if self.engine == "asyncio"
+            else RT_CONNECTION_MAPPING
+        )
 
     def start_active_connections_status_thread(self):
         self._active_connections_status_thread = Thread(
@@ -71,35 +121,67 @@ class RuntimeConnectionContainer:
         )
         self._active_connections_status_thread.start()
 
-    def refresh_connection_inputs_and_handlers(self):
+    def start_hot_windows_publish_thread(self):
+        self._hot_windows_publish_thread = Thread(target=self._hot_windows_publish_loop)
+        self._hot_windows_publish_thread.start()
+
+    def refresh_connection_inputs_and_handlers(self) -> Set[str] | None:
         """Refreshes the inputs and handlers, creating new ones if available in the graph, or deleting old ones.
 
-        Args:
-            timeseries_nodes_deep (List[TimeseriesNodeDeep]): _description_
+        Changes are detected by comparing fingerprints of the settings of all time-series and connections
+        (one cheap query). Only changed inputs are recreated, connections only if their own settings changed.
+        If sharded across several backend instances, only the connections owned by this instance (and their
+        inputs) are regarded; connections moved to or from this instance are added or removed like changed ones.
+
+        Returns:
+            Set[str] | None: iris of the removed or recreated inputs. None, if nothing changed
         """
 
         timeseries_nodes_dao: TimeseriesNodesDao = TimeseriesNodesDao.instance()
-        updated_ts_nodes_deep = timeseries_nodes_dao.get_all_timeseries_nodes_deep()
+        (
+            ts_fingerprints,
+            connection_fingerprints,
+            connection_iris,
+        ) = timeseries_nodes_dao.get_runtime_fingerprints()
+        owned_connection_iris = ShardCoordinator.instance().update_ownership(
+            set(connection_fingerprints.keys())
+        )
+        connection_fingerprints = {
+            iri: fingerprint
+            for iri, fingerprint in connection_fingerprints.items()
+            if iri in owned_connection_iris
+        }
+        ts_fingerprints = {
+            iri: fingerprint
+            for iri, fingerprint in ts_fingerprints.items()
+            if connection_iris[iri] in owned_connection_iris
+        }
+        if (
+            ts_fingerprints == self._ts_fingerprints
+            and connection_fingerprints == self._connection_fingerprints
+        ):
+            return None
+        logger.info("Time-series inputs or runtime connections changed. Refreshing...")
 
         #
-        # Check if ts inputs or connections have been removed:
+        # Check if ts inputs or connections have been removed or changed:
         #
-        updated_connection_iri_list = set(
-            [ts_node.runtime_connection.iri for ts_node in updated_ts_nodes_deep]
-        )
-        updated_ts_input_iri_list = set(
-            [ts_node.iri for ts_node in updated_ts_nodes_deep]
-        )
+        removed_ts_input_iris = set()
 
         removed_connections = [
             con
             for con in self.connections.values()
-            if con.iri not in updated_connection_iri_list
+            if connection_fingerprints.get(con.iri)
+            != self._connection_fingerprints.get(con.iri)
         ]
         for con in removed_connections:
-            # Whole connection was removed!
+            # Whole connection was removed or changed (recreated with all its inputs)!
             # Unregister all inputs and the connection
             con.disconnect()
+            for ts_input in con.timeseries_inputs.values():
+                ts_input.remove_all_handlers()
+                removed_ts_input_iris.add(ts_input.iri)
+                self._unregister_input(ts_input.iri)
             self.connections.pop(con.iri)
             del con
 
@@ -109,7 +191,8 @@ class RuntimeConnectionContainer:
                 [
                     (ts_input, con)
                     for ts_input in con.timeseries_inputs.values()
-                    if ts_input.iri not in updated_ts_input_iri_list
+                    if ts_fingerprints.get(ts_input.iri)
+                    != self._ts_fingerprints.get(ts_input.iri)
                 ]
             )
 
@@ -117,15 +200,18 @@ class RuntimeConnectionContainer:
         con: RuntimeConnection
         for (ts_input, con) in removed_inputs:
             con.remove_ts_input(ts_input.iri)
+            ts_input.remove_all_handlers()
+            self._unregister_input(ts_input.iri)
+            removed_ts_input_iris.add(ts_input.iri)
+
+        self._ts_fingerprints = ts_fingerprints
+        self._connection_fingerprints = connection_fingerprints
 
         #
         # Initialize new ts inputs and connections
         #
         old_ts_connection_iris = [con.iri for con in self.connections.values()]
-        old_ts_input_iris = set()
-        for con in self.connections.values():
-            for ts in con.timeseries_inputs.values():
-                old_ts_input_iris.add(ts.iri)
+        old_ts_input_iris = set(self._inputs_by_iri.keys())
 
         # Prepare nodes to avoid redundand connections:
         # Get current connection nodes
@@ -133,6 +219,11 @@ class RuntimeConnectionContainer:
         new_connection_nodes: Dict[str, RuntimeConnectionNode] = {}
         new_ts_inputs_per_connection: Dict[str, List[TimeseriesInput]] = {}
 
+        # Only the new (or recreated) nodes are loaded:
+        updated_ts_nodes_deep = timeseries_nodes_dao.get_timeseries_nodes_deep(
+            [iri for iri in ts_fingerprints.keys() if iri not in old_ts_input_iris]
+        )
+
         ts_node: TimeseriesNodeDeep
         for ts_node in updated_ts_nodes_deep:
             if ts_node.iri in old_ts_input_iris:
@@ -174,21 +265,26 @@ class RuntimeConnectionContainer:
                 )
             )
 
+            # Persistence must not lose readings and must not delay receiving: the write buffer and spool of
+            # the service apply the backpressure
             ts_input.register_handler(
-                handler_method=ts_service.write_measurement, handler_id=ts_service.iri
+                handler_method=ts_service.write_measurement,
+                handler_id=ts_service.iri,
+                queue_policy=HandlerQueuePolicies.UNBOUNDED.value,
             )
 
             if not new_connection:
-                self.connections.get(ts_node.runtime_connection.iri).timeseries_inputs[
-                    ts_node.iri
-                ] = ts_input
+                # Subscribes to the new input at the running connection
+                con = self.connections.get(ts_node.runtime_connection.iri)
+                con.add_ts_input(ts_input)
+                self._register_input(ts_input, con)
 
         # Add new connections
         rt_con_node: RuntimeConnectionNode
         for rt_con_node in new_connection_nodes.values():
 
             # Create actual connections:
-            input_class = RT_CONNECTION_MAPPING.get(rt_con_node.type)
+            input_class = self.connection_mapping.get(rt_con_node.type)
 
             try:
                 rt_connection: RuntimeConnection = (
@@ -201,6 +297,8 @@ class RuntimeConnectionContainer:
                 rt_connection.timeseries_inputs = new_ts_inputs_per_connection.get(
                     rt_con_node.iri
                 )
+                for ts_input in rt_connection.timeseries_inputs.values():
+                    self._register_input(ts_input, rt_connection)
                 # Start the connection
 
                 rt_connection.start_connection()
@@ -208,39 +306,142 @@ class RuntimeConnectionContainer:
                 logger.info(
                     f"Setup of RuntimeConnection canceled because of missing environmetal variable: {rt_con_node.caption}"
                 )
+                # Not regarded as set up, so that it is retried with the next refresh:
+                self.connections.pop(rt_con_node.iri, None)
+                for ts_input in new_ts_inputs_per_connection.get(
+                    rt_con_node.iri, {}
+                ).values():
+                    ts_input.remove_all_handlers()
+                    self._unregister_input(ts_input.iri)
+                    self._ts_fingerprints.pop(ts_input.iri, None)
+                self._connection_fingerprints.pop(rt_con_node.iri, None)
+
+        return removed_ts_input_iris
 
     def get_runtime_connection(self, iri: str):
         return self.connections.get(iri)
 
     def register_runtime_connection(self, iri: str, connection: RuntimeConnection):
         self.connections[iri] = connection
+        for ts_input in connection.timeseries_inputs.values():
+            self._register_input(ts_input, connection)
+
+    def _register_input(self, ts_input: TimeseriesInput, connection: RuntimeConnection):
+        self._inputs_by_iri[ts_input.iri] = ts_input
+        self._connections_by_input_iri[ts_input.iri] = connection
+
+    def _unregister_input(self, iri: str):
+        self._inputs_by_iri.pop(iri, None)
+        self._connections_by_input_iri.pop(iri, None)
 
     def get_all_inputs(self) -> List[TimeseriesInput]:
         """
         :return: All sensor inputs (both MQTT and OPCUA)
         """
-        inputs = []
-        con: RuntimeConnection
-        for con in self.connections.values():
-            inputs.extend(con.timeseries_inputs.values())
+        return list(self._inputs_by_iri.values())
+
+    def get_timeseries_input_by_iri(self, iri: str) -> TimeseriesInput | None:
+        return self._inputs_by_iri.get(iri)
 
+    def get_timeseries_inputs_by_iris(
+        self, iris: List[str]
+    ) -> Dict[str, TimeseriesInput]:
+        """
+        :return: The existing inputs of the given iris (missing ones are skipped)
+        """
+        inputs = dict()
+        for iri in iris:
+            ts_input = self._inputs_by_iri.get(iri)
+            if ts_input is not None:
+                inputs[iri] = ts_input
         return inputs
 
-    def get_timeseries_input_by_iri(self, iri: str):
-        ts_input_list = [
-            ts_input for ts_input in self.get_all_inputs() if ts_input.iri == iri
-        ]
-        if len(ts_input_list) > 0:
-            return ts_input_list[0]
+    def get_runtime_connection_for_input(self, iri: str) -> RuntimeConnection | None:
+        return self._connections_by_input_iri.get(iri)
+
+    def get_runtime_connections_for_inputs(
+        self, iris: List[str]
+    ) -> Dict[str, RuntimeConnection]:
+        """
+        :return: The connection per input iri (missing inputs are skipped)
+        """
+        connections = dict()
+        for iri in iris:
+            connection = self._connections_by_input_iri.get(iri)
+            if connection is not None:
+                connections[iri] = connection
+        return connections
 
     def get_active_connections_count(self) -> int:
 
         return len([True for con in self.connections.values() if con.is_active()])
 
+    def get_ingest_metrics(self) -> Dict:
+        """
+        :return: Count of received and suppressed readings in total and per time-series with an ingest filter.
+        Queue depths, dropped readings and latencies per handler.
+        Metrics of the connections supporting them (e.g. throughput and lag of replays).
+        For the asyncio engine, also the depth of the dispatch queues and the count of dropped readings
+        """
+        inputs = self.get_all_inputs()
+        metrics = {
+            "readings_total": sum(ts_input.readings_total for ts_input in inputs),
+            "suppressed_readings_total": sum(
+                ts_input.suppressed_readings_total for ts_input in inputs
+            ),
+            "filtered_timeseries": {
+                ts_input.iri: {
+                    "readings_total": ts_input.readings_total,
+                    "suppressed_readings_total": ts_input.suppressed_readings_total,
+                }
+                for ts_input in inputs
+                if ts_input.ingest_filter is not None
+            },
+        }
+        metrics["handlers"] = TimeseriesHandlerDispatcher.instance().get_metrics()
+        connection_metrics = {
+            con.iri: con.get_metrics() for con in list(self.connections.values())
+        }
+        metrics["connections"] = {
+            iri: con_metrics
+            for iri, con_metrics in connection_metrics.items()
+            if len(con_metrics) > 0
+        }
+        if self.engine == "asyncio":
+            # Readings received but not yet handed to the inputs
+            metrics.update(AsyncioRuntimeEngine.instance().get_metrics())
+        return metrics
+
+    def _hot_windows_publish_loop(self):
+        """
+        Publishes the hot windows of the inputs requested by the API workers to the inter-process cache
+        """
+        interval = (
+            get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_hot_window_publish_interval_ms"
+            )
+            / 1000
+        )
+        while True:
+            time.sleep(interval)
+            inputs = self.get_all_inputs()
+            if len(inputs) == 0:
+                continue
+            # One request for all inputs:
+            requested_keys = memcache.get_many(
+                [request_cache_key(ts_input.iri) for ts_input in inputs]
+            )
+            for ts_input in inputs:
+                if request_cache_key(ts_input.iri) in requested_keys:
+                    ts_input.hot_window.publish()
+
     def _active_connections_write_to_cache_loop(self):
         while True:
             memcache.set(
                 "active_runtime_connections_count", self.get_active_connections_count()
             )
+            memcache.set(
+                "timeseries_ingest_metrics", json.dumps(self.get_ingest_metrics())
+            )
 
             time.sleep(3)
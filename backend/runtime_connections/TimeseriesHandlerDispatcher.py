@@ -0,0 +1,251 @@
+import time
+from collections import deque
+from enum import Enum
+from queue import Full, Queue
+from threading import Lock, Thread, current_thread
+from typing import Callable, Dict
+
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration,
+    get_configuration_int,
+)
+from util.log import logger
+
+# Count of recent readings the latency percentiles are calculated from
+LATENCY_SAMPLE_SIZE = 1000
+# Max. time to wait for the worker of a stopped handler (in s)
+HANDLER_STOP_TIMEOUT = 10
+
+
+class HandlerQueuePolicies(Enum):
+    # Readings are dropped, if the queue of the handler is full. Receiving never waits
+    DROP = "DROP"
+    # Waits for free space (max. the block timeout, dropped afterwards)
+    BLOCK = "BLOCK"
+    # The queue is not bounded: receiving never waits and readings are never dropped. For handlers that must
+    # not lose readings and apply backpressure themselves (e.g. persistence via the write buffer and spool)
+    UNBOUNDED = "UNBOUNDED"
+
+
+class _HandlerQueue:
+    """
+    Queue with one worker thread for one handler (bounded, unless the policy is UNBOUNDED). Readings are handled
+    in the order received
+    """
+
+    def __init__(
+        self, handler_id: str, max_size: int, policy: str, block_timeout_s: float
+    ):
+        self.handler_id = handler_id
+        self.policy = policy
+        self.block_timeout_s = block_timeout_s
+        self.queue = Queue(
+            maxsize=max_size if policy != HandlerQueuePolicies.UNBOUNDED.value else 0
+        )
+        # Count of inputs using the handler. The worker stops when no input uses it anymore
+        self.registrations = 0
+        self._stopping = False
+        # Set when stopping: the remaining queued readings are not handled anymore
+        self._discard = False
+
+        self.enqueued_total = 0
+        self.handled_total = 0
+        self.dropped_total = 0
+        self.errors_total = 0
+        # Time between receiving and handling (in s)
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+        self.worker = Thread(
+            target=self._worker_loop, name=f"handler-{handler_id}", daemon=True
+        )
+        self.worker.start()
+
+    def put(self, handler: Callable, args, wait: bool = False):
+        """
+        :param wait: waits for free space regardless of the policy (no timeout, until the handler is stopped)
+        """
+        if self._stopping:
+            return
+        item = (time.monotonic(), handler, args)
+        try:
+            if wait:
+                while True:
+                    try:
+                        self.queue.put(item, timeout=self.block_timeout_s)
+                        break
+                    except Full:
+                        if self._stopping:
+                            return
+            elif self.policy == HandlerQueuePolicies.BLOCK.value:
+                self.queue.put(item, timeout=self.block_timeout_s)
+            else:
+                self.queue.put_nowait(item)
+            self.enqueued_total += 1
+        except Full:
+            self.dropped_total += 1
+            if self.dropped_total == 1 or self.dropped_total % 10000 == 0:
+                logger.warning(
+                    f"Handler {self.handler_id} can not keep up: {self.dropped_total} readings dropped so far"
+                )
+
+    def stop(self):
+        """
+        Stops the worker and waits for it (max. the stop timeout). Queued readings are discarded for the DROP
+        policy, so that a stopped handler (e.g. detector) is not called anymore, and still handled otherwise
+        """
+        self._stopping = True
+        self._discard = self.policy == HandlerQueuePolicies.DROP.value
+        try:
+            self.queue.put_nowait(None)
+        except Full:
+            # The worker stops after the queued readings (see _worker_loop)
+            pass
+        if current_thread() is self.worker:
+            return
+        self.worker.join(timeout=HANDLER_STOP_TIMEOUT)
+        if self.worker.is_alive():
+            logger.warning(
+                f"Handler {self.handler_id} did not stop within {HANDLER_STOP_TIMEOUT} s: "
+                f"{self.queue.qsize()} readings still queued"
+            )
+
+    def _worker_loop(self):
+        while True:
+            if self._stopping and self.queue.empty():
+                return
+            item = self.queue.get()
+            if item is None:
+                return
+            if self._discard:
+                self.dropped_total += 1
+                continue
+            enqueued_time, handler, args = item
+            # pylint: disable=W0703
+            try:
+                handler(*args)
+            except Exception as exc:
+                # Using generic exception on purpose: one failing reading must not stop the handler
+                self.errors_total += 1
+                logger.warning(f"Handler {self.handler_id} failed: {exc}")
+            self.handled_total += 1
+            self.latencies.append(time.monotonic() - enqueued_time)
+
+    def get_metrics(self) -> Dict:
+        latencies = sorted(self.latencies)
+
+        def percentile_ms(percentile: float):
+            if len(latencies) == 0:
+                return None
+            return round(
+                latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+                * 1000,
+                3,
+            )
+
+        return {
+            "policy": self.policy,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "handled_total": self.handled_total,
+            "dropped_total": self.dropped_total,
+            "errors_total": self.errors_total,
+            "latency_ms_p50": percentile_ms(0.5),
+            "latency_ms_p99": percentile_ms(0.99),
+        }
+
+
+class TimeseriesHandlerDispatcher:
+    """
+    Decouples the handlers of the time-series inputs (persistence, detectors) from receiving the readings.
+
+    Each handler (identified by its handler id, e.g. one persistence service for all its time-series) gets a
+    queue and a worker thread. A slow handler only delays its own readings, never receiving or other handlers.
+    Persistence uses an unbounded queue, as the write buffer and spool of the persistence service apply the
+    backpressure without losing readings.
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        TimeseriesHandlerDispatcher.__instance = self
+
+        self._queues: Dict[str, _HandlerQueue] = dict()
+        self._lock = Lock()
+
+        self.queue_size = get_configuration_int(
+            group=ConfigGroups.API, key="timeseries_handler_queue_size"
+        )
+        self.default_policy = get_configuration(
+            group=ConfigGroups.API, key="timeseries_handler_queue_policy"
+        )
+        self.block_timeout_s = (
+            get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_handler_block_timeout_ms"
+            )
+            / 1000
+        )
+
+    def register(self, handler_id: str, policy: str | None = None):
+        """
+        Registers the use of a handler by one input. Creates the queue of the handler, if not yet existing
+        :param policy: policy for full queues (see HandlerQueuePolicies). None: configured default.
+        """
+        with self._lock:
+            handler_queue = self._queues.get(handler_id)
+            if handler_queue is None:
+                handler_queue = _HandlerQueue(
+                    handler_id=handler_id,
+                    max_size=self.queue_size,
+                    policy=policy if policy is not None else self.default_policy,
+                    block_timeout_s=self.block_timeout_s,
+                )
+                self._queues[handler_id] = handler_queue
+            handler_queue.registrations += 1
+
+    def unregister(self, handler_id: str):
+        """
+        Unregisters the use of a handler by one input. Removes the queue if the handler is not used anymore.
+        The handler is not called anymore afterwards (see _HandlerQueue.stop())
+        """
+        with self._lock:
+            handler_queue = self._queues.get(handler_id)
+            if handler_queue is None:
+                return
+            handler_queue.registrations -= 1
+            if handler_queue.registrations > 0:
+                return
+            del self._queues[handler_id]
+        # Outside of the lock, as the remaining readings might still be handled
+        handler_queue.stop()
+
+    def dispatch(self, handler_id: str, handler: Callable, *args, wait: bool = False):
+        """
+        Queues one reading for the handler. Never blocks for the DROP and UNBOUNDED policies, unless waiting is
+        requested
+        :param wait: waits for free space instead of applying the policy of the handler. For sources that can
+        be slowed down without losing readings (e.g. replays)
+        """
+        handler_queue = self._queues.get(handler_id)
+        if handler_queue is None:
+            # Removed in the meantime
+            return
+        handler_queue.put(handler, args, wait=wait)
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """
+        :return: queue depth, dropped readings, errors and latency percentiles per handler
+        """
+        return {
+            handler_id: handler_queue.get_metrics()
+            for handler_id, handler_queue in list(self._queues.items())
+        }
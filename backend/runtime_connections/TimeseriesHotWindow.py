@@ -0,0 +1,191 @@
+import hashlib
+import struct
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+from util import timeseries_wire_format
+from util.environment_and_configuration import ConfigGroups, get_configuration_int
+from util.inter_process_cache import memcache
+from util.log import logger
+
+VALUE_DTYPES = {
+    TimeseriesValueTypes.DECIMAL.value: np.float64,
+    TimeseriesValueTypes.INT.value: np.int64,
+    TimeseriesValueTypes.BOOL.value: np.bool_,
+}
+
+# Coverage start and publishing time (ns since epoch) followed by the readings in the wire format
+PUBLISHED_HEADER = struct.Struct("<qq")
+# Time a request for a window stays valid without being renewed (in s)
+REQUEST_TTL = 30
+
+
+def _cache_key(prefix: str, iri: str) -> str:
+    # IRIs can be longer than allowed for memcache keys and contain illegal characters
+    return prefix + hashlib.sha1(iri.encode("utf-8")).hexdigest()
+
+
+def request_cache_key(iri: str) -> str:
+    return _cache_key("hot_window_request_", iri)
+
+
+class TimeseriesHotWindow:
+    """
+    Ring buffer with the most recent readings of a time-series input, limited by count and age.
+    Backed by preallocated NumPy arrays for the timestamps (ns since epoch, UTC) and values.
+
+    The readings are only received in the backend process. API worker processes request a window
+    (request()), which is then published to the inter-process cache periodically (publish()) and read
+    from there (read_published()).
+    """
+
+    def __init__(self, iri: str, value_type: str, capacity: int, max_age_s: float):
+        self.iri = iri
+        self.capacity = capacity
+        self.max_age_ns = int(max_age_s * 1_000_000_000)
+
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._values = np.empty(capacity, dtype=VALUE_DTYPES.get(value_type, object))
+        # Index of the oldest reading and count of readings
+        self._start = 0
+        self._count = 0
+        # All readings from this time on (inclusive) are in the window. None: no readings yet
+        self._coverage_start_ns: int | None = None
+        self._lock = Lock()
+
+    @classmethod
+    def from_configuration(cls, iri: str, value_type: str):
+        return cls(
+            iri=iri,
+            value_type=value_type,
+            capacity=get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_hot_window_size"
+            ),
+            max_age_s=get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_hot_window_duration_s"
+            ),
+        )
+
+    def append(self, reading_time: datetime, value):
+        if reading_time.tzinfo is None:
+            # Same interpretation as for the points written to the database
+            reading_time = reading_time.replace(tzinfo=timezone.utc)
+        time_ns = int(reading_time.timestamp() * 1_000_000) * 1000
+
+        with self._lock:
+            if self._coverage_start_ns is None:
+                self._coverage_start_ns = time_ns
+
+            if self._count > 0:
+                newest_ns = self._times[(self._start + self._count - 1) % self.capacity]
+                if time_ns < newest_ns:
+                    # Out of order: not added, so the window only covers the readings after it
+                    self._coverage_start_ns = max(self._coverage_start_ns, time_ns + 1)
+                    self._evict_uncovered()
+                    return
+
+            if self._count == self.capacity:
+                self._evict_oldest()
+            index = (self._start + self._count) % self.capacity
+            self._times[index] = time_ns
+            self._values[index] = value
+            self._count += 1
+
+            # Evict by age:
+            while (
+                self._count > 0 and self._times[self._start] < time_ns - self.max_age_ns
+            ):
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        evicted_ns = self._times[self._start]
+        self._start = (self._start + 1) % self.capacity
+        self._count -= 1
+        # Readings up to the evicted one are not covered anymore:
+        self._coverage_start_ns = max(self._coverage_start_ns, int(evicted_ns) + 1)
+
+    def _evict_uncovered(self):
+        while self._count > 0 and self._times[self._start] < self._coverage_start_ns:
+            self._evict_oldest()
+
+    def snapshot(self) -> Tuple[int | None, pd.DataFrame]:
+        """
+        :return: coverage start (ns since epoch), dataframe with the columns "time" (UTC) and "value"
+        """
+        with self._lock:
+            indices = (self._start + np.arange(self._count)) % self.capacity
+            times = self._times[indices]
+            values = self._values[indices]
+            coverage_start_ns = self._coverage_start_ns
+        return coverage_start_ns, pd.DataFrame(
+            {
+                "time": pd.DatetimeIndex(times.view("datetime64[ns]"), tz="UTC"),
+                "value": values,
+            }
+        )
+
+    def publish(self):
+        """
+        Writes the window to the inter-process cache. Should only be called for requested windows
+        (see request_cache_key())
+        """
+        coverage_start_ns, df = self.snapshot()
+        if coverage_start_ns is None:
+            return
+        # pylint: disable=W0703
+        try:
+            memcache.set(
+                _cache_key("hot_window_", self.iri),
+                PUBLISHED_HEADER.pack(coverage_start_ns, time.time_ns())
+                + timeseries_wire_format.encode_dataframe(df),
+            )
+        except Exception as exc:
+            # Using generic exception on purpose: e.g. unsupported values or too large for the cache.
+            # The queries will be answered by the database
+            logger.debug(f"Could not publish the hot window of {self.iri}: {exc}")
+
+    @staticmethod
+    def request(iri: str):
+        """Requests the window of the given input to be published (valid for some seconds)"""
+        memcache.set(request_cache_key(iri), b"1", expire=REQUEST_TTL)
+
+    @staticmethod
+    def read_published(
+        iri: str, begin_time: datetime, end_time: datetime
+    ) -> pd.DataFrame | None:
+        """
+        Reads the readings in [begin, end) from the published window of the given input.
+        Requests the window to be published for following queries.
+        :return: None, if the published window does not cover the whole range
+        """
+        TimeseriesHotWindow.request(iri)
+        published = memcache.get(_cache_key("hot_window_", iri))
+        if published is None:
+            return None
+
+        coverage_start_ns, published_ns = PUBLISHED_HEADER.unpack_from(published, 0)
+        begin_ns = int(begin_time.astimezone().timestamp() * 1_000_000) * 1000
+        end_ns = int(end_time.astimezone().timestamp() * 1_000_000) * 1000
+        publish_interval_ns = (
+            get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_hot_window_publish_interval_ms"
+            )
+            * 1_000_000
+        )
+        if begin_ns < coverage_start_ns or (
+            # Outdated (e.g. the input has been removed or the backend stopped publishing):
+            time.time_ns() - published_ns
+            > 3 * publish_interval_ns
+        ):
+            return None
+
+        df = timeseries_wire_format.decode_dataframe(published[PUBLISHED_HEADER.size :])
+        times_ns = df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        mask = (times_ns >= begin_ns) & (times_ns < end_ns)
+        return df.loc[mask].reset_index(drop=True)
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesNodeFlat
+
+
+class TimeseriesIngestFilter:
+    """
+    Decides per reading of one time-series, whether it is handled (written and passed to the detectors)
+    or suppressed as redundant.
+
+    A reading is handled, if
+    - it is the first one,
+    - or the max. write interval (heartbeat) has passed since the last handled reading,
+    - or the min. write interval has passed and the value changed by more than the deadbands
+      (any change for only_changes, always if neither is set).
+    Non-numeric values (including booleans) only count as changed if they differ.
+
+    The heartbeat is triggered by readings: a constant signal is still handled once per max. write interval,
+    while no readings are made up if the source stops sending.
+    """
+
+    def __init__(
+        self,
+        deadband: float | None = None,
+        deadband_relative: float | None = None,
+        only_changes: bool = False,
+        min_write_interval_ms: int | None = None,
+        max_write_interval_ms: int | None = None,
+    ):
+        """
+        :param deadband: min. absolute change
+        :param deadband_relative: min. change relative to the last handled value (e.g. 0.01 for 1 %)
+        :param only_changes: suppress readings with unchanged values
+        :param min_write_interval_ms: min. time between handled readings
+        :param max_write_interval_ms: max. time between handled readings (heartbeat)
+        """
+        self.deadband = deadband
+        self.deadband_relative = deadband_relative
+        self.change_based = (
+            only_changes or deadband is not None or deadband_relative is not None
+        )
+        self.min_write_interval_s = (
+            min_write_interval_ms / 1000 if min_write_interval_ms is not None else None
+        )
+        self.max_write_interval_s = (
+            max_write_interval_ms / 1000 if max_write_interval_ms is not None else None
+        )
+
+        self._last_time: datetime | None = None
+        self._last_value = None
+
+    @classmethod
+    def from_timeseries_node(cls, node: TimeseriesNodeFlat):
+        """
+        :return: The filter configured for the node, or None if no reduction is configured
+        """
+        if (
+            node.deadband is None
+            and node.deadband_relative is None
+            and not node.only_changes
+            and node.min_write_interval_ms is None
+            and node.max_write_interval_ms is None
+        ):
+            return None
+
+        return cls(
+            deadband=node.deadband,
+            deadband_relative=node.deadband_relative,
+            only_changes=bool(node.only_changes),
+            min_write_interval_ms=node.min_write_interval_ms,
+            max_write_interval_ms=node.max_write_interval_ms,
+        )
+
+    def passes(self, reading_time: datetime, value) -> bool:
+        """
+        Checks the (already converted) reading. Remembers it as last handled reading, if it passes
+        """
+        if self._last_time is None:
+            return self._handled(reading_time, value)
+
+        elapsed_s = (reading_time - self._last_time).total_seconds()
+        if (
+            self.max_write_interval_s is not None
+            and elapsed_s >= self.max_write_interval_s
+        ):
+            return self._handled(reading_time, value)
+        if (
+            self.min_write_interval_s is not None
+            and elapsed_s < self.min_write_interval_s
+        ):
+            return False
+        if self.change_based and not self._changed(value):
+            return False
+
+        return self._handled(reading_time, value)
+
+    def _changed(self, value) -> bool:
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, (int, float))
+            or not isinstance(self._last_value, (int, float))
+        ):
+            return value != self._last_value
+
+        change = abs(value - self._last_value)
+        if self.deadband is not None and change <= self.deadband:
+            return False
+        if (
+            self.deadband_relative is not None
+            and change <= self.deadband_relative * abs(self._last_value)
+        ):
+            return False
+        return change > 0
+
+    def _handled(self, reading_time: datetime, value) -> bool:
+        self._last_time = reading_time
+        self._last_value = value
+        return True
@@ -1,18 +1,29 @@
 import abc
 from ctypes.wintypes import BOOL
 from datetime import datetime
-from math import floor
-from typing import Tuple, Dict
+from typing import Dict, List, Tuple
 
-from graph_domain.main_digital_twin.TimeseriesNode import (
-    TimeseriesNodeFlat,
-    TimeseriesValueTypes,
+from backend.runtime_connections.TimeseriesHandlerDispatcher import (
+    TimeseriesHandlerDispatcher,
 )
+from backend.runtime_connections.TimeseriesHotWindow import TimeseriesHotWindow
+from backend.runtime_connections.TimeseriesIngestFilter import TimeseriesIngestFilter
+from backend.runtime_connections.value_coercion import value_converter, values_converter
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesNodeFlat
 
 
 class TimeseriesInput(abc.ABC):
+    # Waits for the handlers instead of dropping readings if their queues are full. For sources that can be
+    # slowed down (backpressure), unlike live connections
+    wait_for_handlers = False
+
     def __init__(
-        self, iri: str, connection_topic: str, connection_keyword: str, value_type: str
+        self,
+        iri: str,
+        connection_topic: str,
+        connection_keyword: str,
+        value_type: str,
+        ingest_filter: TimeseriesIngestFilter | None = None,
     ):
         self._last_reading: Tuple[datetime, float | int | bool | str] = None
         self._handlers: Dict[str, callable] = dict()
@@ -20,6 +31,14 @@ class TimeseriesInput(abc.ABC):
         self.connection_topic = connection_topic
         self.connection_keyword = connection_keyword
         self.value_type = value_type
+        # Suppresses redundant readings (None: all readings are handled)
+        self.ingest_filter = ingest_filter
+        self.readings_total = 0
+        self.suppressed_readings_total = 0
+        # Most recent readings, used to answer queries for recent ranges without the database
+        self.hot_window = TimeseriesHotWindow.from_configuration(
+            iri=iri, value_type=value_type
+        )
 
     @classmethod
     def from_timeseries_node(cls, node: TimeseriesNodeFlat):
@@ -28,6 +47,7 @@ class TimeseriesInput(abc.ABC):
             connection_topic=node.connection_topic,
             connection_keyword=node.connection_keyword,
             value_type=node.value_type,
+            ingest_filter=TimeseriesIngestFilter.from_timeseries_node(node),
         )
 
     def get_most_current(self) -> Tuple[datetime, int | float | bool | str]:
@@ -36,17 +56,54 @@ class TimeseriesInput(abc.ABC):
         """
         return self._last_reading
 
-    def register_handler(self, handler_method, handler_id: str) -> None:
+    def register_handler(
+        self, handler_method, handler_id: str, queue_policy: str | None = None
+    ) -> None:
         """
-        Registers a given handler method to be called whenever a reading is being received
+        Registers a given handler method to be called whenever a reading is being received.
+        The handler is called asynchronously by the worker of the handler id (see TimeseriesHandlerDispatcher)
         :param handler_method: Callable taking three arguments: id_uri: str, value: Any,
         reading_time: datetime.
+        :param queue_policy: behaviour if the handler can not keep up (see HandlerQueuePolicies).
+        None: configured default
         :return: None
         """
+        if handler_id not in self._handlers:
+            TimeseriesHandlerDispatcher.instance().register(
+                handler_id, policy=queue_policy
+            )
         self._handlers[handler_id] = handler_method
 
     def remove_handler(self, handler_id: str):
-        self._handlers.pop(handler_id)
+        if self._handlers.pop(handler_id, None) is not None:
+            TimeseriesHandlerDispatcher.instance().unregister(handler_id)
+
+    def remove_all_handlers(self):
+        for handler_id in list(self._handlers.keys()):
+            self.remove_handler(handler_id)
+
+    @property
+    def value_type(self) -> str:
+        return self._value_type
+
+    @value_type.setter
+    def value_type(self, value_type: str):
+        # Conversion resolved once instead of per reading:
+        self._value_type = value_type
+        self._convert = value_converter(value_type)
+        self._convert_many = values_converter(value_type)
+
+    def handle_readings(self, reading_times: List[datetime], reading_values: List):
+        """
+        Called for a batch of readings (in order). The values are converted together
+        :param reading_times:
+        :param reading_values:
+        :return:
+        """
+        for reading_time, reading_value in zip(
+            reading_times, self._convert_many(reading_values)
+        ):
+            self._handle_converted_reading(reading_time, reading_value)
 
     def handle_reading(self, reading_time, reading_value):
         """
@@ -55,27 +112,28 @@ class TimeseriesInput(abc.ABC):
         :param reading_value:
         :return:
         """
-        if self.value_type == TimeseriesValueTypes.STRING.value:
-            reading_value = str(reading_value)
-        elif self.value_type == TimeseriesValueTypes.DECIMAL.value:
-            reading_value = float(reading_value)
-        elif self.value_type == TimeseriesValueTypes.INT.value:
-            reading_value = floor(float(reading_value))
-        elif self.value_type == TimeseriesValueTypes.BOOL.value:
-            if isinstance(reading_value, bool):
-                pass
-            elif isinstance(reading_value, float):
-                reading_value = bool(reading_value)
-            elif isinstance(reading_value, str):
-                reading_value = (
-                    reading_value == "True"
-                    or reading_value == "true"
-                    or reading_value == "t"
-                )
+        self._handle_converted_reading(reading_time, self._convert(reading_value))
 
-        if isinstance(reading_value, str):
-            pass
-
-        for handler in self._handlers.values():
-            handler(self.iri, reading_value, reading_time)
+    def _handle_converted_reading(self, reading_time, reading_value):
+        # Always the most current reading, even if suppressed:
         self._last_reading = reading_time, reading_value
+        self.readings_total += 1
+        if self.ingest_filter is not None and not self.ingest_filter.passes(
+            reading_time, reading_value
+        ):
+            self.suppressed_readings_total += 1
+            return
+
+        # Handled by the workers, so that receiving never waits for persistence or detection
+        if len(self._handlers) > 0:
+            dispatcher = TimeseriesHandlerDispatcher.instance()
+            for handler_id, handler in list(self._handlers.items()):
+                dispatcher.dispatch(
+                    handler_id,
+                    handler,
+                    self.iri,
+                    reading_value,
+                    reading_time,
+                    wait=self.wait_for_handlers,
+                )
+        self.hot_window.append(reading_time, reading_value)
@@ -0,0 +1,159 @@
+import asyncio
+import functools
+
+import paho.mqtt.client as mqtt
+
+from backend.runtime_connections.AsyncioRuntimeEngine import (
+    AsyncioRuntimeEngine,
+    reconnect_delays,
+)
+from backend.runtime_connections.mqtt.MqttRuntimeConnection import (
+    MqttRuntimeConnection,
+)
+from util.log import logger
+
+MISC_LOOP_INTERVAL = 1  # interval for keepalive pings and retries (in s)
+
+
+class AsyncioMqttRuntimeConnection(MqttRuntimeConnection):
+    """
+    MQTT connection running on the shared event loop of the asyncio engine instead of an own network thread.
+
+    The MQTT client does the protocol handling, while the loop watches its socket and triggers reading and writing.
+    Received messages are decoded and handed to the inputs by the dispatch threads of the engine (keyed by topic).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._engine = AsyncioRuntimeEngine.instance()
+        self._future = None
+        self._misc_task: asyncio.Task | None = None
+        self._disconnected: asyncio.Event | None = None
+        self._stopped = False
+        # Whether the broker accepted the last connection
+        self._accepted = False
+
+    # override
+    def start_connection(self):
+        for timeseries_input in self.timeseries_inputs.values():
+            self._topic_index.add(timeseries_input)
+
+        self.mqtt_client.on_message = self._on_message
+        self.mqtt_client.on_disconnect = self._on_disconnect
+        self.mqtt_client.on_connect = self._on_connect
+
+        self.mqtt_client.on_socket_open = self._on_socket_open
+        self.mqtt_client.on_socket_close = self._on_socket_close
+        self.mqtt_client.on_socket_register_write = self._on_socket_register_write
+        self.mqtt_client.on_socket_unregister_write = self._on_socket_unregister_write
+
+        self._future = self._engine.run(self._run())
+
+    async def _run(self):
+        """
+        Connects, and reconnects with an increasing delay after losing the connection
+        """
+        delays = reconnect_delays()
+        self._disconnected = asyncio.Event()
+        while not self._stopped:
+            self._disconnected.clear()
+            self._accepted = False
+            # pylint: disable=W0703
+            try:
+                await self._connect()
+            except Exception as exc:
+                # Using generic exception on purpose: every error leads to a new attempt
+                self._on_connect_fail(self.mqtt_client, None)
+                delay = next(delays)
+                logger.info(f"{exc!r}. Retrying in {delay:.1f} s ...")
+                await asyncio.sleep(delay)
+                continue
+
+            await self._disconnected.wait()
+            if self._accepted:
+                # The connection was usable: start with short delays again
+                delays = reconnect_delays()
+            if not self._stopped:
+                await asyncio.sleep(next(delays))
+
+    async def _connect(self):
+        # The MQTT client connects blocking (name resolution, TCP and TLS handshake): done in an executor
+        # thread, so that the loop is not blocked. With the host name (not a resolved address), as required
+        # for verifying TLS certificates
+        await self._engine.loop.run_in_executor(
+            None,
+            functools.partial(
+                self.mqtt_client.connect, host=self.host, port=self.port, keepalive=60
+            ),
+        )
+
+    #
+    # Socket callbacks: called in the loop, or in the executor thread while connecting. The loop is only changed
+    # in its thread, with the file descriptor taken right away (the socket might be closed meanwhile)
+    #
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._engine.call_soon(self._watch_socket, client, sock.fileno())
+
+    def _watch_socket(self, client, fd: int):
+        self._engine.loop.add_reader(fd, client.loop_read)
+        self._misc_task = self._engine.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._engine.call_soon(self._unwatch_socket, sock.fileno())
+
+    def _unwatch_socket(self, fd: int):
+        self._engine.loop.remove_reader(fd)
+        self._engine.loop.remove_writer(fd)
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._engine.call_soon(
+            self._engine.loop.add_writer, sock.fileno(), client.loop_write
+        )
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._engine.call_soon(self._engine.loop.remove_writer, sock.fileno())
+
+    async def _misc_loop(self):
+        while self.mqtt_client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(MISC_LOOP_INTERVAL)
+
+    # override
+    def _on_connect(self, client, userdata, flags, reason_code):
+        if reason_code != 0:
+            logger.info(
+                f"MQTT connection refused ({mqtt.connack_string(reason_code)}). "
+                f"Host: {self.host}, port: {self.port}"
+            )
+            return
+        self._accepted = True
+        super()._on_connect(client, userdata, flags, reason_code)
+
+    # override
+    def _on_disconnect(self, client, userdata, reason_code):
+        super()._on_disconnect(client, userdata, reason_code)
+        self._engine.call_soon(self._disconnected.set)
+
+    # override
+    def _on_message(self, client, userdata, msg):
+        # Called in the loop: decoding and the inputs are handled off the loop
+        self.active = True
+        self._engine.dispatch(msg.topic, self._handle_message, msg.topic, msg.payload)
+
+    # override
+    def _update_subscriptions(self):
+        # The MQTT client is only used in the loop
+        self._engine.call_soon(super()._update_subscriptions)
+
+    # override
+    def disconnect(self):
+        self._stopped = True
+        self._engine.call_soon(self._stop)
+
+    def _stop(self):
+        self.mqtt_client.disconnect()
+        if self._future is not None:
+            self._future.cancel()
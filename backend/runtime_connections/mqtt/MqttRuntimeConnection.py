@@ -1,12 +1,21 @@
-from typing import List
+from threading import Lock
+from typing import List, Set
 
 import paho.mqtt.client as mqtt
 from backend.runtime_connections.RuntimeConnection import RuntimeConnection
 
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
-from backend.runtime_connections.mqtt.MqttTimeseriesInput import MqttTimeseriesInput
+from backend.runtime_connections.mqtt.MqttTimeseriesInput import (
+    MqttTimeseriesInput,
+    parse_payload,
+)
+from backend.runtime_connections.mqtt.MqttTopicIndex import MqttTopicIndex
+from util.environment_and_configuration import ConfigGroups, get_configuration_int
 from util.log import logger
 
+# Max. count of topic filters per subscribe / unsubscribe packet
+SUBSCRIPTION_BATCH_SIZE = 1000
+
 
 class MqttRuntimeConnection(RuntimeConnection):
     """
@@ -19,20 +28,31 @@ class MqttRuntimeConnection(RuntimeConnection):
 
         self.mqtt_client = mqtt.Client()
 
+        self._topic_index = MqttTopicIndex()
+        # Topic filters currently subscribed at the broker
+        self._subscribed_filters: Set[str] = set()
+        self._subscription_lock = Lock()
+        self._subscription_merge_threshold = get_configuration_int(
+            group=ConfigGroups.API, key="mqtt_subscription_merge_threshold"
+        )
+
     # Override:
     def start_connection(self):
+        # The inputs are assigned by the container before starting:
+        for timeseries_input in self.timeseries_inputs.values():
+            self._topic_index.add(timeseries_input)
 
-        self.mqtt_client.on_connect_fail = self.__on_connect_fail
-        self.mqtt_client.on_message = self.__on_message
-        self.mqtt_client.on_disconnect = self.__on_disconnect
-        self.mqtt_client.on_connect = self.__on_connect
+        self.mqtt_client.on_connect_fail = self._on_connect_fail
+        self.mqtt_client.on_message = self._on_message
+        self.mqtt_client.on_disconnect = self._on_disconnect
+        self.mqtt_client.on_connect = self._on_connect
 
         # Async variant so that the library handles reconnecting on its own (even at startup)
         self.mqtt_client.connect_async(host=self.host, port=self.port, keepalive=60)
 
         self.mqtt_client.loop_start()
 
-    def __on_connect(self, client, userdata, flags, reason_code):
+    def _on_connect(self, client, userdata, flags, reason_code):
         """
         Called when the connection is established.
         Subscribe to topics here, so that they will be re-subscribed after a reconnect also.
@@ -47,18 +67,19 @@ class MqttRuntimeConnection(RuntimeConnection):
             f"Host: {self.host}, port: {self.port}. Subscribing to topics..."
         )
 
-        timeseries_input: MqttTimeseriesInput
-        for timeseries_input in self.timeseries_inputs.values():
-            self.mqtt_client.subscribe(timeseries_input.connection_topic, 0)
+        with self._subscription_lock:
+            # Subscriptions are not kept by the broker for a new (clean) session
+            self._subscribed_filters = set()
+        self._update_subscriptions()
 
-    def __on_connect_fail(self, client, userdata):
+    def _on_connect_fail(self, client, userdata):
         self.active = False
         logger.info(
             f"MQTT connection could not be established: "
             f"Host: {self.host}, port: {self.port}"
         )
 
-    def __on_disconnect(self, client, userdata, reason_code):
+    def _on_disconnect(self, client, userdata, reason_code):
         self.active = False
         if reason_code != 0:
             logger.info(
@@ -66,7 +87,7 @@ class MqttRuntimeConnection(RuntimeConnection):
                 f"Host: {self.host}, port: {self.port}. Will auto-reconnect"
             )
 
-    def __on_message(self, client, userdata, msg):
+    def _on_message(self, client, userdata, msg):
         """
         Called whenever a MQTT message is being received (all subscribed topics)
         :param client:
@@ -75,15 +96,72 @@ class MqttRuntimeConnection(RuntimeConnection):
         :return:
         """
         self.active = True
+        self._handle_message(msg.topic, msg.payload)
+
+    def _handle_message(self, topic: str, payload: bytes):
+        """
+        Decodes a message and hands it to the inputs of the topic
+        :param topic:
+        :param payload:
+        :return:
+        """
+        timeseries_inputs = self._topic_index.match(topic)
+        if len(timeseries_inputs) == 0:
+            return
+
+        # Decoded once for all inputs of the topic (differing in the keyword only)
+        try:
+            timestamp, parsed_json = parse_payload(payload)
+        except (ValueError, TypeError, AttributeError) as exc:
+            logger.debug(f"Invalid MQTT message on topic {topic}: {exc}")
+            return
+
         timeseries_input: MqttTimeseriesInput
-        for timeseries_input in self.timeseries_inputs.values():
-            if msg.topic == timeseries_input.connection_topic:
-                timeseries_input.handle_raw_reading(msg.payload)
+        for timeseries_input in timeseries_inputs:
+            timeseries_input.handle_parsed_reading(timestamp, parsed_json)
 
     def disconnect(self):
         self.mqtt_client.loop_stop()
         self.mqtt_client.disconnect()
 
+    # override
     def add_ts_input(self, ts_input: TimeseriesInput):
         self.timeseries_inputs[ts_input.iri] = ts_input
-        self.mqtt_client.subscribe(ts_input.connection_topic, 0)
+        self._topic_index.add(ts_input)
+        self._update_subscriptions()
+
+    # override
+    def remove_ts_input(self, iri: str):
+        super().remove_ts_input(iri)
+        self._topic_index.remove(iri)
+        self._update_subscriptions()
+
+    def _update_subscriptions(self):
+        """
+        Subscribes to the (merged) topic filters of all inputs and unsubscribes from the ones not required anymore.
+        Without a connection, the subscriptions are done when connected.
+        """
+        if not self.mqtt_client.is_connected():
+            return
+
+        with self._subscription_lock:
+            required_filters = set(
+                self._topic_index.subscription_filters(
+                    merge_threshold=self._subscription_merge_threshold
+                )
+            )
+            # Subscribe first, so that no messages are missed while replacing a filter by a merged one
+            new_filters = sorted(required_filters - self._subscribed_filters)
+            for i in range(0, len(new_filters), SUBSCRIPTION_BATCH_SIZE):
+                self.mqtt_client.subscribe(
+                    [
+                        (topic_filter, 0)
+                        for topic_filter in new_filters[i : i + SUBSCRIPTION_BATCH_SIZE]
+                    ]
+                )
+            obsolete_filters = sorted(self._subscribed_filters - required_filters)
+            for i in range(0, len(obsolete_filters), SUBSCRIPTION_BATCH_SIZE):
+                self.mqtt_client.unsubscribe(
+                    obsolete_filters[i : i + SUBSCRIPTION_BATCH_SIZE]
+                )
+            self._subscribed_filters = required_filters
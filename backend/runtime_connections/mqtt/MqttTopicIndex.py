@@ -0,0 +1,175 @@
+from threading import Lock
+from typing import Dict, List
+
+from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+
+SINGLE_LEVEL_WILDCARD = "+"
+MULTI_LEVEL_WILDCARD = "#"
+TOPIC_LEVEL_SEPARATOR = "/"
+
+# Max. count of topics with cached matches (bounds the memory, if merged subscriptions receive many unrelated topics)
+MATCH_CACHE_SIZE = 100000
+
+
+class _TopicTrieNode:
+    def __init__(self) -> None:
+        self.children: Dict[str, _TopicTrieNode] = dict()
+        # Inputs with a topic filter ending at this node
+        self.inputs: Dict[str, TimeseriesInput] = dict()
+
+    def is_empty(self) -> bool:
+        return len(self.children) == 0 and len(self.inputs) == 0
+
+
+class MqttTopicIndex:
+    """
+    Maps MQTT topics to the time-series inputs subscribed to them.
+    The topics of the inputs are filters and may contain the wildcards "+" (one level) and "#" (remaining levels).
+
+    Topic filters are stored in a trie with one level per node. The matched inputs are cached per received topic,
+    so that dispatching a message is a single dictionary lookup for known topics.
+    """
+
+    def __init__(self) -> None:
+        self._root = _TopicTrieNode()
+        # iri -> topic filter of the input
+        self._filters: Dict[str, str] = dict()
+        # received topic -> matching inputs
+        self._match_cache: Dict[str, List[TimeseriesInput]] = dict()
+        self._lock = Lock()
+
+    def add(self, ts_input: TimeseriesInput):
+        with self._lock:
+            if ts_input.iri in self._filters:
+                self._remove(ts_input.iri)
+
+            node = self._root
+            for level in ts_input.connection_topic.split(TOPIC_LEVEL_SEPARATOR):
+                node = node.children.setdefault(level, _TopicTrieNode())
+            node.inputs[ts_input.iri] = ts_input
+            self._filters[ts_input.iri] = ts_input.connection_topic
+            self._match_cache = dict()
+
+    def remove(self, iri: str):
+        with self._lock:
+            self._remove(iri)
+            self._match_cache = dict()
+
+    def _remove(self, iri: str):
+        topic_filter = self._filters.pop(iri, None)
+        if topic_filter is None:
+            return
+
+        path = [self._root]
+        for level in topic_filter.split(TOPIC_LEVEL_SEPARATOR):
+            path.append(path[-1].children[level])
+        path[-1].inputs.pop(iri, None)
+
+        # Remove nodes without remaining filters:
+        levels = topic_filter.split(TOPIC_LEVEL_SEPARATOR)
+        for depth in range(len(levels), 0, -1):
+            if not path[depth].is_empty():
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+
+    def match(self, topic: str) -> List[TimeseriesInput]:
+        """
+        :param topic: Topic of a received message (without wildcards)
+        :return: All inputs with a topic filter matching the topic
+        """
+        matches = self._match_cache.get(topic)
+        if matches is not None:
+            return matches
+
+        with self._lock:
+            matches = []
+            self._collect_matches(
+                node=self._root,
+                levels=topic.split(TOPIC_LEVEL_SEPARATOR),
+                depth=0,
+                matches=matches,
+            )
+            if len(self._match_cache) >= MATCH_CACHE_SIZE:
+                self._match_cache = dict()
+            self._match_cache[topic] = matches
+        return matches
+
+    def _collect_matches(
+        self,
+        node: _TopicTrieNode,
+        levels: List[str],
+        depth: int,
+        matches: List[TimeseriesInput],
+    ):
+        # Wildcards at the first level do not match topics starting with "$" (e.g. "$SYS/...")
+        wildcards_allowed = depth > 0 or not levels[0].startswith("$")
+
+        multi_level = node.children.get(MULTI_LEVEL_WILDCARD)
+        if multi_level is not None and wildcards_allowed:
+            # Matches the remaining levels, including the parent level itself ("a/#" matches "a")
+            matches.extend(multi_level.inputs.values())
+
+        if depth == len(levels):
+            matches.extend(node.inputs.values())
+            return
+
+        child = node.children.get(levels[depth])
+        if child is not None:
+            self._collect_matches(child, levels, depth + 1, matches)
+
+        single_level = node.children.get(SINGLE_LEVEL_WILDCARD)
+        if single_level is not None and wildcards_allowed:
+            self._collect_matches(single_level, levels, depth + 1, matches)
+
+    def subscription_filters(self, merge_threshold: int = 0) -> List[str]:
+        """
+        Creates a minimal list of topic filters for subscribing to all inputs.
+        Filters covered by other filters (e.g. "a/b" by "a/#" or "a/+") are left out.
+        :param merge_threshold: If > 0, the filters below a topic level are merged into one multi-level
+            wildcard subscription ("level/#"), if they are at least this many. Messages for other topics
+            below that level are then received as well, but not dispatched.
+        :return: topic filters
+        """
+        with self._lock:
+            return self._collect_filters(
+                node=self._root, path=[], covered=False, merge_threshold=merge_threshold
+            )
+
+    def _collect_filters(
+        self,
+        node: _TopicTrieNode,
+        path: List[str],
+        covered: bool,
+        merge_threshold: int,
+    ) -> List[str]:
+        """
+        :param covered: whether the filter ending at this node is covered by a "+" filter of a sibling
+        """
+        multi_level = node.children.get(MULTI_LEVEL_WILDCARD)
+        if multi_level is not None and len(multi_level.inputs) > 0:
+            # Covers this level and all levels below
+            return [TOPIC_LEVEL_SEPARATOR.join(path + [MULTI_LEVEL_WILDCARD])]
+
+        filters = []
+        if len(node.inputs) > 0 and not covered:
+            filters.append(TOPIC_LEVEL_SEPARATOR.join(path))
+
+        single_level = node.children.get(SINGLE_LEVEL_WILDCARD)
+        siblings_covered = single_level is not None and len(single_level.inputs) > 0
+        for level, child in node.children.items():
+            filters.extend(
+                self._collect_filters(
+                    node=child,
+                    path=path + [level],
+                    covered=siblings_covered and level != SINGLE_LEVEL_WILDCARD,
+                    merge_threshold=merge_threshold,
+                )
+            )
+
+        # Not merged at the root level ("#"), as this would receive every message of the broker
+        if len(path) > 0 and 0 < merge_threshold <= len(filters):
+            return [TOPIC_LEVEL_SEPARATOR.join(path + [MULTI_LEVEL_WILDCARD])]
+        return filters
+
+    def __len__(self):
+        return len(self._filters)
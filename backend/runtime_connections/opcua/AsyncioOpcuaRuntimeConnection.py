@@ -0,0 +1,248 @@
+import asyncio
+import time
+from typing import Dict, List
+
+import asyncua
+from asyncua import ua
+
+from backend.runtime_connections.AsyncioRuntimeEngine import (
+    AsyncioRuntimeEngine,
+    reconnect_delays,
+)
+from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from backend.runtime_connections.opcua.OpcuaRuntimeConnection import (
+    CONNECTION_CHECK_INTERVAL,
+    DEFAULT_MAX_NODES_PER_READ,
+    KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE,
+    OpcuaRuntimeConnection,
+)
+from backend.runtime_connections.opcua.OpcuaTimeseriesInput import OpcuaTimeseriesInput
+from util.log import logger
+
+
+class AsyncioOpcuaRuntimeConnection(OpcuaRuntimeConnection):
+    """
+    OPC UA connection running as coroutine on the shared event loop of the asyncio engine
+    instead of using own threads. Same sampling behaviour as the threaded connection.
+
+    Readings are handed to the inputs by the dispatch threads of the engine (keyed by node).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._engine = AsyncioRuntimeEngine.instance()
+        self._future = None
+
+    # override
+    def start_connection(self):
+        self._future = self._engine.run(self._run())
+
+    async def _run(self):
+        """
+        Connects and runs the polling schedule. After losing the connection, the whole session including the
+        subscriptions is restored with an increasing delay.
+        """
+        delays = reconnect_delays()
+        while self.thread_stop == False:
+            # pylint: disable=W0703
+            try:
+                await self._connect()
+                logger.info(
+                    "OPCUA connection active: " f"Host: {self.host}, port: {self.port}."
+                )
+                self.active = True
+                delays = reconnect_delays()
+
+                await self._run_polling_schedule()
+            except asyncio.CancelledError:
+                await self._close_client()
+                raise
+            except Exception as exc:
+                # Using generic exception on purpose: every error of the session leads to a reconnect
+                self.active = False
+                delay = next(delays)
+                logger.info(
+                    f"OPCUA connection lost or not possible: {exc!r}. "
+                    f"Host: {self.host}, port: {self.port}. Trying to reconnect in {delay:.1f} s ..."
+                )
+                await self._close_client()
+                await asyncio.sleep(delay)
+
+        await self._close_client()
+
+    async def _connect(self):
+        await self._close_client()
+        logger.info(f"Trying to connect to OPC UA: opc.tcp://{self.host}:{self.port}")
+        self._opcua_client = asyncua.Client(url=f"opc.tcp://{self.host}:{self.port}")
+        await self._opcua_client.connect()
+
+        self._nodes = dict()
+        self._topic_per_node_id = dict()
+        for timeseries_input in list(self.timeseries_inputs.values()):
+            self._load_node(timeseries_input.connection_topic)
+        if len(self._nodes) < 1:
+            raise RuntimeError("Running OPCUA connection without nodes")
+
+        await self._load_max_nodes_per_read()
+
+        # Subscriptions do not survive a new session:
+        self._subscriptions = dict()
+        self._monitored_items = dict()
+        self._subscribed_inputs = dict()
+
+        # Keeps the connection alive, even if the actual sensor reading happens via polling
+        keepalive_subscription = await self._opcua_client.create_subscription(
+            KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE, handler=self
+        )
+        await keepalive_subscription.subscribe_data_change(
+            self._opcua_client.get_node(
+                ua.NodeId(ua.ObjectIds.Server_ServerStatus_CurrentTime)
+            )
+        )
+
+        await self._update_subscriptions()
+
+    async def _close_client(self):
+        if self._opcua_client is None:
+            return
+        # pylint: disable=W0703
+        try:
+            await self._opcua_client.disconnect()
+        except Exception:
+            # Using generic exception on purpose: the old connection may already be broken
+            pass
+        self._opcua_client = None
+
+    async def _run_polling_schedule(self):
+        """See the threaded connection. Returns only when stopped"""
+        next_polls: Dict[int, float] = dict()
+        next_check = time.monotonic() + CONNECTION_CHECK_INTERVAL
+
+        while self.thread_stop == False:
+            polled_inputs = self._group_inputs(subscribed=False)
+            now = time.monotonic()
+
+            due_intervals = self._due_poll_intervals(next_polls, polled_inputs, now)
+            if len(due_intervals) > 0:
+                due_inputs: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+                for interval_ms in due_intervals:
+                    due_inputs.update(polled_inputs[interval_ms])
+                await self._poll_nodes(due_inputs)
+
+                now = time.monotonic()
+                self._advance_poll_schedule(next_polls, due_intervals, now)
+
+            if now >= next_check:
+                await self._update_subscriptions()
+                if len(polled_inputs) == 0:
+                    # Lost connections do not seem to lead to an exception otherwise
+                    await self._opcua_client.get_node(
+                        ua.NodeId(ua.ObjectIds.Server_ServerStatus_CurrentTime)
+                    ).read_value()
+                next_check = now + CONNECTION_CHECK_INTERVAL
+
+            delay = min([next_check] + list(next_polls.values())) - time.monotonic()
+            await asyncio.sleep(max(delay, 0))
+
+    async def _update_subscriptions(self):
+        obsolete_topics, new_items = self._monitored_items_changes()
+
+        for topic in obsolete_topics:
+            (sampling_interval_ms, _), handle = self._monitored_items.pop(topic)
+            await self._subscriptions[sampling_interval_ms].unsubscribe(handle)
+
+        for (sampling_interval_ms, deadband), topics in new_items.items():
+            subscription = self._subscriptions.get(sampling_interval_ms)
+            if subscription is None:
+                subscription = await self._opcua_client.create_subscription(
+                    sampling_interval_ms, handler=self
+                )
+                self._subscriptions[sampling_interval_ms] = subscription
+
+            handles = await subscription.create_monitored_items(
+                self._monitored_item_requests(topics, sampling_interval_ms, deadband)
+            )
+            unfiltered_topics = self._add_monitored_items(
+                topics, sampling_interval_ms, deadband, handles
+            )
+            if len(unfiltered_topics) > 0:
+                handles = await subscription.create_monitored_items(
+                    self._monitored_item_requests(
+                        unfiltered_topics, sampling_interval_ms, None
+                    )
+                )
+                self._add_monitored_items(
+                    unfiltered_topics,
+                    sampling_interval_ms,
+                    deadband,
+                    handles,
+                    filtered=False,
+                )
+
+    async def _poll_nodes(
+        self, inputs_per_topic: Dict[str, List[OpcuaTimeseriesInput]]
+    ):
+        topics = list(inputs_per_topic.keys())
+        data_values = []
+        for i in range(0, len(topics), self._max_nodes_per_read):
+            data_values.extend(
+                await self._opcua_client.uaclient.read_attributes(
+                    [
+                        self._nodes[topic].nodeid
+                        for topic in topics[i : i + self._max_nodes_per_read]
+                    ],
+                    ua.AttributeIds.Value,
+                )
+            )
+        self.active = True
+
+        for topic, data in zip(topics, data_values):
+            self._engine.dispatch(
+                topic, self._handle_data_value, topic, inputs_per_topic[topic], data
+            )
+
+    async def _load_max_nodes_per_read(self):
+        # pylint: disable=W0703
+        try:
+            max_nodes_per_read = await self._opcua_client.get_node(
+                ua.NodeId(
+                    ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead
+                )
+            ).read_value()
+        except Exception:
+            # Using generic exception on purpose: the limit is optional for servers
+            max_nodes_per_read = None
+        # 0: no limit
+        self._max_nodes_per_read = (
+            max_nodes_per_read
+            if max_nodes_per_read is not None and max_nodes_per_read > 0
+            else DEFAULT_MAX_NODES_PER_READ
+        )
+
+    def _load_node(self, topic: str):
+        if self._opcua_client is None:
+            # Loaded with the others when connected
+            return
+        if topic not in self._nodes:
+            node = self._opcua_client.get_node(topic)
+            self._topic_per_node_id[node.nodeid] = topic
+            self._nodes[topic] = node
+
+    # override
+    def _handle_data_change(self, topic: str, val, data):
+        # Called in the loop: the inputs are handled off the loop
+        self._engine.dispatch(topic, super()._handle_data_change, topic, val, data)
+
+    # override
+    def disconnect(self):
+        self.thread_stop = True
+        if self._future is not None:
+            # Closes the session as well
+            self._future.cancel()
+
+    # override
+    def add_ts_input(self, ts_input: TimeseriesInput):
+        self.timeseries_inputs[ts_input.iri] = ts_input
+        if self._opcua_client is not None:
+            # Loaded in the loop, as the client is not thread-safe
+            self._engine.call_soon(self._load_node, ts_input.connection_topic)
@@ -1,156 +1,154 @@
 import threading
 import asyncio
+import itertools
+import math
 import time
-from typing import List
+from typing import Dict, List, Tuple
 import asyncua.sync
 import asyncio.exceptions
+from asyncua import ua
 from backend.runtime_connections.RuntimeConnection import RuntimeConnection
 
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
 from backend.runtime_connections.opcua.OpcuaTimeseriesInput import OpcuaTimeseriesInput
+from graph_domain.main_digital_twin.RuntimeConnectionNode import (
+    RuntimeConnectionNode,
+    SamplingModes,
+)
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration,
+    get_configuration_int,
+)
 from util.log import logger
 
 RECONNECT_DURATION = 10  # time to wait before trying to reconnect (in s)
 CONNECTION_CHECK_INTERVAL = 10  # time to wait between checking the connection
 KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE = 1000  # sampling rate for keepalive subscriptions
-
-# The rate in which all sensors from this connection are sampled (in ms)
-SAMPLING_RATE = 500  # ms
-# TODO: integrate this into the timeseries nodes (or at least the connection nodes)!
-
-# Whether the reading handlers should be only triggered when the timeseries reading has actually changed.
-# Otherwise, a new value will be handled every period.
-ONLY_CHANGES = False
+# Max. count of nodes read with one request, if the server does not announce a limit (MaxNodesPerRead)
+DEFAULT_MAX_NODES_PER_READ = 1000
+
+# Sampling interval (in ms) and mode for connections and inputs not specifying them:
+DEFAULT_SAMPLING_INTERVAL_MS = get_configuration_int(
+    group=ConfigGroups.API, key="opcua_sampling_interval_ms"
+)
+DEFAULT_SAMPLING_MODE = get_configuration(
+    group=ConfigGroups.API, key="opcua_sampling_mode"
+)
+# Hybrid mode: nodes sampled at least this slowly (in ms) or with a deadband are subscribed, the others polled
+HYBRID_SUBSCRIPTION_MIN_INTERVAL_MS = get_configuration_int(
+    group=ConfigGroups.API, key="opcua_hybrid_subscription_min_interval_ms"
+)
 
 
 class OpcuaRuntimeConnection(RuntimeConnection):
     """
     Connection to one OPCUA broker. One or several timeseries inputs can be available via one connection over different
     nodes.
+
+    Nodes are either polled (a reading every sampling interval) or subscribed (readings only for changes larger than
+    the deadband, sampled by the server). The sampling interval and deadband are taken from the timeseries node, or
+    the runtime connection node as default. The sampling mode of the connection decides which nodes are subscribed.
     """
 
-    def __init__(self, **kwargs):
+    def __init__(
+        self,
+        sampling_mode: str | None = None,
+        sampling_interval_ms: int | None = None,
+        deadband: float | None = None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
         self.thread_stop = False
-        self.sampling_rate = SAMPLING_RATE
+        self.sampling_mode = (
+            sampling_mode if sampling_mode is not None else DEFAULT_SAMPLING_MODE
+        )
+        self.sampling_interval_ms = (
+            sampling_interval_ms
+            if sampling_interval_ms is not None
+            else DEFAULT_SAMPLING_INTERVAL_MS
+        )
+        self.deadband = deadband
 
         self._opcua_client = None
-        self._nodes: List[asyncua.sync.SyncNode] = []
+        # Node per node-id (connection topic). Inputs with the same node-id share a node
+        self._nodes: Dict[str, asyncua.sync.SyncNode] = dict()
+        self._topic_per_node_id: Dict[ua.NodeId, str] = dict()
+        self._max_nodes_per_read = DEFAULT_MAX_NODES_PER_READ
         self._asyncua_treadloop = asyncua.sync.ThreadLoop()
 
+        # Subscriptions of the current session per sampling interval:
+        self._subscriptions: Dict[int, asyncua.sync.Subscription] = dict()
+        # Monitored items per topic: (sampling interval, deadband), handle
+        self._monitored_items: Dict[str, Tuple[Tuple[int, float | None], int]] = dict()
+        # Client handles identifying the monitored items in the data changes (unique per subscription)
+        self._client_handles = itertools.count(1)
+        # Inputs receiving data changes per topic
+        self._subscribed_inputs: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+
         # Separate thread, as the library does not seem to be able to start a non-blocking subscription
-        if ONLY_CHANGES:
-            self.opcua_connector_thread = threading.Thread(
-                target=self.opcua_connection_thread_subscription_based
-            )
-        else:
-            self.opcua_connector_thread = threading.Thread(
-                target=self.opcua_connection_thread_polling_based
-            )
+        self.opcua_connector_thread = threading.Thread(
+            target=self.opcua_connection_thread
+        )
+
+    @classmethod
+    def from_runtime_connection_node(cls, node: RuntimeConnectionNode):
+        return cls(
+            iri=node.iri,
+            host_environment_variable=node.host_environment_variable,
+            port_environment_variable=node.port_environment_variable,
+            user_environment_variable=node.user_environment_variable,
+            key_environment_variable=node.key_environment_variable,
+            sampling_mode=node.sampling_mode,
+            sampling_interval_ms=node.sampling_interval_ms,
+            deadband=node.deadband,
+        )
 
     # Override:
     def start_connection(self):
         self.opcua_connector_thread.start()
 
-    def opcua_connection_thread_subscription_based(self):
+    def opcua_connection_thread(self):
         """
-        Main OPCUA thread based on the subscription API. Only samples data changes, not handling every period
-
-        TODO: currently, the subscription does not work anymore when restoring after a temporary disconnect.
-        Use the polling-based variant instead for a reliable connection!
+        Main OPCUA thread. Creates the subscriptions and polls the other nodes on their schedules.
+        After losing the connection, the whole session including the subscriptions is restored.
         :return:
         """
 
-        subscription = None
-
         # Outer loop for restoring the whole connection after a timeout
         while self.thread_stop == False:
             try:
                 self.__start_connection()
                 self._opcua_client.connect()
                 self.__load_opcua_nodes()
+                self.__load_max_nodes_per_read()
 
-                # Create subscription (for all nodes):
-                if subscription is None:
-                    subscription = self._opcua_client.create_subscription(
-                        self.sampling_rate, handler=self
-                    )
-                    subscription.subscribe_data_change(self._nodes)
-
-                logger.info(
-                    "OPCUA connection active: "
-                    f"Host: {self.host}, port: {self.port}. Subscribing to nodes..."
-                )
-
-                self.active = True
-
-                # Continuously test the connection. Otherwise, lost connections do not seem to lead to an exception
-                while self.thread_stop == False:
-                    time.sleep(CONNECTION_CHECK_INTERVAL)
-                    # 'i=84' is the root node that should always exist. Just for checking the connection
-                    # self.__opcua_client.get_node('i=84')
-                    self._nodes[0].read_value()
-                    # self.__nodes[0].read_data_value()
+                # Subscriptions do not survive a new session:
+                self._subscriptions = dict()
+                self._monitored_items = dict()
+                self._subscribed_inputs = dict()
 
-            except asyncio.exceptions.TimeoutError:
-                self.active = False
-                logger.info(
-                    "OPCUA connection timeout."
-                    f"Host: {self.host}, port: {self.port}. Trying to reconnect in {RECONNECT_DURATION} s ..."
+                # Create subscription to avoid asyncua.sync.ThreadLoopNotRunning exceptions.
+                # Subscribed to the current time of the server that always exists and changes.
+                # This subscription keeps the connection alive, even if the actual sensor reading happens via
+                # polling
+                keepalive_subscription = self._opcua_client.create_subscription(
+                    KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE, handler=self
                 )
-
-                time.sleep(RECONNECT_DURATION)
-            except Exception as exc:
-                self.active = False
-                logger.info(
-                    f"Unusual exception occured at the OPC-UA connection: {exc}. \nRetrying in {RECONNECT_DURATION} s ..."
+                keepalive_subscription.subscribe_data_change(
+                    self._opcua_client.get_node(
+                        ua.NodeId(ua.ObjectIds.Server_ServerStatus_CurrentTime)
+                    )
                 )
-                time.sleep(RECONNECT_DURATION)
-
-    def opcua_connection_thread_polling_based(self):
-        """
-        Main OPCUA thread based on the subscription API. Only samples data changes, not handling every period
-        :return:
-        """
 
-        # Outer loop for restoring the whole connection after a timeout
-        while self.thread_stop == False:
-            try:
-                self.__start_connection()
-                self._opcua_client.connect()
-                self.__load_opcua_nodes()
-
-                # # Create subscription to avoid asyncua.sync.ThreadLoopNotRunning exceptions:
-                subscription = self._opcua_client.create_subscription(
-                    KEEPALIVE_SUBSCRIPTION_SAMPLING_RATE, handler=self
-                )
-                # Subscribe to one existing node.
-                # This subscription keeps the connection alive, even if the actual sensor reading happens via
-                # polling
-                subscription.subscribe_data_change(self._nodes[0])
+                self.__update_subscriptions()
 
                 logger.info(
                     "OPCUA connection active: " f"Host: {self.host}, port: {self.port}."
                 )
+                self.active = True
 
-                # Continuously polling the sensor readings:
-                while self.thread_stop == False:
-                    node: asyncua.sync.SyncNode
-                    for node in self._nodes:
-                        val = node.read_value()
-                        data = node.read_data_value()
-
-                        self.active = True
-
-                        timeseries_input: OpcuaTimeseriesInput
-                        for timeseries_input in self.timeseries_inputs.values():
-                            timeseries_input.handle_reading_if_belonging(
-                                node_id=str(node),
-                                reading_time=data.SourceTimestamp,
-                                value=val,
-                            )
-
-                    time.sleep(self.sampling_rate / 1000)
+                self.__run_polling_schedule()
 
             except asyncio.exceptions.TimeoutError:
                 self.active = False
@@ -173,6 +171,43 @@ class OpcuaRuntimeConnection(RuntimeConnection):
                 )
                 time.sleep(RECONNECT_DURATION)
 
+    def __run_polling_schedule(self):
+        """
+        Polls the nodes on fixed schedules per sampling interval (due nodes are read together).
+        Periodically updates the subscriptions for added or removed inputs and checks the connection.
+        Returns only when stopped, or raises an exception if the connection is lost.
+        """
+        # Next due time (monotonic) per sampling interval:
+        next_polls: Dict[int, float] = dict()
+        next_check = time.monotonic() + CONNECTION_CHECK_INTERVAL
+
+        while self.thread_stop == False:
+            polled_inputs = self._group_inputs(subscribed=False)
+            now = time.monotonic()
+
+            due_intervals = self._due_poll_intervals(next_polls, polled_inputs, now)
+            if len(due_intervals) > 0:
+                due_inputs: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+                for interval_ms in due_intervals:
+                    due_inputs.update(polled_inputs[interval_ms])
+                self.__poll_nodes(due_inputs)
+
+                now = time.monotonic()
+                self._advance_poll_schedule(next_polls, due_intervals, now)
+
+            if now >= next_check:
+                self.__update_subscriptions()
+                if len(polled_inputs) == 0:
+                    # Continuously test the connection. Otherwise, lost connections do not seem to lead to an exception
+                    self._opcua_client.get_node(
+                        ua.NodeId(ua.ObjectIds.Server_ServerStatus_CurrentTime)
+                    ).read_value()
+                next_check = now + CONNECTION_CHECK_INTERVAL
+
+            delay = min([next_check] + list(next_polls.values())) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
     def __start_connection(self):
         """
         Try to initialize the OPC UA connection
@@ -181,7 +216,12 @@ class OpcuaRuntimeConnection(RuntimeConnection):
         :return:
         """
         if self._opcua_client is not None:
-            self._opcua_client.disconnect()
+            # pylint: disable=W0703
+            try:
+                self._opcua_client.disconnect()
+            except Exception:
+                # Using generic exception on purpose: the old connection may already be broken
+                pass
             del self._opcua_client
             self._opcua_client = None
             self._asyncua_treadloop.stop()
@@ -204,47 +244,366 @@ class OpcuaRuntimeConnection(RuntimeConnection):
                 )
                 time.sleep(RECONNECT_DURATION)
 
+    def _node_settings(
+        self, timeseries_inputs: List[OpcuaTimeseriesInput]
+    ) -> Tuple[int, float | None, bool]:
+        """
+        Combines the settings of the inputs sharing one node
+        :return: sampling interval (ms), deadband, whether the node is subscribed
+        """
+        sampling_interval_ms = min(
+            ts_input.sampling_interval_ms
+            if ts_input.sampling_interval_ms is not None
+            else self.sampling_interval_ms
+            for ts_input in timeseries_inputs
+        )
+        deadbands = [
+            ts_input.deadband if ts_input.deadband is not None else self.deadband
+            for ts_input in timeseries_inputs
+        ]
+        # Only filtered, if all inputs allow it:
+        deadband = None if None in deadbands else min(deadbands)
+
+        if self.sampling_mode == SamplingModes.SUBSCRIPTION.value:
+            subscribed = True
+        elif self.sampling_mode == SamplingModes.HYBRID.value:
+            subscribed = (
+                deadband is not None
+                or sampling_interval_ms >= HYBRID_SUBSCRIPTION_MIN_INTERVAL_MS
+            )
+        else:
+            subscribed = False
+
+        return sampling_interval_ms, deadband, subscribed
+
+    def _group_inputs(
+        self, subscribed: bool
+    ) -> Dict[int, Dict[str, List[OpcuaTimeseriesInput]]]:
+        """
+        Groups the inputs of the loaded nodes per node and sampling interval.
+        Grouped again when required, as inputs can be added or removed in the meantime.
+        :param subscribed: whether the subscribed or the polled inputs are returned
+        :return: sampling interval (ms) -> topic -> inputs
+        """
+        inputs_per_topic: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+        timeseries_input: OpcuaTimeseriesInput
+        for timeseries_input in list(self.timeseries_inputs.values()):
+            if timeseries_input.connection_topic in self._nodes:
+                inputs_per_topic.setdefault(
+                    timeseries_input.connection_topic, []
+                ).append(timeseries_input)
+
+        grouped: Dict[int, Dict[str, List[OpcuaTimeseriesInput]]] = dict()
+        for topic, timeseries_inputs in inputs_per_topic.items():
+            sampling_interval_ms, _, node_subscribed = self._node_settings(
+                timeseries_inputs
+            )
+            if node_subscribed == subscribed:
+                grouped.setdefault(sampling_interval_ms, dict())[
+                    topic
+                ] = timeseries_inputs
+        return grouped
+
+    def _due_poll_intervals(
+        self,
+        next_polls: Dict[int, float],
+        polled_inputs: Dict[int, Dict[str, List[OpcuaTimeseriesInput]]],
+        now: float,
+    ) -> List[int]:
+        """
+        Adds schedules for new sampling intervals and removes obsolete ones
+        :param next_polls: next due time (monotonic) per sampling interval. Updated
+        :return: sampling intervals due for polling
+        """
+        for interval_ms in polled_inputs.keys():
+            next_polls.setdefault(interval_ms, now)
+        for interval_ms in list(next_polls.keys()):
+            if interval_ms not in polled_inputs:
+                del next_polls[interval_ms]
+
+        return [
+            interval_ms
+            for interval_ms, next_poll in next_polls.items()
+            if next_poll <= now
+        ]
+
+    def _advance_poll_schedule(
+        self, next_polls: Dict[int, float], polled_intervals: List[int], now: float
+    ):
+        """Sets the next due times after polling (fixed schedule, not drifting with the duration of the reads)"""
+        for interval_ms in polled_intervals:
+            period = interval_ms / 1000
+            next_polls[interval_ms] += period
+            if next_polls[interval_ms] <= now:
+                # Reading took longer than the period: skip the missed cycles instead of catching up
+                logger.debug(
+                    f"OPC UA polling cycle ({interval_ms} ms) overran. Host: {self.host}, port: {self.port}"
+                )
+                next_polls[interval_ms] += (
+                    math.ceil((now - next_polls[interval_ms]) / period) * period
+                )
+
+    def _monitored_items_changes(
+        self,
+    ) -> Tuple[List[str], Dict[Tuple[int, float | None], List[str]]]:
+        """
+        Compares the required monitored items with the current ones. Updates the inputs receiving data changes
+        :return: topics of obsolete items (e.g. removed inputs or changed settings),
+            topics of new items per sampling interval and deadband
+        """
+        required_items: Dict[str, Tuple[int, float | None]] = dict()
+        subscribed_inputs: Dict[str, List[OpcuaTimeseriesInput]] = dict()
+        for inputs_per_topic in self._group_inputs(subscribed=True).values():
+            for topic, timeseries_inputs in inputs_per_topic.items():
+                sampling_interval_ms, deadband, _ = self._node_settings(
+                    timeseries_inputs
+                )
+                required_items[topic] = (sampling_interval_ms, deadband)
+                subscribed_inputs[topic] = timeseries_inputs
+        self._subscribed_inputs = subscribed_inputs
+
+        obsolete_topics = [
+            topic
+            for topic, (settings, _) in self._monitored_items.items()
+            if required_items.get(topic) != settings
+        ]
+        new_items: Dict[Tuple[int, float | None], List[str]] = dict()
+        for topic, settings in required_items.items():
+            if topic not in self._monitored_items or topic in obsolete_topics:
+                new_items.setdefault(settings, []).append(topic)
+        return obsolete_topics, new_items
+
+    @staticmethod
+    def _data_change_filter(deadband: float | None) -> ua.DataChangeFilter | None:
+        if deadband is None:
+            return None
+        data_change_filter = ua.DataChangeFilter()
+        data_change_filter.Trigger = ua.DataChangeTrigger.StatusValue
+        data_change_filter.DeadbandType = ua.DeadbandType.Absolute
+        data_change_filter.DeadbandValue = deadband
+        return data_change_filter
+
+    def _monitored_item_requests(
+        self, topics: List[str], sampling_interval_ms: int, deadband: float | None
+    ) -> List[ua.MonitoredItemCreateRequest]:
+        requests = []
+        for topic in topics:
+            item_to_monitor = ua.ReadValueId()
+            item_to_monitor.NodeId = self._nodes[topic].nodeid
+            item_to_monitor.AttributeId = ua.AttributeIds.Value
+
+            parameters = ua.MonitoringParameters()
+            parameters.ClientHandle = next(self._client_handles)
+            parameters.SamplingInterval = sampling_interval_ms
+            parameters.QueueSize = 0
+            parameters.DiscardOldest = True
+            parameters.Filter = self._data_change_filter(deadband)
+
+            request = ua.MonitoredItemCreateRequest()
+            request.ItemToMonitor = item_to_monitor
+            request.MonitoringMode = ua.MonitoringMode.Reporting
+            request.RequestedParameters = parameters
+            requests.append(request)
+        return requests
+
+    def _add_monitored_items(
+        self,
+        topics: List[str],
+        sampling_interval_ms: int,
+        deadband: float | None,
+        handles: List[int | ua.StatusCode],
+        filtered: bool = True,
+    ) -> List[str]:
+        """
+        Registers the created monitored items
+        :param filtered: whether the items were requested with the deadband filter
+        :return: topics to request again without the deadband filter. Servers reject it for nodes that are not
+            numeric (e.g. boolean or string). The deadband is still applied when handling the readings
+        """
+        unfiltered_topics = []
+        for topic, handle in zip(topics, handles):
+            if isinstance(handle, ua.StatusCode):
+                if filtered and deadband is not None:
+                    logger.info(
+                        f"OPC UA node {topic} could not be subscribed with a deadband filter: {handle.name}. "
+                        "Subscribing without it"
+                    )
+                    unfiltered_topics.append(topic)
+                else:
+                    logger.info(
+                        f"OPC UA node {topic} could not be subscribed: {handle.name}"
+                    )
+                continue
+            self._monitored_items[topic] = ((sampling_interval_ms, deadband), handle)
+        return unfiltered_topics
+
+    def __update_subscriptions(self):
+        """
+        Creates monitored items for new subscribed nodes and removes the ones not required anymore
+        (e.g. removed inputs or changed settings)
+        """
+        obsolete_topics, new_items = self._monitored_items_changes()
+
+        for topic in obsolete_topics:
+            (sampling_interval_ms, _), handle = self._monitored_items.pop(topic)
+            self._subscriptions[sampling_interval_ms].unsubscribe(handle)
+
+        # One request per interval and deadband:
+        for (sampling_interval_ms, deadband), topics in new_items.items():
+            subscription = self._subscriptions.get(sampling_interval_ms)
+            if subscription is None:
+                # The sampling interval of the monitored items is the publishing interval of the subscription
+                subscription = self._opcua_client.create_subscription(
+                    sampling_interval_ms, handler=self
+                )
+                self._subscriptions[sampling_interval_ms] = subscription
+
+            handles = subscription.create_monitored_items(
+                self._monitored_item_requests(topics, sampling_interval_ms, deadband)
+            )
+            unfiltered_topics = self._add_monitored_items(
+                topics, sampling_interval_ms, deadband, handles
+            )
+            if len(unfiltered_topics) > 0:
+                handles = subscription.create_monitored_items(
+                    self._monitored_item_requests(
+                        unfiltered_topics, sampling_interval_ms, None
+                    )
+                )
+                self._add_monitored_items(
+                    unfiltered_topics,
+                    sampling_interval_ms,
+                    deadband,
+                    handles,
+                    filtered=False,
+                )
+
+    def __poll_nodes(self, inputs_per_topic: Dict[str, List[OpcuaTimeseriesInput]]):
+        """
+        Reads the current values of the given nodes with batched read requests and hands them to the inputs
+        """
+        topics = list(inputs_per_topic.keys())
+        data_values = self.__read_data_values([self._nodes[topic] for topic in topics])
+        self.active = True
+
+        for topic, data in zip(topics, data_values):
+            self._handle_data_value(topic, inputs_per_topic[topic], data)
+
+    def _handle_data_value(
+        self,
+        topic: str,
+        timeseries_inputs: List[OpcuaTimeseriesInput],
+        data: ua.DataValue,
+    ):
+        """Hands a read value to the inputs of the node"""
+        if not data.StatusCode.is_good():
+            logger.debug(
+                f"OPC UA node {topic} could not be read: {data.StatusCode.name}"
+            )
+            return
+        timeseries_input: OpcuaTimeseriesInput
+        for timeseries_input in timeseries_inputs:
+            timeseries_input.handle_reading(
+                reading_time=data.SourceTimestamp, reading_value=data.Value.Value
+            )
+
+    def __read_data_values(
+        self, nodes: List[asyncua.sync.SyncNode]
+    ) -> List[ua.DataValue]:
+        """
+        Reads the values of the given nodes including the timestamps with as few read requests
+        as allowed by the server
+        """
+        data_values = []
+        for i in range(0, len(nodes), self._max_nodes_per_read):
+            data_values.extend(
+                self._asyncua_treadloop.post(
+                    self._opcua_client.aio_obj.uaclient.read_attributes(
+                        [
+                            node.nodeid
+                            for node in nodes[i : i + self._max_nodes_per_read]
+                        ],
+                        ua.AttributeIds.Value,
+                    )
+                )
+            )
+        return data_values
+
+    def __load_max_nodes_per_read(self):
+        """
+        Loads the max. count of nodes per read request announced by the server
+        """
+        # pylint: disable=W0703
+        try:
+            max_nodes_per_read = self._opcua_client.get_node(
+                ua.NodeId(
+                    ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead
+                )
+            ).read_value()
+        except Exception:
+            # Using generic exception on purpose: the limit is optional for servers
+            max_nodes_per_read = None
+        # 0: no limit
+        self._max_nodes_per_read = (
+            max_nodes_per_read
+            if max_nodes_per_read is not None and max_nodes_per_read > 0
+            else DEFAULT_MAX_NODES_PER_READ
+        )
+
     def __load_opcua_nodes(self):
         """
         Loads all specified nodes with the currently active connection
         :return:
         """
-        if self._nodes is not None and len(self._nodes) > 0:
-            del self._nodes
-            self._nodes: List[asyncua.sync.SyncNode] = []
+        self._nodes = dict()
+        self._topic_per_node_id = dict()
         timeseries_input: OpcuaTimeseriesInput
-        for timeseries_input in self.timeseries_inputs.values():
-            self._nodes.append(
-                self._opcua_client.get_node(timeseries_input.connection_topic)
-            )
+        for timeseries_input in list(self.timeseries_inputs.values()):
+            self.__load_opcua_node(timeseries_input.connection_topic)
 
         if len(self._nodes) < 1:
             raise RuntimeError("Running OPCUA connection without nodes")
 
-    def datachange_notification(self, node: asyncua.Node, val, data):
+    def __load_opcua_node(self, topic: str):
+        if topic not in self._nodes:
+            node = self._opcua_client.get_node(topic)
+            self._topic_per_node_id[node.nodeid] = topic
+            self._nodes[topic] = node
+
+    def datachange_notification(self, node: asyncua.sync.SyncNode, val, data):
         """
         Callback for asyncua Subscriptions.
         This method will be called when the Client received a data change message from the Server.
         Class instance with event methods (see `SubHandler` base class for details).
         """
         self.active = True
-        # Handle, if subscriptions are actually used (datachange-mode):
-        if ONLY_CHANGES:
 
-            timeseries_input: OpcuaTimeseriesInput
-            for timeseries_input in self.timeseries_inputs.values():
-                timeseries_input.handle_reading_if_belonging(
-                    node_id=str(node),
-                    reading_time=data.monitored_item.Value.SourceTimestamp,
-                    value=val,
-                )
+        topic = self._topic_per_node_id.get(node.nodeid)
+        if topic is None:
+            # Keepalive subscription
+            return
+
+        self._handle_data_change(topic, val, data)
+
+    def _handle_data_change(self, topic: str, val, data):
+        """Hands a reported value to the subscribed inputs of the node"""
+        timeseries_input: OpcuaTimeseriesInput
+        for timeseries_input in self._subscribed_inputs.get(topic, []):
+            timeseries_input.handle_reading(
+                reading_time=data.monitored_item.Value.SourceTimestamp,
+                reading_value=val,
+            )
 
     def disconnect(self):
-        self._opcua_client.disconnect()
         self.thread_stop = True
+        if self._opcua_client is not None:
+            self._opcua_client.disconnect()
         self.opcua_connector_thread.join()
         self._asyncua_treadloop.stop()
 
     def add_ts_input(self, ts_input: TimeseriesInput):
         self.timeseries_inputs[ts_input.iri] = ts_input
-        self._nodes.append(self._opcua_client.get_node(ts_input.connection_topic))
+        if self._opcua_client is not None:
+            # Polled with the next cycle, subscribed with the next connection check
+            self.__load_opcua_node(ts_input.connection_topic)
+        # Otherwise, the node is loaded with the others when connected
@@ -1,9 +1,35 @@
 from datetime import datetime
 
+from backend.runtime_connections.TimeseriesIngestFilter import TimeseriesIngestFilter
 from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesNodeFlat
 
 
 class OpcuaTimeseriesInput(TimeseriesInput):
+    def __init__(
+        self,
+        sampling_interval_ms: int | None = None,
+        deadband: float | None = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # None: defaults of the connection
+        self.sampling_interval_ms = sampling_interval_ms
+        # Filtered by the server for subscribed nodes (see also the ingest filter)
+        self.deadband = deadband
+
+    @classmethod
+    def from_timeseries_node(cls, node: TimeseriesNodeFlat):
+        return cls(
+            iri=node.iri,
+            connection_topic=node.connection_topic,
+            connection_keyword=node.connection_keyword,
+            value_type=node.value_type,
+            ingest_filter=TimeseriesIngestFilter.from_timeseries_node(node),
+            sampling_interval_ms=node.sampling_interval_ms,
+            deadband=node.deadband,
+        )
+
     def handle_raw_reading(self, val, data):
         # self.handle_reading(reading_time=data.monitored_item.Value.SourceTimestamp, reading_value=val)
         self.handle_reading(reading_time=data.SourceTimestamp, reading_value=val)
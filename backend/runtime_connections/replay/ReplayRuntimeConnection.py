@@ -0,0 +1,373 @@
+import heapq
+import itertools
+import time
+from datetime import datetime
+from queue import Empty, Queue
+from threading import Event, Thread
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from backend.exceptions.IdNotFoundException import IdNotFoundException
+from backend.knowledge_graph.dao.DatabaseConnectionsDao import DatabaseConnectionsDao
+from backend.runtime_connections.RuntimeConnection import RuntimeConnection
+from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from backend.runtime_connections.replay.ReplayTimeseriesInput import (
+    ReplayTimeseriesInput,
+)
+from backend.specialized_databases.DatabasePersistenceServiceContainer import (
+    DatabasePersistenceServiceContainer,
+)
+from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+    TimeseriesPersistenceService,
+)
+from graph_domain.main_digital_twin.RuntimeConnectionNode import RuntimeConnectionNode
+from util.environment_and_configuration import ConfigGroups, get_configuration_int
+from util.log import logger
+
+# Time the replay may be ahead of its schedule without waiting (in s)
+SCHEDULE_TOLERANCE = 0.001
+# Max. count of consecutive readings of one input handed over at once (as fast as possible only)
+MAX_BATCH_SIZE = 1000
+
+
+def _stored_readings(
+    persistence_service: TimeseriesPersistenceService,
+    iri: str,
+    begin_time: datetime | None,
+    end_time: datetime | None,
+    chunk_size: int,
+) -> Iterator[Tuple[datetime, Any]]:
+    """
+    :return: Generator of the stored readings (time, value) in chronological order, loaded in chunks
+    """
+    for chunk in persistence_service.read_period_iter(
+        iri=iri, begin_time=begin_time, end_time=end_time, chunk_size=chunk_size
+    ):
+        yield from zip(list(chunk["time"].dt.to_pydatetime()), chunk["value"].tolist())
+
+
+class ReplayRuntimeConnection(RuntimeConnection):
+    """
+    Replays stored readings through its inputs, and thereby through all their handlers (persistence, annotation
+    detectors, ...), as if they were received live. Used to test detectors on past situations, or as load
+    generator.
+
+    The readings of all inputs are replayed in chronological order with their original reading times, either with a
+    speed-up relative to real time or as fast as possible. Inputs added while replaying join at the current replay
+    time. The replay ends after the last reading of the period.
+    """
+
+    def __init__(
+        self,
+        replay_begin: datetime | None = None,
+        replay_end: datetime | None = None,
+        replay_speedup: float | None = None,
+        persistence_service: TimeseriesPersistenceService | None = None,
+        **kwargs,
+    ):
+        """
+        :param replay_begin: None: from the first stored reading
+        :param replay_end: None: until now
+        :param replay_speedup: None: real time. 0: as fast as possible
+        :param persistence_service: database the readings are read from. None: database of each replayed
+        time-series (looked up in the graph)
+        """
+        super().__init__(**kwargs)
+        self.replay_begin = replay_begin
+        self.replay_end = replay_end
+        self.replay_speedup = replay_speedup if replay_speedup is not None else 1.0
+        self.persistence_service = persistence_service
+        self.chunk_size = get_configuration_int(
+            group=ConfigGroups.API, key="replay_chunk_size"
+        )
+
+        self._stop_event = Event()
+        # Iris of the inputs added while replaying
+        self._added_input_iris: Queue = Queue()
+        self._replay_thread = Thread(
+            target=self._replay_loop, name=f"replay-{self.iri}", daemon=True
+        )
+        # Wall-clock time (monotonic) and reading time the schedule starts at
+        self._schedule_origin: Tuple[float, datetime] | None = None
+        # Orders readings with the same time by the order their inputs were opened
+        self._sequence = itertools.count()
+
+        self.replayed_readings_total = 0
+        # Readings the inputs failed to handle (skipped), and the inputs they belong to
+        self.failed_readings_total = 0
+        self._failed_input_iris: Set[str] = set()
+        # Reading time of the most recently replayed reading
+        self.replay_time: datetime | None = None
+        # Delay of the most recent reading and max. delay compared to the schedule (in s)
+        self.lag_s: float | None = None
+        self.max_lag_s: float | None = None
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+
+    @classmethod
+    def from_runtime_connection_node(cls, node: RuntimeConnectionNode):
+        return cls(
+            iri=node.iri,
+            host_environment_variable=node.host_environment_variable,
+            port_environment_variable=node.port_environment_variable,
+            user_environment_variable=node.user_environment_variable,
+            key_environment_variable=node.key_environment_variable,
+            replay_begin=(
+                datetime.fromisoformat(node.replay_begin)
+                if node.replay_begin is not None
+                else None
+            ),
+            replay_end=(
+                datetime.fromisoformat(node.replay_end)
+                if node.replay_end is not None
+                else None
+            ),
+            replay_speedup=node.replay_speedup,
+        )
+
+    # override
+    def start_connection(self):
+        logger.info(
+            f"Starting replay {self.iri} of {len(self.timeseries_inputs)} time-series "
+            f"({'as fast as possible' if self.replay_speedup == 0 else f'speed-up {self.replay_speedup}'})"
+        )
+        self._replay_thread.start()
+
+    # override
+    def disconnect(self):
+        self._stop_event.set()
+        self.active = False
+
+    # override
+    def add_ts_input(self, ts_input: TimeseriesInput):
+        self.timeseries_inputs[ts_input.iri] = ts_input
+        self._added_input_iris.put(ts_input.iri)
+
+    # override
+    def get_metrics(self) -> Dict:
+        """
+        :return: Count of replayed and failed readings, throughput (readings per second), current replay time and
+        the delay compared to the schedule
+        """
+        if self._started_at is None:
+            elapsed = 0
+        else:
+            elapsed = (
+                self._finished_at if self._finished_at is not None else time.monotonic()
+            ) - self._started_at
+
+        return {
+            "active": self.active,
+            "finished": self._finished_at is not None,
+            "speedup": self.replay_speedup,
+            "replayed_readings_total": self.replayed_readings_total,
+            "failed_readings_total": self.failed_readings_total,
+            "readings_per_second": (
+                round(self.replayed_readings_total / elapsed) if elapsed > 0 else None
+            ),
+            "replay_time": (
+                self.replay_time.isoformat() if self.replay_time is not None else None
+            ),
+            "lag_s": round(self.lag_s, 3) if self.lag_s is not None else None,
+            "max_lag_s": (
+                round(self.max_lag_s, 3) if self.max_lag_s is not None else None
+            ),
+        }
+
+    def _get_persistence_service(
+        self, ts_input: ReplayTimeseriesInput
+    ) -> TimeseriesPersistenceService | None:
+        if self.persistence_service is not None:
+            return self.persistence_service
+
+        db_connection = (
+            DatabaseConnectionsDao.instance().get_database_connection_for_node(
+                ts_input.source_iri
+            )
+        )
+        if db_connection is None:
+            return None
+        return DatabasePersistenceServiceContainer.instance().get_persistence_service(
+            db_connection.iri
+        )
+
+    def _next_reading(
+        self, iri: str, readings: Iterator[Tuple[datetime, Any]]
+    ) -> Tuple[datetime, Any] | None:
+        """
+        :return: The next stored reading of the input. None if there are no more readings
+        """
+        # pylint: disable=W0703
+        try:
+            return next(readings, None)
+        except IdNotFoundException:
+            logger.info(f"Replay {self.iri}: no stored readings for {iri}")
+        except Exception as exc:
+            # Using generic exception on purpose: the other inputs are replayed anyway
+            logger.warning(
+                f"Replay {self.iri}: reading stored readings of {iri} failed: {exc}"
+            )
+        return None
+
+    def _push_reading(
+        self,
+        heap: List,
+        iri: str,
+        reading: Tuple[datetime, Any] | None,
+        readings: Iterator[Tuple[datetime, Any]],
+    ):
+        if reading is not None:
+            heapq.heappush(
+                heap, (reading[0], next(self._sequence), iri, reading[1], readings)
+            )
+
+    def _open_input(self, heap: List, iri: str, begin_time: datetime | None):
+        ts_input: ReplayTimeseriesInput = self.timeseries_inputs.get(iri)
+        if ts_input is None:
+            return
+        persistence_service = self._get_persistence_service(ts_input)
+        if persistence_service is None:
+            logger.info(
+                f"Replay {self.iri}: no database found for {ts_input.source_iri}"
+            )
+            return
+        readings = _stored_readings(
+            persistence_service=persistence_service,
+            iri=ts_input.source_iri,
+            begin_time=begin_time,
+            end_time=self.replay_end,
+            chunk_size=self.chunk_size,
+        )
+        self._push_reading(heap, iri, self._next_reading(iri, readings), readings)
+
+    def _open_added_inputs(self, heap: List):
+        while True:
+            try:
+                iri = self._added_input_iris.get_nowait()
+            except Empty:
+                return
+            # Joins at the current replay time:
+            self._open_input(
+                heap,
+                iri,
+                self.replay_time if self.replay_time is not None else self.replay_begin,
+            )
+
+    def _wait_for_schedule(self, reading_time: datetime):
+        """
+        Waits until the reading is due according to the speed-up, and records the delay if late
+        """
+        if self._schedule_origin is None:
+            self._schedule_origin = (time.monotonic(), reading_time)
+        origin_wall_time, origin_reading_time = self._schedule_origin
+        scheduled_time = (
+            origin_wall_time
+            + (reading_time - origin_reading_time).total_seconds() / self.replay_speedup
+        )
+
+        delay = scheduled_time - time.monotonic()
+        if delay > SCHEDULE_TOLERANCE:
+            self._stop_event.wait(delay)
+
+        self.lag_s = max(0.0, time.monotonic() - scheduled_time)
+        self.max_lag_s = (
+            max(self.max_lag_s, self.lag_s)
+            if self.max_lag_s is not None
+            else self.lag_s
+        )
+
+    def _hand_over(
+        self,
+        ts_input: TimeseriesInput,
+        reading_times: List[datetime],
+        reading_values: List,
+    ):
+        """
+        Hands readings to the input. Readings the input fails to handle (e.g. not convertible to its value type)
+        are skipped
+        """
+        # pylint: disable=W0703
+        try:
+            if len(reading_times) == 1:
+                ts_input.handle_reading(reading_times[0], reading_values[0])
+            else:
+                ts_input.handle_readings(reading_times, reading_values)
+            self.replayed_readings_total += len(reading_times)
+        except Exception as exc:
+            # Using generic exception on purpose: the other readings are replayed anyway
+            if len(reading_times) > 1:
+                # One by one, so that only the failing readings are skipped (a batch is converted before any of
+                # its readings is handled)
+                for reading_time, reading_value in zip(reading_times, reading_values):
+                    self._hand_over(ts_input, [reading_time], [reading_value])
+                return
+            self.failed_readings_total += len(reading_times)
+            if ts_input.iri not in self._failed_input_iris:
+                self._failed_input_iris.add(ts_input.iri)
+                logger.warning(
+                    f"Replay {self.iri}: handling readings of {ts_input.iri} failed: {exc}. "
+                    "Skipping the failing readings"
+                )
+        self.replay_time = reading_times[-1]
+
+    def _replay_loop(self):
+        # pylint: disable=W0703
+        try:
+            self._replay()
+        except Exception as exc:
+            # Using generic exception on purpose: the replay is reported as ended in any case
+            logger.error(f"Replay {self.iri} failed: {exc}")
+        finally:
+            self._finished_at = time.monotonic()
+            self.active = False
+        metrics = self.get_metrics()
+        logger.info(
+            f"Replay {self.iri} {'stopped' if self._stop_event.is_set() else 'finished'}: "
+            f"{self.replayed_readings_total} readings "
+            f"({metrics['readings_per_second']} readings/s, max. lag: {metrics['max_lag_s']} s)"
+        )
+
+    def _replay(self):
+        # Next reading per input: (reading time, sequence, input iri, value, readings)
+        heap: List[Tuple[datetime, int, str, Any, Iterator]] = []
+        for iri in list(self.timeseries_inputs.keys()):
+            self._open_input(heap, iri, self.replay_begin)
+
+        self.active = True
+        self._started_at = time.monotonic()
+
+        while not self._stop_event.is_set():
+            self._open_added_inputs(heap)
+            if len(heap) == 0:
+                break
+
+            reading_time, _, iri, value, readings = heapq.heappop(heap)
+            ts_input = self.timeseries_inputs.get(iri)
+            if ts_input is None:
+                # Removed in the meantime
+                continue
+
+            if self.replay_speedup > 0:
+                self._wait_for_schedule(reading_time)
+                if self._stop_event.is_set():
+                    break
+                self._hand_over(ts_input, [reading_time], [value])
+                self._push_reading(
+                    heap, iri, self._next_reading(iri, readings), readings
+                )
+                continue
+
+            # As fast as possible: consecutive readings of one input are handed over together
+            reading_times = [reading_time]
+            reading_values = [value]
+            reading = self._next_reading(iri, readings)
+            while (
+                reading is not None
+                and len(reading_times) < MAX_BATCH_SIZE
+                and (len(heap) == 0 or reading[0] <= heap[0][0])
+            ):
+                reading_times.append(reading[0])
+                reading_values.append(reading[1])
+                reading = self._next_reading(iri, readings)
+
+            self._hand_over(ts_input, reading_times, reading_values)
+            self._push_reading(heap, iri, reading, readings)
@@ -0,0 +1,21 @@
+from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+
+
+class ReplayTimeseriesInput(TimeseriesInput):
+    """
+    Input replaying the stored readings of a time-series. The connection topic is the iri of the replayed
+    time-series (own iri if not set).
+
+    Waits for full handler queues instead of dropping readings, so that the replay (as fast as possible) is
+    slowed down to the speed of the slowest handler
+    """
+
+    wait_for_handlers = True
+
+    @property
+    def source_iri(self) -> str:
+        return (
+            self.connection_topic
+            if self.connection_topic is not None and self.connection_topic != ""
+            else self.iri
+        )
@@ -0,0 +1,33 @@
+import bisect
+import hashlib
+from typing import Dict, List
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    Consistent hashing of keys (connection iris) to nodes (backend instances). Each node is placed on the ring
+    several times (virtual nodes), so that the keys are spread evenly and only the keys of a joining or leaving node
+    move to other nodes
+    """
+
+    def __init__(self, nodes: List[str], virtual_nodes: int = 64):
+        self.nodes = sorted(set(nodes))
+        points: Dict[int, str] = dict()
+        for node in self.nodes:
+            for replica in range(virtual_nodes):
+                points[_hash(f"{node}#{replica}")] = node
+        self._points = sorted(points.keys())
+        self._point_nodes = [points[point] for point in self._points]
+
+    def get_node(self, key: str) -> str | None:
+        """
+        :return: the node responsible for the key. None, if the ring is empty
+        """
+        if len(self._points) == 0:
+            return None
+        position = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._point_nodes[position]
@@ -0,0 +1,363 @@
+import fcntl
+import hashlib
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from typing import Dict, List, Set
+
+from backend.runtime_connections.sharding.ConsistentHashRing import (
+    ConsistentHashRing,
+)
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration,
+    get_configuration_int,
+    get_environment_variable,
+)
+from util.log import logger
+
+MEMBERS_DIRECTORY = "members"
+LEASES_DIRECTORY = "leases"
+LOCK_FILE = "coordination.lock"
+
+
+def _file_name(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+
+
+def _read_json(path: str) -> Dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: str, content: Dict):
+    # Replaced atomically, so that readers without the coordination lock (status) never see partial files
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as json_file:
+        json.dump(content, json_file)
+    os.replace(temporary_path, path)
+
+
+def _read_json_files(directory: str) -> List[Dict]:
+    try:
+        file_names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    contents = [
+        _read_json(os.path.join(directory, file_name))
+        for file_name in file_names
+        if file_name.endswith(".json")
+    ]
+    return [content for content in contents if content is not None]
+
+
+def _read_live_members(directory: str, now: float) -> List[Dict]:
+    return sorted(
+        [
+            member
+            for member in _read_json_files(os.path.join(directory, MEMBERS_DIRECTORY))
+            if member["expires"] >= now
+        ],
+        key=lambda member: member["node_id"],
+    )
+
+
+class ShardCoordinator:
+    """
+    Partitions the runtime connections across several backend instances sharing a coordination directory.
+
+    Each instance renews a membership lease (heartbeat file). The connections are assigned to the live instances by
+    consistent hashing of their iris; an instance only runs a connection while holding its lease. Leases of
+    connections moving to another instance are released by the old owner at its next refresh and acquired by the
+    new owner afterwards. Leases of instances that stopped renewing them expire and are taken over.
+
+    Disabled (one instance owning all connections), if no coordination directory is configured
+    """
+
+    __instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        if self.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        ShardCoordinator.__instance = self
+
+        self.directory = get_configuration(
+            group=ConfigGroups.API, key="runtime_connection_shard_directory"
+        )
+        self.enabled = self.directory != ""
+        self.node_id = get_environment_variable(
+            key="BACKEND_NODE_ID",
+            optional=True,
+            default=f"{socket.gethostname()}-{os.getpid()}",
+        )
+        self.lease_duration = get_configuration_int(
+            group=ConfigGroups.API, key="runtime_connection_shard_lease_duration_s"
+        )
+        self.renew_interval = get_configuration_int(
+            group=ConfigGroups.API,
+            key="runtime_connection_shard_lease_renew_interval_s",
+        )
+        self.virtual_nodes = get_configuration_int(
+            group=ConfigGroups.API, key="runtime_connection_shard_virtual_nodes"
+        )
+
+        # Connections with a lease held by this instance
+        self._owned: Set[str] = set()
+        # Connections assigned to this instance, but still leased by another one
+        self._pending: Set[str] = set()
+        # Live members at the last ownership update
+        self._members: List[str] = []
+        self._rebalance_requested = False
+        self._lock = Lock()
+        self._lease_thread = None
+        # Set when leaving: no leases are renewed or acquired afterwards
+        self._stopped = Event()
+
+        if self.enabled:
+            os.makedirs(os.path.join(self.directory, MEMBERS_DIRECTORY), exist_ok=True)
+            os.makedirs(os.path.join(self.directory, LEASES_DIRECTORY), exist_ok=True)
+
+    def start_lease_thread(self):
+        """
+        Joins the instances (right away, so that the first refresh already sees this instance) and starts renewing
+        the leases
+        """
+        if not self.enabled:
+            return
+        with self._lock, self._coordination_lock():
+            self._write_heartbeat(time.time())
+        logger.info(f"Joined the backend instances as {self.node_id}")
+        self._lease_thread = Thread(target=self._lease_loop)
+        self._lease_thread.start()
+
+    @contextmanager
+    def _coordination_lock(self):
+        """Exclusive lock (across processes) for reading and changing leases"""
+        with open(
+            os.path.join(self.directory, LOCK_FILE), "a", encoding="utf-8"
+        ) as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _member_path(self) -> str:
+        return os.path.join(self.directory, MEMBERS_DIRECTORY, _file_name(self.node_id))
+
+    def _lease_path(self, connection_iri: str) -> str:
+        return os.path.join(
+            self.directory, LEASES_DIRECTORY, _file_name(connection_iri)
+        )
+
+    def _write_heartbeat(self, now: float):
+        _write_json(
+            self._member_path(),
+            {
+                "node_id": self.node_id,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "expires": now + self.lease_duration,
+                "owned_connections": len(self._owned),
+            },
+        )
+
+    def _release(self, connection_iri: str):
+        path = self._lease_path(connection_iri)
+        lease = _read_json(path)
+        if lease is not None and lease["owner"] == self.node_id:
+            os.remove(path)
+
+    def owns(self, connection_iri: str) -> bool:
+        return not self.enabled or connection_iri in self._owned
+
+    def update_ownership(self, connection_iris: Set[str]) -> Set[str]:
+        """
+        Acquires the leases of the connections assigned to this instance and releases the ones of connections
+        assigned to others (or removed from the graph).
+        :param connection_iris: all runtime connections
+        :return: the connections to run on this instance (all, if sharding is disabled, none after leaving)
+        """
+        if not self.enabled:
+            return set(connection_iris)
+
+        with self._lock, self._coordination_lock():
+            if self._stopped.is_set():
+                return set()
+            now = time.time()
+            members = [
+                member["node_id"] for member in _read_live_members(self.directory, now)
+            ]
+            if self.node_id not in members:
+                # Heartbeat expired (e.g. instance suspended): rejoin
+                self._write_heartbeat(now)
+                members = sorted(members + [self.node_id])
+            ring = ConsistentHashRing(members, virtual_nodes=self.virtual_nodes)
+
+            owned = set()
+            pending = set()
+            for connection_iri in connection_iris:
+                path = self._lease_path(connection_iri)
+                lease = _read_json(path)
+                if ring.get_node(connection_iri) == self.node_id:
+                    if (
+                        lease is None
+                        or lease["owner"] == self.node_id
+                        or lease["expires"] < now
+                    ):
+                        _write_json(
+                            path,
+                            {
+                                "connection_iri": connection_iri,
+                                "owner": self.node_id,
+                                "expires": now + self.lease_duration,
+                            },
+                        )
+                        owned.add(connection_iri)
+                    else:
+                        pending.add(connection_iri)
+                elif lease is not None and lease["owner"] == self.node_id:
+                    # Handed over to the new owner
+                    os.remove(path)
+            for connection_iri in self._owned - set(connection_iris):
+                self._release(connection_iri)
+
+            if owned != self._owned or members != self._members:
+                logger.info(
+                    f"Shard ownership updated: {len(owned)} of {len(connection_iris)} runtime connections owned, "
+                    f"{len(pending)} waiting for their lease, {len(members)} backend instances"
+                )
+            self._owned = owned
+            self._pending = pending
+            self._members = members
+            self._write_heartbeat(now)
+
+        return set(owned)
+
+    def rebalance_required(self) -> bool:
+        """
+        :return: True, if the ownership has to be updated (instances joined or left, leases are waited for or were
+        lost). Reset with the call
+        """
+        required = self._rebalance_requested
+        self._rebalance_requested = False
+        return required
+
+    def _lease_loop(self):
+        while not self._stopped.wait(timeout=self.renew_interval):
+            # pylint: disable=W0703
+            try:
+                self._renew_leases()
+            except Exception as exc:
+                # Using generic exception on purpose: retried with the next renewal (leases last several renewals)
+                logger.warning(f"Renewing the shard leases failed: {exc}")
+
+    def _renew_leases(self):
+        with self._lock, self._coordination_lock():
+            if self._stopped.is_set():
+                return
+            now = time.time()
+            self._write_heartbeat(now)
+            lost = set()
+            for connection_iri in self._owned:
+                path = self._lease_path(connection_iri)
+                lease = _read_json(path)
+                if lease is None or lease["owner"] != self.node_id:
+                    lost.add(connection_iri)
+                    continue
+                lease["expires"] = now + self.lease_duration
+                _write_json(path, lease)
+            members = [
+                member["node_id"] for member in _read_live_members(self.directory, now)
+            ]
+
+            if len(lost) > 0:
+                logger.warning(
+                    f"Leases of {len(lost)} runtime connections were taken over by other backend instances"
+                )
+            if len(lost) > 0 or len(self._pending) > 0 or members != self._members:
+                self._rebalance_requested = True
+
+    def leave(self):
+        """
+        Releases all leases and the membership, so that the other instances take over right away. Stops renewing
+        and acquiring leases
+        """
+        if not self.enabled:
+            return
+        with self._lock, self._coordination_lock():
+            self._stopped.set()
+            for connection_iri in self._owned:
+                self._release(connection_iri)
+            self._owned = set()
+            self._pending = set()
+            try:
+                os.remove(self._member_path())
+            except FileNotFoundError:
+                pass
+        if self._lease_thread is not None:
+            self._lease_thread.join()
+            self._lease_thread = None
+        logger.info(f"Left the backend instances as {self.node_id}")
+
+
+def get_shard_status() -> Dict:
+    """
+    Members and connection leases as seen in the coordination directory. Can be called from any process
+    :return: live instances, owner and assigned instance per leased connection, connections being moved
+    """
+    directory = get_configuration(
+        group=ConfigGroups.API, key="runtime_connection_shard_directory"
+    )
+    if directory == "":
+        return {"enabled": False}
+
+    now = time.time()
+    members = _read_live_members(directory, now)
+    ring = ConsistentHashRing(
+        [member["node_id"] for member in members],
+        virtual_nodes=get_configuration_int(
+            group=ConfigGroups.API, key="runtime_connection_shard_virtual_nodes"
+        ),
+    )
+    connections = {
+        lease["connection_iri"]: {
+            "owner": lease["owner"],
+            "assigned_to": ring.get_node(lease["connection_iri"]),
+            "expires_in_s": round(lease["expires"] - now, 1),
+        }
+        for lease in _read_json_files(os.path.join(directory, LEASES_DIRECTORY))
+    }
+    return {
+        "enabled": True,
+        "members": [
+            {
+                "node_id": member["node_id"],
+                "host": member["host"],
+                "pid": member["pid"],
+                "owned_connections": member["owned_connections"],
+                "expires_in_s": round(member["expires"] - now, 1),
+            }
+            for member in members
+        ],
+        "connections": connections,
+        "rebalancing": sorted(
+            iri
+            for iri, connection in connections.items()
+            if connection["owner"] != connection["assigned_to"]
+            or connection["expires_in_s"] < 0
+        ),
+    }
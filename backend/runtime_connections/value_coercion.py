@@ -0,0 +1,87 @@
+"""
+Converters for readings to the value type of their time-series.
+Resolved once per input (see TimeseriesInput.value_type), so that no type dispatch happens per reading.
+"""
+
+from math import floor
+from typing import Any, Callable, List, Sequence
+
+import numpy as np
+
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+BOOL_TRUE_STRINGS = frozenset(["True", "true", "t"])
+
+
+def _to_int(value) -> int:
+    if type(value) is int:
+        return value
+    return floor(float(value))
+
+
+def _to_bool(value):
+    # isinstance, so that numpy scalars (e.g. np.float64) are converted as well
+    if isinstance(value, (float, np.floating)):
+        return bool(value)
+    if isinstance(value, str):
+        return value in BOOL_TRUE_STRINGS
+    # Booleans and other types are kept
+    return value
+
+
+def _unchanged(value):
+    return value
+
+
+VALUE_CONVERTERS = {
+    TimeseriesValueTypes.STRING.value: str,
+    TimeseriesValueTypes.DECIMAL.value: float,
+    TimeseriesValueTypes.INT.value: _to_int,
+    TimeseriesValueTypes.BOOL.value: _to_bool,
+}
+
+
+def value_converter(value_type: str) -> Callable[[Any], Any]:
+    """
+    :return: Function converting one reading to the value type. Unknown types are not converted
+    """
+    return VALUE_CONVERTERS.get(value_type, _unchanged)
+
+
+# Bound of the values that can be cast to int64 after flooring
+INT64_BOUND = 2.0**63
+
+
+def _to_floats(values: Sequence) -> List[float]:
+    array = np.asarray(values)
+    if array.dtype == object:
+        # Not numeric (e.g. None contained): converted one by one, raising like the per-reading conversion
+        return [float(value) for value in values]
+    return array.astype(np.float64).tolist()
+
+
+def _to_ints(values: Sequence) -> List[int]:
+    array = np.asarray(values)
+    if array.dtype.kind in "iu":
+        # Exact, also beyond the precision of floats
+        return array.tolist()
+    if array.dtype != object:
+        floors = np.floor(array.astype(np.float64))
+        if np.all(np.abs(floors) < INT64_BOUND):
+            return floors.astype(np.int64).tolist()
+    # Not finite, out of the int64 range or not numeric (e.g. None): converted one by one, raising like the
+    # per-reading conversion
+    return [_to_int(value) for value in values]
+
+
+def values_converter(value_type: str) -> Callable[[Sequence], List]:
+    """
+    :return: Function converting a batch of readings to the value type. Vectorised for numeric types
+    """
+    if value_type == TimeseriesValueTypes.DECIMAL.value:
+        return _to_floats
+    if value_type == TimeseriesValueTypes.INT.value:
+        return _to_ints
+
+    converter = value_converter(value_type)
+    return lambda values: [converter(value) for value in values]
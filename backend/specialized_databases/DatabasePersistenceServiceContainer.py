@@ -1,3 +1,4 @@
+from threading import Event, Thread
 from typing import Dict, List
 from graph_domain.main_digital_twin.DatabaseConnectionNode import (
     DatabaseConnectionNode,
@@ -12,12 +13,29 @@ from backend.specialized_databases.files.s3.S3PersistenceService import (
     S3PersistenceService,
 )
 
+from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+    TimeseriesPersistenceService,
+)
+from backend.specialized_databases.timeseries.TimeseriesQueryCache import (
+    TimeseriesQueryCache,
+)
+from backend.specialized_databases.timeseries.timeseries_data_changes import (
+    notify_late_timeseries_writes,
+)
+from backend.specialized_databases.timeseries.timeseries_instance_states import (
+    WRITE_METRICS_CACHE_KEY,
+    publish_instance_state,
+    remove_instance_state,
+)
 from backend.specialized_databases.timeseries.influx_db.InfluxDbPersistenceService import (
     InfluxDbPersistenceService,
 )
 from backend.knowledge_graph.dao.DatabaseConnectionsDao import DatabaseConnectionsDao
 
 
+# Interval for publishing the write metrics of this instance (in s)
+WRITE_METRICS_PUBLISH_INTERVAL = 3
+
 DB_CONNECTION_MAPPING = {
     DatabaseConnectionTypes.INFLUX_DB.value: InfluxDbPersistenceService,
     DatabaseConnectionTypes.S3.value: S3PersistenceService,
@@ -45,6 +63,28 @@ class DatabasePersistenceServiceContainer:
         DatabasePersistenceServiceContainer.__instance = self
 
         self.services: Dict[str, SpecializedDatabasePersistenceService] = {}
+        self._write_metrics_status_thread = None
+        self._write_metrics_node_id = None
+        self._write_metrics_stopped = Event()
+
+    def start_write_metrics_status_thread(self, node_id: str):
+        """
+        :param node_id: id of this backend instance, under which its metrics are published
+        """
+        self._write_metrics_node_id = node_id
+        self._write_metrics_status_thread = Thread(
+            target=self._write_metrics_write_to_cache_loop
+        )
+        self._write_metrics_status_thread.start()
+
+    def stop_write_metrics_status_thread(self):
+        """Stops publishing and removes the metrics of this instance"""
+        if self._write_metrics_status_thread is None:
+            return
+        self._write_metrics_stopped.set()
+        self._write_metrics_status_thread.join()
+        self._write_metrics_status_thread = None
+        remove_instance_state(WRITE_METRICS_CACHE_KEY, self._write_metrics_node_id)
 
     def get_persistence_service(self, iri: str):
 
@@ -75,3 +115,41 @@ class DatabasePersistenceServiceContainer:
             self.services[con_node.iri] = service_class.from_db_connection_node(
                 con_node
             )
+
+    def get_timeseries_write_metrics(self) -> Dict[str, Dict[str, int]]:
+        """
+        :return: Write metrics (buffer and spool) per time-series database connection
+        """
+        return {
+            iri: service.get_write_metrics()
+            for iri, service in self.services.items()
+            if isinstance(service, TimeseriesPersistenceService)
+        }
+
+    def _publish_late_writes(self):
+        """
+        Invalidates the cached query results affected by readings written with old timestamps, in this and
+        (announced via the inter-process cache) all other processes
+        """
+        late_writes = dict()
+        for service in list(self.services.values()):
+            if isinstance(service, TimeseriesPersistenceService):
+                late_writes.update(service.pop_late_writes())
+        if len(late_writes) == 0:
+            return
+        query_cache = TimeseriesQueryCache.instance()
+        for iri, (begin_ms, end_ms) in late_writes.items():
+            query_cache.invalidate(iri, begin_ms, end_ms)
+        notify_late_timeseries_writes(late_writes)
+
+    def _write_metrics_write_to_cache_loop(self):
+        while True:
+            publish_instance_state(
+                WRITE_METRICS_CACHE_KEY,
+                self._write_metrics_node_id,
+                self.get_timeseries_write_metrics(),
+            )
+            self._publish_late_writes()
+
+            if self._write_metrics_stopped.wait(timeout=WRITE_METRICS_PUBLISH_INTERVAL):
+                return
@@ -1,5 +1,6 @@
 import abc
 from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
 import pandas as pd
 
 from backend.specialized_databases.SpecializedDatabasePersistenceService import (
@@ -45,6 +46,58 @@ class TimeseriesPersistenceService(SpecializedDatabasePersistenceService):
         """
         pass
 
+    @abc.abstractmethod
+    def read_periods_to_dataframes(
+        self,
+        iris: List[str],
+        begin_time: datetime,
+        end_time: datetime,
+        aggregation_window_ms: int | None = None,
+    ) -> Dict[str, pd.DataFrame] | None:
+        """
+        Reads all measurements from the sensors with the given IDs in the time period with one query
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :param aggregation_window_ms:
+        :return: Dict: iri -> Dataframe containing all measurements in that period
+        (empty for unknown IDs). None if the database is not available
+        """
+        pass
+
+    @abc.abstractmethod
+    def read_period_iter(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        chunk_size: int,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Reads all measurements from the sensor with the given ID in the time period in chunks, so that
+        large periods can be processed with bounded memory
+        :param chunk_size: max. count of readings per chunk
+        :return: Generator of Dataframes featuring the columns "time" and "value", in chronological order
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        pass
+
+    @abc.abstractmethod
+    def read_period_min_max_to_dataframe(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        window_ms: int,
+    ) -> pd.DataFrame | None:
+        """
+        Reads the readings with the minimum and maximum value per time window (numeric readings only).
+        Used to preselect readings for downsampling without transferring all readings.
+        :return: Dataframe featuring the columns "time" and "value", sorted by time
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        pass
+
     @abc.abstractmethod
     def count_entries_for_period(
         self, iri: str, begin_time: datetime, end_time: datetime
@@ -64,3 +117,45 @@ class TimeseriesPersistenceService(SpecializedDatabasePersistenceService):
         self, iri: str, begin_time: datetime = None, end_time: datetime = None
     ) -> int:
         pass
+
+    @abc.abstractmethod
+    def period_statistics(
+        self, iri: str, begin_time: datetime = None, end_time: datetime = None
+    ) -> Dict | None:
+        """
+        Calculates the statistics of the sensor with the given ID in the time period with one query:
+        count, min, max, mean (only for numeric values), first and last value (and their times)
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :return: Dict with the keys count, min, max, mean, first, last, first_time and last_time.
+        None if the database is not available
+        """
+        pass
+
+    @abc.abstractmethod
+    def period_statistics_for_iris(
+        self, iris: List[str], begin_time: datetime = None, end_time: datetime = None
+    ) -> Dict[str, Dict] | None:
+        """
+        Calculates the statistics (see period_statistics) for several sensors with one query
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :return: Dict: iri -> statistics dict. None if the database is not available
+        """
+        pass
+
+    def get_write_metrics(self) -> Dict[str, int]:
+        """
+        :return: Metrics about the buffering and spooling of written readings (empty if not supported)
+        """
+        return dict()
+
+    def pop_late_writes(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Readings written since the last call with timestamps older than the immutable delay of the query
+        cache (e.g. late or replayed readings)
+        :return: iri -> earliest and latest time of these readings (in ms since the epoch). Empty if not tracked
+        """
+        return dict()
@@ -0,0 +1,520 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+    TimeseriesPersistenceService,
+)
+from backend.specialized_databases.timeseries.timeseries_data_changes import (
+    TimeseriesDataChangeWatcher,
+)
+from backend.specialized_databases.timeseries.timeseries_instance_states import (
+    WRITE_METRICS_CACHE_KEY,
+    get_instance_states,
+    is_instance_state_current,
+)
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration,
+    get_configuration_int,
+)
+from util.log import logger
+
+# iri, chunk start (ms since epoch), aggregation window (ms, 0: raw readings)
+ChunkKey = Tuple[str, int, int]
+
+DISK_CACHE_FILE_SUFFIX = ".pkl"
+# Time to reuse the pending-writes state read from the inter-process cache (in s)
+WRITES_PENDING_CHECK_INTERVAL = 3
+
+
+class TimeseriesQueryCache:
+    """
+    Result cache for time-series range queries.
+
+    Ranges are split into chunks aligned to the chunk size. Chunks that ended longer than the immutable
+    delay ago do not change anymore and are cached: first in memory, then optionally in a local disk cache
+    shared by all processes. Both tiers are bounded by size and evict the least recently used chunks.
+    Only the still-open "live" tail of a range is always read from the database.
+
+    Chunks are not cached while readings are waiting in a write spool, as these would be missing in the
+    cached chunks. Cached chunks are invalidated if readings with older timestamps are written later (e.g.
+    replayed readings) and after restoring / importing. Other processes take up to the check interval of the
+    announcements to notice (see timeseries_data_changes).
+
+    The cache exists once per process.
+    """
+
+    __instance = None
+
+    @staticmethod
+    def instance():
+        if TimeseriesQueryCache.__instance is None:
+            TimeseriesQueryCache()
+        return TimeseriesQueryCache.__instance
+
+    def __init__(self):
+        if TimeseriesQueryCache.__instance is not None:
+            raise Exception("Singleton instantiated multiple times!")
+
+        TimeseriesQueryCache.__instance = self
+
+        self.chunk_size_ms = (
+            get_configuration_int(
+                ConfigGroups.API, "timeseries_query_cache_chunk_size_s"
+            )
+            * 1000
+        )
+        self.immutable_delay = timedelta(
+            seconds=get_configuration_int(
+                ConfigGroups.API, "timeseries_query_cache_immutable_delay_s"
+            )
+        )
+        self.memory_max_bytes = get_configuration_int(
+            ConfigGroups.API, "timeseries_query_cache_memory_size"
+        )
+        self.disk_directory = get_configuration(
+            ConfigGroups.API, "timeseries_query_cache_directory"
+        )
+        self.disk_max_bytes = get_configuration_int(
+            ConfigGroups.API, "timeseries_query_cache_disk_size"
+        )
+
+        self._lock = Lock()
+        # Chunk key -> (dataframe, size in bytes). Ordered from least to most recently used
+        self._memory: OrderedDict[ChunkKey, Tuple[pd.DataFrame, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+
+        self._writes_pending = True
+        self._writes_pending_checked = -WRITES_PENDING_CHECK_INTERVAL
+        self._data_change_watcher = TimeseriesDataChangeWatcher()
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.uncacheable_total = 0
+        self.evictions_memory = 0
+        self.evictions_disk = 0
+
+    def read_period_to_dataframe(
+        self,
+        service: TimeseriesPersistenceService,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int | None = None,
+    ) -> pd.DataFrame | None:
+        """
+        Cached version of TimeseriesPersistenceService.read_period_to_dataframe
+        :raise IdNotFoundException: if the iri is not found
+        """
+        dataframes = self.read_periods_to_dataframes(
+            service=service,
+            iris=[iri],
+            begin_time=begin_time,
+            end_time=end_time,
+            aggregation_window_ms=aggregation_window_ms,
+        )
+        return dataframes.get(iri) if dataframes is not None else None
+
+    def read_periods_to_dataframes(
+        self,
+        service: TimeseriesPersistenceService,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int | None = None,
+    ) -> Dict[str, pd.DataFrame] | None:
+        """
+        Cached version of TimeseriesPersistenceService.read_periods_to_dataframes.
+        Missing historical chunks are read with one query per contiguous range, the live tail with one
+        query for all time-series.
+        :raise IdNotFoundException: if an iri is not found
+        """
+        window_ms = (
+            aggregation_window_ms
+            if isinstance(aggregation_window_ms, int) and aggregation_window_ms > 0
+            else 0
+        )
+        if (
+            begin_time is None
+            or self.memory_max_bytes <= 0
+            # Aggregation windows have to be aligned to the chunks to get the same results:
+            or (window_ms != 0 and self.chunk_size_ms % window_ms != 0)
+        ):
+            with self._lock:
+                self.uncacheable_total += 1
+            return service.read_periods_to_dataframes(
+                iris=iris,
+                begin_time=begin_time,
+                end_time=end_time,
+                aggregation_window_ms=aggregation_window_ms,
+            )
+
+        self._apply_data_changes()
+
+        now = datetime.now().astimezone()
+        begin_time = begin_time.astimezone()
+        end_time = end_time.astimezone() if end_time is not None else now
+        begin_ms = int(begin_time.timestamp() * 1000)
+        end_ms = int(end_time.timestamp() * 1000)
+        immutable_limit_ms = int((now - self.immutable_delay).timestamp() * 1000)
+
+        # Historical chunks covering the range:
+        chunk_starts = []
+        chunk_start = begin_ms - begin_ms % self.chunk_size_ms
+        while (
+            chunk_start < end_ms
+            and chunk_start + self.chunk_size_ms <= immutable_limit_ms
+        ):
+            chunk_starts.append(chunk_start)
+            chunk_start += self.chunk_size_ms
+        tail_begin_ms = max(chunk_start, begin_ms)
+
+        chunk_indices = {chunk_start: i for i, chunk_start in enumerate(chunk_starts)}
+        chunks: Dict[str, List[pd.DataFrame]] = {iri: [] for iri in iris}
+        missing_chunk_starts: Dict[str, List[int]] = {}
+        for iri in iris:
+            for chunk_start in chunk_starts:
+                chunk_df = self._get((iri, chunk_start, window_ms))
+                if chunk_df is None:
+                    missing_chunk_starts.setdefault(iri, []).append(chunk_start)
+                chunks[iri].append(chunk_df)
+
+        # Read missing chunks (time-series missing the same chunks together):
+        iris_per_missing_chunks: Dict[Tuple[int, ...], List[str]] = {}
+        for iri, iri_chunk_starts in missing_chunk_starts.items():
+            iris_per_missing_chunks.setdefault(tuple(iri_chunk_starts), []).append(iri)
+        for missing_starts, missing_iris in iris_per_missing_chunks.items():
+            for span_start, span_end in self._contiguous_spans(missing_starts):
+                span_dfs = service.read_periods_to_dataframes(
+                    iris=missing_iris,
+                    begin_time=self._ms_to_datetime(span_start),
+                    end_time=self._ms_to_datetime(span_end),
+                    aggregation_window_ms=aggregation_window_ms,
+                )
+                if span_dfs is None:
+                    # Database not available
+                    return None
+                for iri, span_df in span_dfs.items():
+                    for chunk_start in range(span_start, span_end, self.chunk_size_ms):
+                        chunk_df = self._slice(
+                            span_df,
+                            chunk_start,
+                            chunk_start + self.chunk_size_ms,
+                            aggregated=window_ms != 0,
+                        )
+                        self._put((iri, chunk_start, window_ms), chunk_df)
+                        chunks[iri][chunk_indices[chunk_start]] = chunk_df
+
+        # Live tail:
+        if tail_begin_ms < end_ms:
+            tail_dfs = service.read_periods_to_dataframes(
+                iris=iris,
+                begin_time=self._ms_to_datetime(tail_begin_ms),
+                end_time=end_time,
+                aggregation_window_ms=aggregation_window_ms,
+            )
+            if tail_dfs is None:
+                return None
+            for iri in iris:
+                chunks[iri].append(tail_dfs.get(iri))
+
+        result_begin_ms = begin_ms
+        if window_ms != 0 and len(chunk_starts) > 0 and begin_ms % window_ms != 0:
+            # The first window of the chunks starts before the begin time: omitted, as it contains older readings
+            result_begin_ms = begin_ms - begin_ms % window_ms + window_ms
+        return {
+            iri: self._slice(
+                self._concat(iri_chunks),
+                result_begin_ms,
+                end_ms,
+                aggregated=window_ms != 0,
+            )
+            for iri, iri_chunks in chunks.items()
+        }
+
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "uncacheable_total": self.uncacheable_total,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "evictions_memory": self.evictions_memory,
+                "disk_bytes": self._disk_bytes if self._disk_bytes is not None else 0,
+                "evictions_disk": self.evictions_disk,
+            }
+
+    def clear(self):
+        """Clears both tiers (e.g. after the data has been changed retroactively)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.disk_directory != "":
+                for entry in self._disk_entries():
+                    self._disk_remove(entry.path)
+                self._disk_bytes = None
+
+    def invalidate(self, iri: str, begin_ms: int, end_ms: int):
+        """
+        Removes the cached chunks of the time-series overlapping the given time range (ms since the epoch)
+        from both tiers, e.g. after readings with these timestamps were written
+        """
+        first_chunk_start = begin_ms - begin_ms % self.chunk_size_ms
+        with self._lock:
+            for key in [
+                key
+                for key in self._memory.keys()
+                if key[0] == iri and first_chunk_start <= key[1] <= end_ms
+            ]:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            if self.disk_directory != "":
+                prefix = self._disk_file_prefix(iri)
+                for entry in self._disk_entries():
+                    if not entry.name.startswith(prefix):
+                        continue
+                    chunk_start = int(entry.name[len(prefix) :].split("_")[0])
+                    if first_chunk_start <= chunk_start <= end_ms:
+                        self._disk_remove(entry.path)
+                self._disk_bytes = None
+
+    def _apply_data_changes(self):
+        """Invalidates the chunks affected by data changes announced by any process"""
+        if self._data_change_watcher.changed():
+            logger.info(
+                "Time-series data changed: clearing the time-series query cache"
+            )
+            self.clear()
+            return
+        late_writes = self._data_change_watcher.get_late_writes()
+        if late_writes is None:
+            self.clear()
+            return
+        for iri, begin_ms, end_ms in late_writes:
+            self.invalidate(iri, begin_ms, end_ms)
+
+    @staticmethod
+    def _ms_to_datetime(epoch_ms: int) -> datetime:
+        return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+
+    def _contiguous_spans(self, chunk_starts: Tuple[int, ...]) -> List[Tuple[int, int]]:
+        spans = []
+        for chunk_start in chunk_starts:
+            if len(spans) > 0 and spans[-1][1] == chunk_start:
+                spans[-1][1] = chunk_start + self.chunk_size_ms
+            else:
+                spans.append([chunk_start, chunk_start + self.chunk_size_ms])
+        return [(span_start, span_end) for span_start, span_end in spans]
+
+    @staticmethod
+    def _slice(
+        df: pd.DataFrame | None, begin_ms: int, end_ms: int, aggregated: bool = False
+    ) -> pd.DataFrame:
+        """
+        Selects the readings in [begin, end). Aggregated readings are located at the end of their
+        window, so that (begin, end] is selected for them instead.
+        """
+        if df is None or df.empty:
+            return pd.DataFrame({"time": [], "value": []})
+        epoch_ms = (
+            pd.to_datetime(df["time"], utc=True)
+            .to_numpy(dtype="datetime64[ns]")
+            .astype("int64")
+            // 1_000_000
+        )
+        if aggregated:
+            mask = (epoch_ms > begin_ms) & (epoch_ms <= end_ms)
+        else:
+            mask = (epoch_ms >= begin_ms) & (epoch_ms < end_ms)
+        return df.loc[mask, ["time", "value"]].reset_index(drop=True)
+
+    @staticmethod
+    def _concat(dfs: List[pd.DataFrame | None]) -> pd.DataFrame:
+        dfs = [df for df in dfs if df is not None and not df.empty]
+        if len(dfs) == 0:
+            return pd.DataFrame({"time": [], "value": []})
+        if len(dfs) == 1:
+            return dfs[0]
+        return pd.concat(dfs, ignore_index=True)
+
+    def _get(self, key: ChunkKey) -> pd.DataFrame | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return entry[0]
+
+        df = self._disk_get(key)
+        with self._lock:
+            if df is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+        self._memory_put(key, df)
+        return df
+
+    def _put(self, key: ChunkKey, df: pd.DataFrame):
+        if self._are_writes_pending():
+            return
+        self._memory_put(key, df)
+        self._disk_put(key, df)
+
+    def _memory_put(self, key: ChunkKey, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.memory_max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            self._memory[key] = (df, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.evictions_memory += 1
+
+    def _are_writes_pending(self) -> bool:
+        """
+        Checks the write metrics published by the backend instances for readings waiting in a spool. Unknown
+        metrics (not published, outdated or not readable) count as pending writes
+        """
+        if (
+            time.monotonic() - self._writes_pending_checked
+            < WRITES_PENDING_CHECK_INTERVAL
+        ):
+            return self._writes_pending
+        self._writes_pending_checked = time.monotonic()
+
+        # pylint: disable=W0703
+        try:
+            states = get_instance_states(WRITE_METRICS_CACHE_KEY)
+            self._writes_pending = states is None or any(
+                not is_instance_state_current(entry)
+                or any(
+                    service_metrics.get("spool_depth", 0) > 0
+                    for service_metrics in entry["state"].values()
+                )
+                for entry in states.values()
+            )
+        except Exception:
+            # Using generic exception on purpose: not caching is always safe
+            self._writes_pending = True
+        return self._writes_pending
+
+    #
+    # Disk tier
+    #
+
+    @staticmethod
+    def _disk_file_prefix(iri: str) -> str:
+        return hashlib.sha1(iri.encode("utf-8")).hexdigest() + "_"
+
+    def _disk_path(self, key: ChunkKey) -> str:
+        # Named by time-series and chunk start, so that the chunks of a time range can be invalidated
+        iri, chunk_start, window_ms = key
+        return os.path.join(
+            self.disk_directory,
+            f"{self._disk_file_prefix(iri)}{chunk_start}_{window_ms}{DISK_CACHE_FILE_SUFFIX}",
+        )
+
+    def _disk_entries(self) -> List[os.DirEntry]:
+        try:
+            return [
+                entry
+                for entry in os.scandir(self.disk_directory)
+                if entry.name.endswith(DISK_CACHE_FILE_SUFFIX)
+            ]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _disk_remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already deleted by another process
+            pass
+
+    def _disk_get(self, key: ChunkKey) -> pd.DataFrame | None:
+        if self.disk_directory == "":
+            return None
+        path = self._disk_path(key)
+        # pylint: disable=W0703
+        try:
+            df = pd.read_pickle(path)
+            # Mark as recently used for the eviction:
+            os.utime(path)
+            return df
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Unreadable (e.g. partially written by an older version): read again from the database
+            return None
+
+    def _disk_put(self, key: ChunkKey, df: pd.DataFrame):
+        if self.disk_directory == "":
+            return
+        path = self._disk_path(key)
+        # Write to a temporary file first, so that other processes never read partial files:
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        # pylint: disable=W0703
+        try:
+            os.makedirs(self.disk_directory, exist_ok=True)
+            df.to_pickle(temporary_path)
+            os.replace(temporary_path, path)
+            size = os.path.getsize(path)
+        except Exception as exc:
+            logger.warning(f"Could not write time-series query cache file: {exc}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._disk_usage()
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._disk_evict()
+
+    def _disk_usage(self) -> int:
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.disk_directory)
+            if entry.name.endswith(DISK_CACHE_FILE_SUFFIX)
+        )
+
+    def _disk_evict(self):
+        """
+        Deletes the least recently used files until 90% of the size limit is reached.
+        The directory is shared by all processes, so the actual usage is determined first.
+        """
+        entries = sorted(
+            (
+                entry
+                for entry in os.scandir(self.disk_directory)
+                if entry.name.endswith(DISK_CACHE_FILE_SUFFIX)
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        self._disk_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._disk_bytes <= self.disk_max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # Already deleted by another process
+                continue
+            self._disk_bytes -= size
+            self.evictions_disk += 1
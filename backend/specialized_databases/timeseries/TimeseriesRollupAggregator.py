@@ -0,0 +1,452 @@
+import atexit
+import math
+import numbers
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Tuple
+
+from util.log import logger
+
+# Field names of the rollup points
+ROLLUP_FIELDS = ["count", "min", "max", "mean", "first", "last"]
+# Field marking a rollup bucket (and the buckets since the previous rollup point) as possibly incomplete
+ROLLUP_STALE_FIELD = "stale"
+# Max. count of buckets re-aggregated with one query
+ROLLUP_REAGGREGATION_MAX_BUCKETS = 10000
+# Time to wait before re-aggregating again after a failure (in s)
+ROLLUP_REAGGREGATION_RETRY_INTERVAL = 60
+
+
+@dataclass
+class _RollupBucket:
+    start_ns: int
+    count: int
+    min: float
+    max: float
+    sum: float
+    first: float
+    last: float
+    dirty: bool = True
+    # First bucket of the time-series in this process, possibly missing readings written before
+    partial: bool = False
+    # Partial bucket no longer open for readings (re-aggregated instead)
+    closed: bool = False
+
+    def add(self, value: float):
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.last = value
+        self.dirty = True
+
+    def fields(self) -> Dict[str, float]:
+        # Always floats, as the field types have to stay the same for a series
+        return {
+            "count": self.count,
+            "min": float(self.min),
+            "max": float(self.max),
+            "mean": float(self.sum / self.count),
+            "first": float(self.first),
+            "last": float(self.last),
+        }
+
+
+@dataclass
+class _Reaggregation:
+    """Re-aggregation of a stale bucket and the buckets since the previous rollup point"""
+
+    stale_start_ns: int
+    # Monotonic time from which on the raw readings are expected to be written
+    not_before: float
+    # Start of the next chunk to re-aggregate. None: previous rollup point not determined yet
+    next_ns: int | None = None
+    # Incremented when the bucket becomes stale again, invalidating running queries
+    generation: int = 0
+
+
+class TimeseriesRollupAggregator:
+    """
+    Maintains rollup series (count, min, max, mean, first and last value per time bucket) for numeric
+    time-series incrementally while the readings are written.
+
+    Buckets are aligned to multiples of the tier size since the epoch. Each time-series has one open
+    bucket per tier. It is written when a reading for a later bucket arrives. Additionally, the current
+    state of open buckets is written periodically, so that the rollups are up to date up to the flush
+    interval. Writing a bucket again overwrites the previous state (same series and time).
+
+    Buckets that cannot be aggregated from the readings passing this process are re-aggregated from the raw
+    readings by a background thread instead:
+    - the first bucket of each time-series after the process started (it might contain readings written
+      before, e.g. by the previous process). It is not written while open, but re-aggregated after it closed
+      together with the buckets since the previous rollup point (not written completely, e.g. when the
+      previous process stopped),
+    - buckets receiving readings older than the open bucket (out of order).
+    Until then, these buckets are marked with the stale field, which also marks the range since the previous
+    rollup point. The marks are stored with the rollups, so that re-aggregations still pending when the
+    process stops are continued by the next one.
+    """
+
+    def __init__(
+        self,
+        tiers_ms: List[int],
+        write_method: Callable[[str, int, int, Dict[str, float | bool]], None],
+        flush_interval_s: float,
+        reaggregate_method: Callable[
+            [str, int, int, int], Dict[int, Dict[str, float]] | None
+        ],
+        previous_point_method: Callable[[str, int, int], int | None],
+        stale_buckets_method: Callable[[str, int, int], List[int]],
+        reaggregated_method: Callable[[str, int, int], None],
+        reaggregation_delay_s: float,
+    ) -> None:
+        """
+        :param tiers_ms: bucket sizes
+        :param write_method: Callable writing one rollup point: (iri, tier in ms, bucket start in ns, fields)
+        :param flush_interval_s: interval for writing the current state of open buckets
+        :param reaggregate_method: Callable aggregating the raw readings: (iri, tier in ms, begin in ns, end in
+        ns) -> bucket start in ns -> fields of the buckets containing readings. None, if the raw readings are
+        not completely written yet (e.g. still spooled). Raises an exception if the query failed.
+        :param previous_point_method: Callable returning the start of the last rollup point before the given
+        time: (iri, tier in ms, time in ns) -> start in ns or None
+        :param stale_buckets_method: Callable returning the starts of the buckets marked as stale before the
+        given time: (iri, tier in ms, time in ns) -> starts in ns
+        :param reaggregated_method: Callable notified about re-aggregated ranges: (iri, begin in ms, end in ms)
+        :param reaggregation_delay_s: time until the raw readings of a stale bucket are expected to be
+        written, e.g. by the batch writer
+        """
+        self.tiers_ms = sorted(tiers_ms)
+        self._write_method = write_method
+        self.flush_interval_s = flush_interval_s
+        self._reaggregate_method = reaggregate_method
+        self._previous_point_method = previous_point_method
+        self._stale_buckets_method = stale_buckets_method
+        self._reaggregated_method = reaggregated_method
+        self.reaggregation_delay_s = reaggregation_delay_s
+
+        self._lock = Lock()
+        # Bucket states (iri, tier, start, fields) to write, in the order of their changes. Written by one
+        # thread at a time (holding the write lock), so that an older state of a bucket is never written
+        # after a newer one
+        self._pending_writes = deque()
+        self._write_lock = Lock()
+        # (iri, tier) -> open bucket
+        self._buckets: Dict[Tuple[str, int], _RollupBucket] = dict()
+        # (iri, tier) -> stale bucket start -> re-aggregation
+        self._reaggregations: Dict[Tuple[str, int], Dict[int, _Reaggregation]] = dict()
+        # (iri, tier) -> (start of the first bucket in this process, monotonic time to search from on) for the
+        # stale buckets left by previous processes
+        self._stale_searches: Dict[Tuple[str, int], Tuple[int, float]] = dict()
+        self._flush_thread: Thread | None = None
+        self._reaggregation_thread: Thread | None = None
+        self._last_reaggregation_failed = False
+
+        self.late_readings_total = 0
+        self.reaggregated_buckets_total = 0
+
+    def add(self, iri: str, value: float | bool | str, reading_time: datetime):
+        """
+        Adds a reading to the open buckets of all tiers. Non-numeric readings are ignored,
+        booleans are aggregated as 0 and 1.
+        """
+        if isinstance(value, bool):
+            value = int(value)
+        elif not isinstance(value, numbers.Real):
+            # Includes numpy scalars
+            return
+
+        if self._flush_thread is None:
+            self._start()
+
+        if reading_time.tzinfo is None:
+            # Same interpretation as for the points written to the database
+            reading_time = reading_time.replace(tzinfo=timezone.utc)
+        reading_ns = int(reading_time.timestamp() * 1_000_000) * 1000
+        late = False
+        write = False
+        with self._lock:
+            for tier_ms in self.tiers_ms:
+                key = (iri, tier_ms)
+                tier_ns = tier_ms * 1_000_000
+                start_ns = reading_ns - reading_ns % tier_ns
+                bucket = self._buckets.get(key)
+
+                if bucket is None or start_ns > bucket.start_ns:
+                    if bucket is None:
+                        # Re-aggregated once closed (see class description)
+                        self._mark_stale(key, start_ns, not_before=math.inf)
+                        self._stale_searches[key] = (
+                            start_ns,
+                            time.monotonic() + self.reaggregation_delay_s,
+                        )
+                    elif bucket.partial and not bucket.closed:
+                        self._close_partial_bucket(key, bucket)
+                    elif bucket.dirty and not bucket.partial:
+                        self._pending_writes.append(
+                            (iri, tier_ms, bucket.start_ns, bucket.fields())
+                        )
+                    self._buckets[key] = _RollupBucket(
+                        start_ns=start_ns,
+                        count=1,
+                        min=value,
+                        max=value,
+                        sum=value,
+                        first=value,
+                        last=value,
+                        partial=bucket is None,
+                    )
+                    write = True
+                elif start_ns == bucket.start_ns and not bucket.closed:
+                    bucket.add(value)
+                else:
+                    late = True
+                    self._mark_stale(
+                        key,
+                        start_ns,
+                        not_before=time.monotonic() + self.reaggregation_delay_s,
+                    )
+            if late:
+                self.late_readings_total += 1
+        if write or late:
+            self._write_pending()
+
+    def _mark_stale(self, key: Tuple[str, int], start_ns: int, not_before: float):
+        """Schedules the re-aggregation of a bucket (holding the lock)"""
+        reaggregations = self._reaggregations.setdefault(key, dict())
+        reaggregation = reaggregations.get(start_ns)
+        if reaggregation is None:
+            reaggregations[start_ns] = _Reaggregation(
+                stale_start_ns=start_ns, not_before=not_before
+            )
+            self._pending_writes.append(
+                (key[0], key[1], start_ns, {ROLLUP_STALE_FIELD: True})
+            )
+            return
+        # Start again once the new readings are written
+        reaggregation.not_before = max(reaggregation.not_before, not_before)
+        reaggregation.next_ns = None
+        reaggregation.generation += 1
+
+    def _close_partial_bucket(self, key: Tuple[str, int], bucket: _RollupBucket):
+        bucket.closed = True
+        self._reaggregations[key][bucket.start_ns].not_before = (
+            time.monotonic() + self.reaggregation_delay_s
+        )
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "rollup_open_buckets": len(self._buckets),
+            "rollup_late_readings_total": self.late_readings_total,
+            "rollup_stale_buckets": sum(
+                len(reaggregations) for reaggregations in self._reaggregations.values()
+            ),
+            "rollup_reaggregated_buckets_total": self.reaggregated_buckets_total,
+        }
+
+    def flush(self):
+        """
+        Writes the current state of all changed open buckets. Closes partial buckets that ended, if no more
+        readings are received for them
+        """
+        now_ns = time.time_ns()
+        with self._lock:
+            for (iri, tier_ms), bucket in self._buckets.items():
+                if bucket.partial:
+                    if (
+                        not bucket.closed
+                        and now_ns
+                        >= bucket.start_ns
+                        + (tier_ms / 1000 + self.flush_interval_s) * 1_000_000_000
+                    ):
+                        self._close_partial_bucket((iri, tier_ms), bucket)
+                elif bucket.dirty:
+                    self._pending_writes.append(
+                        (iri, tier_ms, bucket.start_ns, bucket.fields())
+                    )
+                    bucket.dirty = False
+        self._write_pending()
+
+    def _start(self):
+        with self._lock:
+            if self._flush_thread is not None:
+                return
+            self._flush_thread = Thread(target=self._flush_loop, daemon=True)
+            self._flush_thread.start()
+            self._reaggregation_thread = Thread(
+                target=self._reaggregation_loop, daemon=True
+            )
+            self._reaggregation_thread.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval_s)
+            self.flush()
+
+    def _reaggregation_loop(self):
+        while True:
+            # pylint: disable=W0703
+            try:
+                if self._reaggregate_next():
+                    if self._last_reaggregation_failed:
+                        logger.info("Re-aggregating time-series rollups working again.")
+                    self._last_reaggregation_failed = False
+                    continue
+            except Exception as exc:
+                # Using generic exception on purpose: retried later in any case
+                if not self._last_reaggregation_failed:
+                    logger.info(
+                        f"Could not re-aggregate time-series rollups: {exc}. "
+                        "Will notify when successful again."
+                    )
+                self._last_reaggregation_failed = True
+            time.sleep(self.flush_interval_s)
+
+    def _reaggregate_next(self) -> bool:
+        """
+        Processes the next due step: searching the stale buckets left by previous processes, determining the
+        begin of a re-aggregation or re-aggregating a chunk of buckets
+        :return: False, if nothing was due
+        :raises Exception: if a query failed. The step is retried later
+        """
+        now = time.monotonic()
+        with self._lock:
+            search = next(
+                (
+                    (key, first_start_ns)
+                    for key, (first_start_ns, not_before) in list(
+                        self._stale_searches.items()
+                    )
+                    if not_before <= now
+                ),
+                None,
+            )
+            if search is not None:
+                # Retried later, if the query fails:
+                self._stale_searches[search[0]] = (
+                    search[1],
+                    now + ROLLUP_REAGGREGATION_RETRY_INTERVAL,
+                )
+            else:
+                due = [
+                    (key, reaggregation)
+                    for key, reaggregations in self._reaggregations.items()
+                    for reaggregation in reaggregations.values()
+                    if reaggregation.not_before <= now
+                ]
+                if len(due) == 0:
+                    return False
+                key, reaggregation = min(due, key=lambda entry: entry[1].not_before)
+                reaggregation.not_before = now + ROLLUP_REAGGREGATION_RETRY_INTERVAL
+                generation = reaggregation.generation
+                begin_ns = reaggregation.next_ns
+
+        if search is not None:
+            key, first_start_ns = search
+            stale_starts = self._stale_buckets_method(key[0], key[1], first_start_ns)
+            with self._lock:
+                self._stale_searches.pop(key)
+                for start_ns in stale_starts:
+                    if start_ns not in self._reaggregations.get(key, dict()):
+                        # Already marked in the database:
+                        self._reaggregations.setdefault(key, dict())[start_ns] = (
+                            _Reaggregation(stale_start_ns=start_ns, not_before=now)
+                        )
+            return True
+
+        iri, tier_ms = key
+        tier_ns = tier_ms * 1_000_000
+        end_ns = reaggregation.stale_start_ns + tier_ns
+        if begin_ns is None:
+            previous_ns = self._previous_point_method(
+                iri, tier_ms, reaggregation.stale_start_ns
+            )
+            with self._lock:
+                if reaggregation.generation == generation:
+                    reaggregation.next_ns = (
+                        previous_ns
+                        if previous_ns is not None
+                        else reaggregation.stale_start_ns
+                    )
+                    reaggregation.not_before = now
+            return True
+
+        chunk_end_ns = min(
+            end_ns, begin_ns + ROLLUP_REAGGREGATION_MAX_BUCKETS * tier_ns
+        )
+        buckets = self._reaggregate_method(iri, tier_ms, begin_ns, chunk_end_ns)
+        if buckets is None:
+            return False
+
+        with self._lock:
+            if (
+                self._reaggregations.get(key, dict()).get(reaggregation.stale_start_ns)
+                is not reaggregation
+                or reaggregation.generation != generation
+            ):
+                # Stale again meanwhile
+                return True
+            open_bucket = self._buckets.get(key)
+            for start_ns, fields in sorted(buckets.items()):
+                if (
+                    open_bucket is not None
+                    and start_ns >= open_bucket.start_ns
+                    and not open_bucket.closed
+                ):
+                    continue
+                if start_ns == reaggregation.stale_start_ns:
+                    fields = {**fields, ROLLUP_STALE_FIELD: False}
+                self._pending_writes.append((iri, tier_ms, start_ns, fields))
+            self.reaggregated_buckets_total += len(buckets)
+            if chunk_end_ns < end_ns:
+                reaggregation.next_ns = chunk_end_ns
+                reaggregation.not_before = now
+            else:
+                if reaggregation.stale_start_ns not in buckets:
+                    # No readings (anymore) in the stale bucket
+                    self._pending_writes.append(
+                        (
+                            iri,
+                            tier_ms,
+                            reaggregation.stale_start_ns,
+                            {ROLLUP_STALE_FIELD: False},
+                        )
+                    )
+                self._reaggregations[key].pop(reaggregation.stale_start_ns)
+                if len(self._reaggregations[key]) == 0:
+                    self._reaggregations.pop(key)
+        self._write_pending()
+        self._reaggregated_method(
+            iri, begin_ns // 1_000_000, (chunk_end_ns - 1) // 1_000_000
+        )
+        return True
+
+    def _write_pending(self):
+        """
+        Writes the pending bucket states without holding the lock of the buckets, so that adding readings
+        never waits for the database. Returns right away if another thread is writing, as that one also
+        writes the states added meanwhile
+        """
+        # Checked again after releasing, as states added right before would not be written otherwise:
+        while len(self._pending_writes) > 0:
+            if not self._write_lock.acquire(blocking=False):
+                return
+            try:
+                while True:
+                    with self._lock:
+                        if len(self._pending_writes) == 0:
+                            break
+                        iri, tier_ms, start_ns, fields = self._pending_writes.popleft()
+                    # pylint: disable=W0703
+                    try:
+                        self._write_method(iri, tier_ms, start_ns, fields)
+                    except Exception as exc:
+                        # Using generic exception on purpose: the readings themselves are not affected
+                        logger.warning(
+                            f"Could not write time-series rollup for {iri}: {exc}"
+                        )
+            finally:
+                self._write_lock.release()
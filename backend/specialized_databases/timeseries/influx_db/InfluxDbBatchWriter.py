@@ -0,0 +1,255 @@
+import atexit
+import time
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from typing import Callable, Dict, List
+
+from backend.specialized_databases.timeseries.influx_db.InfluxDbWriteSpool import (
+    InfluxDbWriteSpool,
+)
+from util.log import logger
+
+
+class InfluxDbBatchWriter:
+    """
+    Buffers time-series points (in line protocol) and writes them in batches from a background thread.
+
+    A batch is written as soon as it reaches the batch size or when its oldest point is older than the
+    flush interval. The flush interval is therefore the upper bound for the delay until a reading is
+    visible in the database.
+    The buffer is bounded: if it is full, producers are blocked for up to the backpressure timeout.
+
+    If a spool is given, batches that could not be written and points that did not fit into the buffer
+    are appended to it instead of being dropped. While the spool is not empty, new batches are appended to
+    it as well, so that it is replayed in order once the database is available again.
+    Points that did not fit into the buffer are collected and spooled in batches by the writer thread (or by the
+    producer filling up a whole batch, if the writer thread is busy), so that producers do not wait for the disk
+    per point.
+    The order is not strict: points overflowing into the spool are followed by the (older) points still in the
+    buffer. As every point carries its timestamp, the stored data does not depend on the write order.
+    Points that could not be spooled (e.g. disk full) are dropped.
+    """
+
+    def __init__(
+        self,
+        write_method: Callable[[List[str]], None],
+        batch_size: int,
+        flush_interval_ms: int,
+        buffer_size: int,
+        backpressure_timeout_ms: int,
+        spool: InfluxDbWriteSpool | None = None,
+        spool_retry_interval_ms: int = 5000,
+    ) -> None:
+        """
+        :param write_method: Callable writing a list of line protocol strings. Raises an exception if
+        the write failed.
+        """
+        self._write_method = write_method
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.backpressure_timeout = backpressure_timeout_ms / 1000
+        self.spool = spool
+        self.spool_retry_interval = spool_retry_interval_ms / 1000
+
+        self._buffer: Queue = Queue(maxsize=buffer_size)
+        # Points that did not fit into the buffer, to be spooled
+        self._overflow: List[str] = []
+        self._overflow_lock = Lock()
+        self._writer_thread: Thread | None = None
+        self._stop = False
+        self._last_batch_failed = False
+        self._last_spool_failed = False
+        self._next_replay_time = 0
+
+        self.written_total = 0
+        self.dropped_total = 0
+        self.spool_failed_total = 0
+
+    def start(self):
+        if self._writer_thread is not None:
+            return
+        if self.spool is not None:
+            self.spool.open()
+        self._writer_thread = Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.stop)
+
+    def put(self, line: str) -> bool:
+        """
+        Adds a point to the buffer. Starts the writer thread on first use, so that processes only
+        reading from the database do not start one.
+        Blocks for up to the backpressure timeout if the buffer is full. Afterwards, the point is spooled (ahead
+        of the points in the buffer, see the class description) or dropped.
+        :param line: Point in line protocol
+        :return: False, if the point was dropped because the buffer stayed full
+        """
+        if self._writer_thread is None:
+            self.start()
+        try:
+            self._buffer.put(line, block=True, timeout=self.backpressure_timeout)
+            return True
+        except Full:
+            if self.spool is None:
+                self.dropped_total += 1
+                return False
+            with self._overflow_lock:
+                self._overflow.append(line)
+                if len(self._overflow) < self.batch_size:
+                    return True
+                overflow = self._take_overflow()
+            # The writer thread did not spool the overflow meanwhile (e.g. waiting for the database)
+            return self._append_to_spool(overflow)
+
+    def _take_overflow(self) -> List[str]:
+        overflow = self._overflow
+        self._overflow = []
+        return overflow
+
+    def _spool_overflow(self):
+        with self._overflow_lock:
+            overflow = self._take_overflow()
+        self._append_to_spool(overflow)
+
+    def _append_to_spool(self, lines: List[str]) -> bool:
+        """
+        :return: False, if the points were dropped because the spool could not be written
+        """
+        if len(lines) == 0:
+            return True
+        try:
+            self.spool.append(lines)
+            if self._last_spool_failed:
+                logger.info("Spooling of time-series readings working again.")
+            self._last_spool_failed = False
+            return True
+        except OSError as exc:
+            self.spool_failed_total += len(lines)
+            self.dropped_total += len(lines)
+            if not self._last_spool_failed:
+                logger.warning(
+                    f"Time-series readings dropped: Could not write to the spool ({exc}). "
+                    "Will notify when successful again."
+                )
+            self._last_spool_failed = True
+            return False
+
+    def buffered_count(self) -> int:
+        return self._buffer.qsize()
+
+    def get_metrics(self) -> Dict[str, int]:
+        metrics = {
+            "buffered": self.buffered_count(),
+            "written_total": self.written_total,
+            "dropped_total": self.dropped_total,
+        }
+        if self.spool is not None:
+            metrics["spool_failed_total"] = self.spool_failed_total
+            metrics.update(self.spool.get_metrics())
+        return metrics
+
+    def stop(self):
+        """Writes the remaining points and stops the writer thread"""
+        self._stop = True
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            self._writer_thread.join(timeout=10)
+
+    def _writer_loop(self):
+        batch: List[str] = []
+        batch_deadline = None
+
+        while not self._stop or not self._buffer.empty():
+            if self.spool is not None:
+                self._spool_overflow()
+            timeout = (
+                self.flush_interval
+                if batch_deadline is None
+                else max(batch_deadline - time.monotonic(), 0)
+            )
+            try:
+                batch.append(self._buffer.get(block=True, timeout=timeout))
+                if batch_deadline is None:
+                    batch_deadline = time.monotonic() + self.flush_interval
+                # Take everything that is already available without waiting again:
+                while len(batch) < self.batch_size:
+                    batch.append(self._buffer.get_nowait())
+            except Empty:
+                pass
+
+            if len(batch) > 0 and (
+                len(batch) >= self.batch_size
+                or time.monotonic() >= batch_deadline
+                or self._stop
+            ):
+                self._write_batch(batch)
+                batch = []
+                batch_deadline = None
+
+            if not self._stop:
+                self._replay_spool()
+
+        if len(batch) > 0:
+            self._write_batch(batch)
+        if self.spool is not None:
+            self._spool_overflow()
+
+    def _write_batch(self, batch: List[str]):
+        if self.spool is not None and not self.spool.is_empty():
+            # Keep the order: older points are still waiting in the spool
+            self._append_to_spool(batch)
+            return
+
+        if self._try_write(batch):
+            return
+
+        if self.spool is not None:
+            self._append_to_spool(batch)
+            self._next_replay_time = time.monotonic() + self.spool_retry_interval
+        else:
+            self.dropped_total += len(batch)
+
+    def _replay_spool(self):
+        """Writes the spooled points in bulk, as long as the database is available"""
+        while (
+            self.spool is not None
+            and not self.spool.is_empty()
+            and time.monotonic() >= self._next_replay_time
+        ):
+            try:
+                lines, cursor = self.spool.read_batch(max_count=self.batch_size)
+            except OSError as exc:
+                logger.warning(f"Could not read from the time-series spool: {exc}")
+                self._next_replay_time = time.monotonic() + self.spool_retry_interval
+                return
+            if len(lines) == 0:
+                # Spool emptied meanwhile (e.g. segments deleted because of the size limit)
+                return
+            if self._try_write(lines):
+                self.spool.commit(cursor)
+                if self.spool.is_empty():
+                    logger.info("Finished replaying the time-series spool.")
+            else:
+                self._next_replay_time = time.monotonic() + self.spool_retry_interval
+            # Continue handling new readings after every batch, if some are waiting:
+            if not self._buffer.empty():
+                return
+
+    def _try_write(self, batch: List[str]) -> bool:
+        # pylint: disable=W0703
+        try:
+            self._write_method(batch)
+            self.written_total += len(batch)
+            if self._last_batch_failed:
+                logger.info("Writing of time-series batches working again.")
+            self._last_batch_failed = False
+            return True
+        except Exception:
+            # Using generic exception on purpose, since there are many different ones occuring, that
+            # all require the same handling
+            if not self._last_batch_failed:
+                logger.info(
+                    f"Time-series batch of {len(batch)} readings could not be written: Database not "
+                    f"available. {'Spooling readings to disk' if self.spool is not None else 'Readings dropped'}. "
+                    "Will notify when successful again."
+                )
+            self._last_batch_failed = True
+            return False
@@ -1,4 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import time
+from threading import Lock
+from typing import Dict, Iterator, List, Tuple
 from influxdb_client.client.write_api import SYNCHRONOUS
 from influxdb_client import InfluxDBClient, Point
 import pandas as pd
@@ -9,19 +12,55 @@ from influxdb_client.client.warnings import MissingPivotFunction
 import shutil
 from dateutil import tz
 from backend.exceptions.IdNotFoundException import IdNotFoundException
+from backend.specialized_databases.timeseries.influx_db.InfluxDbBatchWriter import (
+    InfluxDbBatchWriter,
+)
+from backend.specialized_databases.timeseries.influx_db.InfluxDbWriteSpool import (
+    InfluxDbWriteSpool,
+)
 from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
     TimeseriesPersistenceService,
 )
+from backend.specialized_databases.timeseries.TimeseriesRollupAggregator import (
+    ROLLUP_FIELDS,
+    ROLLUP_STALE_FIELD,
+    TimeseriesRollupAggregator,
+)
+from backend.specialized_databases.timeseries.timeseries_data_changes import (
+    TimeseriesDataChangeWatcher,
+    notify_timeseries_data_changed,
+)
 from util.environment_and_configuration import (
     ConfigGroups,
     get_configuration,
+    get_configuration_int,
 )
+import math
 import os
+from util.file_name_utils import _replace_illegal_characters_from_iri
 from util.log import logger
 
 READING_FIELD_NAME = "reading"
 SAFETY_BACKUP_PATH = "safety_backups/influx_db/"
 DATETIME_STRF_FORMAT = "%Y_%m_%d_%H_%M_%S_%f"
+WRITE_MODE_BATCH = "batch"
+# Rollup series are stored as measurement "<iri>__rollup_<tier>ms"
+ROLLUP_MEASUREMENT_INFIX = "__rollup_"
+# Time to wait before checking again whether rollups exist for a time-series (in s)
+ROLLUP_COVERAGE_RETRY_INTERVAL = 60
+
+
+def _rollup_measurement(iri: str, tier_ms: int) -> str:
+    return f"{iri}{ROLLUP_MEASUREMENT_INFIX}{tier_ms}ms"
+
+
+def _ns_to_datetime(time_ns: int) -> datetime:
+    # Precise enough, as rollup buckets start at full milliseconds
+    return pd.Timestamp(time_ns, tz="UTC").to_pydatetime()
+
+
+def _record_time_ns(record) -> int:
+    return round(record.get_time().timestamp() * 1000) * 1_000_000
 
 
 class InfluxDbPersistenceService(TimeseriesPersistenceService):
@@ -43,11 +82,98 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             verify_ssl=self.key is not None,
         )
 
-        # Synchronous mode to allow live data processing from the database
-        # Consider batch mode if having performance issues
+        # Synchronous write API. In batch mode, it is only used by the background thread of the
+        # batch writer, so that the threads handling the readings do not wait for the database
         self._write_api = self._client.write_api(write_options=SYNCHRONOUS)
         self._query_api = self._client.query_api()
 
+        self._batch_writer: InfluxDbBatchWriter | None = None
+        if (
+            get_configuration(group=ConfigGroups.API, key="timeseries_write_mode")
+            == WRITE_MODE_BATCH
+        ):
+            spool_directory = get_configuration(
+                group=ConfigGroups.API, key="timeseries_write_spool_directory"
+            )
+            self._batch_writer = InfluxDbBatchWriter(
+                write_method=self._write_lines,
+                batch_size=get_configuration_int(
+                    group=ConfigGroups.API, key="timeseries_write_batch_size"
+                ),
+                flush_interval_ms=get_configuration_int(
+                    group=ConfigGroups.API, key="timeseries_write_flush_interval_ms"
+                ),
+                buffer_size=get_configuration_int(
+                    group=ConfigGroups.API, key="timeseries_write_buffer_size"
+                ),
+                backpressure_timeout_ms=get_configuration_int(
+                    group=ConfigGroups.API,
+                    key="timeseries_write_backpressure_timeout_ms",
+                ),
+                spool=(
+                    InfluxDbWriteSpool(
+                        directory=os.path.join(
+                            spool_directory,
+                            _replace_illegal_characters_from_iri(self.iri),
+                        ),
+                        segment_max_bytes=get_configuration_int(
+                            group=ConfigGroups.API,
+                            key="timeseries_write_spool_segment_size",
+                        ),
+                        max_bytes=get_configuration_int(
+                            group=ConfigGroups.API,
+                            key="timeseries_write_spool_max_size",
+                        ),
+                    )
+                    if spool_directory != ""
+                    else None
+                ),
+                spool_retry_interval_ms=get_configuration_int(
+                    group=ConfigGroups.API,
+                    key="timeseries_write_spool_retry_interval_ms",
+                ),
+            )
+
+        self._rollup_aggregator: TimeseriesRollupAggregator | None = None
+        rollup_tiers = get_configuration(
+            group=ConfigGroups.API, key="timeseries_rollup_tiers_s"
+        )
+        if rollup_tiers.strip() != "":
+            rollup_flush_interval_s = get_configuration_int(
+                group=ConfigGroups.API, key="timeseries_rollup_flush_interval_s"
+            )
+            self._rollup_aggregator = TimeseriesRollupAggregator(
+                tiers_ms=[
+                    int(float(tier_s) * 1000) for tier_s in rollup_tiers.split(",")
+                ],
+                write_method=self._write_rollup_point,
+                flush_interval_s=rollup_flush_interval_s,
+                reaggregate_method=self._aggregate_raw_readings,
+                previous_point_method=self._previous_rollup_point,
+                stale_buckets_method=self._stale_rollup_buckets,
+                reaggregated_method=self._track_reaggregated_range,
+                # Raw readings are written within the write flush interval (in batch mode):
+                reaggregation_delay_s=rollup_flush_interval_s
+                + get_configuration_int(
+                    group=ConfigGroups.API, key="timeseries_write_flush_interval_ms"
+                )
+                / 1000,
+            )
+        # (iri, tier) -> time from which on the rollup is complete
+        self._rollup_coverage_starts: Dict[tuple, datetime] = dict()
+        # (iri, tier) -> time of the last check without result
+        self._rollup_coverage_checks: Dict[tuple, float] = dict()
+        # The coverage is determined again after restoring / importing
+        self._data_change_watcher = TimeseriesDataChangeWatcher()
+
+        # Readings older than this delay might be in chunks cached already (see TimeseriesQueryCache)
+        self._late_write_delay_s = get_configuration_int(
+            group=ConfigGroups.API, key="timeseries_query_cache_immutable_delay_s"
+        )
+        # iri -> [earliest, latest] time of readings written late (in ms since the epoch)
+        self._late_writes: Dict[str, List[int]] = dict()
+        self._late_writes_lock = Lock()
+
     # override
     def write_measurement(
         self, iri: str, value: float | bool | str, reading_time: datetime = None
@@ -55,7 +181,8 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         """
         Writes the given value to the standard bucket into the measurement according to the id_uri into a field
         called 'reading'.
-        When no reading time is given, the current database time is being used.
+        When no reading time is given, the current database time is being used (in batch mode, the
+        time of buffering instead).
         :param id_uri:
         :param value:
         :param reading_time:
@@ -65,6 +192,41 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         record = Point(measurement_name=iri).field(
             field=READING_FIELD_NAME, value=value
         )
+
+        if reading_time is not None:
+            self._track_late_write(iri, reading_time)
+
+        if self._rollup_aggregator is not None:
+            self._rollup_aggregator.add(
+                iri,
+                value,
+                (
+                    reading_time
+                    if reading_time is not None
+                    else datetime.now().astimezone()
+                ),
+            )
+
+        if self._batch_writer is not None:
+            # The reading time has to be fixed when buffering, as the database time would be the
+            # one of the batch write
+            record.time(
+                reading_time
+                if reading_time is not None
+                else datetime.now().astimezone()
+            )
+            if not self._batch_writer.put(record.to_line_protocol()):
+                if not self._last_reading_dropped:
+                    logger.info(
+                        "Time-series reading dropped: Write buffer full. "
+                        "Will notify when successful again."
+                    )
+                self._last_reading_dropped = True
+            elif self._last_reading_dropped:
+                logger.info("Buffering of time-series readings working again.")
+                self._last_reading_dropped = False
+            return
+
         if reading_time is not None:
             record.time(reading_time)
         # pylint: disable=W0703
@@ -84,6 +246,300 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             self._last_reading_dropped = True
             # continue with new readings (drop this one)
 
+    def _track_late_write(self, iri: str, reading_time: datetime):
+        if reading_time.tzinfo is None:
+            # Same interpretation as for the points written to the database
+            reading_time = reading_time.replace(tzinfo=timezone.utc)
+        reading_ms = int(reading_time.timestamp() * 1000)
+        if reading_ms >= (time.time() - self._late_write_delay_s) * 1000:
+            return
+        self._add_late_write(iri, reading_ms, reading_ms)
+
+    def _track_reaggregated_range(self, iri: str, begin_ms: int, end_ms: int):
+        """Announces re-aggregated rollups like late readings, as query results might contain the old ones"""
+        self._add_late_write(iri, begin_ms, end_ms)
+
+    def _add_late_write(self, iri: str, begin_ms: int, end_ms: int):
+        with self._late_writes_lock:
+            late_range = self._late_writes.get(iri)
+            if late_range is None:
+                self._late_writes[iri] = [begin_ms, end_ms]
+            else:
+                late_range[0] = min(late_range[0], begin_ms)
+                late_range[1] = max(late_range[1], end_ms)
+
+    # override
+    def pop_late_writes(self) -> Dict[str, Tuple[int, int]]:
+        with self._late_writes_lock:
+            late_writes = self._late_writes
+            self._late_writes = dict()
+        return {
+            iri: (late_range[0], late_range[1])
+            for iri, late_range in late_writes.items()
+        }
+
+    # override
+    def get_write_metrics(self) -> Dict[str, int]:
+        metrics = dict()
+        if self._batch_writer is not None:
+            metrics.update(self._batch_writer.get_metrics())
+        if self._rollup_aggregator is not None:
+            metrics.update(self._rollup_aggregator.get_metrics())
+        return metrics
+
+    def _write_rollup_point(
+        self, iri: str, tier_ms: int, start_ns: int, fields: Dict[str, float]
+    ):
+        record = Point(measurement_name=_rollup_measurement(iri, tier_ms)).time(
+            start_ns
+        )
+        for field, value in fields.items():
+            record.field(field=field, value=value)
+
+        if self._batch_writer is not None:
+            self._batch_writer.put(record.to_line_protocol())
+        else:
+            self._write_api.write(bucket=self.bucket, record=record)
+
+    def _aggregate_raw_readings(
+        self, iri: str, tier_ms: int, begin_ns: int, end_ns: int
+    ) -> Dict[int, Dict[str, float]] | None:
+        """
+        Aggregates the numeric raw readings per rollup bucket (see TimeseriesRollupAggregator)
+        :return: bucket start in ns -> fields. None, if readings are still waiting in the spool
+        :raises Exception: if the database is not available
+        """
+        if (
+            self._batch_writer is not None
+            and self._batch_writer.spool is not None
+            and not self._batch_writer.spool.is_empty()
+        ):
+            return None
+
+        def aggregate(function: str) -> str:
+            return (
+                f"data |> aggregateWindow(every: {tier_ms}ms, fn: {function}, createEmpty: false, "
+                'timeSrc: "_start") |> toFloat() '
+                f'|> set(key: "_field", value: "{function}")'
+            )
+
+        query = (
+            'import "types" \n'
+            f'data = from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(_ns_to_datetime(begin_ns), _ns_to_datetime(end_ns))} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{iri}" and r["_field"] == "{READING_FIELD_NAME}") \n'
+            '|> filter(fn: (r) => types.isType(v: r._value, type: "float") '
+            'or types.isType(v: r._value, type: "int") or types.isType(v: r._value, type: "bool")) \n'
+            "|> toFloat() \n"
+            f"union(tables: [{', '.join(aggregate(field) for field in ROLLUP_FIELDS)}]) \n"
+            "|> group() \n"
+            '|> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'
+        )
+        buckets = dict()
+        for table in self._query_api.query(query=query):
+            for record in table.records:
+                fields = {field: record.values[field] for field in ROLLUP_FIELDS}
+                fields["count"] = int(fields["count"])
+                buckets[_record_time_ns(record)] = fields
+        return buckets
+
+    def _previous_rollup_point(
+        self, iri: str, tier_ms: int, before_ns: int
+    ) -> int | None:
+        """
+        :return: start of the last rollup point (bucket or stale mark) before the given time (in ns)
+        :raises Exception: if the database is not available
+        """
+        query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(None, _ns_to_datetime(before_ns))} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{_rollup_measurement(iri, tier_ms)}" '
+            f'and (r["_field"] == "count" or r["_field"] == "{ROLLUP_STALE_FIELD}")) \n'
+            "|> last() \n"
+            '|> keep(columns: ["_time"])'
+        )
+        return max(
+            (
+                _record_time_ns(record)
+                for table in self._query_api.query(query=query)
+                for record in table.records
+            ),
+            default=None,
+        )
+
+    def _stale_rollup_buckets(
+        self, iri: str, tier_ms: int, before_ns: int
+    ) -> List[int]:
+        """
+        :return: starts of the rollup buckets marked as stale before the given time (in ns)
+        :raises Exception: if the database is not available
+        """
+        query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(None, _ns_to_datetime(before_ns))} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{_rollup_measurement(iri, tier_ms)}" '
+            f'and r["_field"] == "{ROLLUP_STALE_FIELD}") \n'
+            "|> filter(fn: (r) => r._value == true) \n"
+            '|> keep(columns: ["_time"])'
+        )
+        return [
+            _record_time_ns(record)
+            for table in self._query_api.query(query=query)
+            for record in table.records
+        ]
+
+    def _rollup_is_stale(
+        self,
+        iris: List[str],
+        tier_ms: int,
+        begin_time: datetime,
+        end_time: datetime | None,
+    ) -> bool:
+        """
+        Whether the rollups of the given tier might be incomplete in the requested range for one of the given
+        time-series: a stale mark in the range, or as the next rollup point after the range (marking the range
+        since the previous rollup point)
+        """
+        now = datetime.now().astimezone()
+        end = min(end_time.astimezone(), now) if end_time is not None else now
+        measurements = ", ".join(
+            [f'"{_rollup_measurement(iri, tier_ms)}"' for iri in iris]
+        )
+        streams = [
+            f"marks |> filter(fn: (r) => r._time < {end.isoformat()}) |> limit(n: 1)"
+        ]
+        if end < now:
+            streams += [
+                f"marks |> filter(fn: (r) => r._time >= {end.isoformat()}) |> first()",
+                f'from(bucket: "{self.bucket}") \n'
+                f"    {self._timerange_query(end, None)} \n"
+                f'    |> filter(fn: (r) => contains(value: r["_measurement"], set: [{measurements}]) '
+                'and r["_field"] == "count") \n'
+                "    |> first()",
+            ]
+        query = (
+            f'marks = from(bucket: "{self.bucket}") \n'
+            f"{self._rollup_timerange_query(begin_time, None, tier_ms)} \n"
+            f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{measurements}]) '
+            f'and r["_field"] == "{ROLLUP_STALE_FIELD}") \n'
+            "|> filter(fn: (r) => r._value == true) \n"
+            f"union(tables: [{', '.join(streams)}]) \n"
+            '|> keep(columns: ["_time", "_measurement", "_field"])'
+        )
+        # pylint: disable=W0703
+        try:
+            tables = self._query_api.query(query=query)
+        except Exception:
+            # Using generic exception on purpose: the raw readings are used instead
+            return True
+        # Measurement -> time of the first stale mark and bucket from the end of the range on
+        marks_after, buckets_after = dict(), dict()
+        for table in tables:
+            for record in table.records:
+                if record.get_field() == "count":
+                    buckets_after[record.get_measurement()] = record.get_time()
+                elif record.get_time() < end:
+                    return True
+                else:
+                    marks_after[record.get_measurement()] = record.get_time()
+        return any(
+            measurement not in buckets_after or mark <= buckets_after[measurement]
+            for measurement, mark in marks_after.items()
+        )
+
+    def _rollup_coverage_start(self, iri: str, tier_ms: int) -> datetime | None:
+        """
+        Time from which on the rollup of the given tier is complete (start of the second bucket, as the
+        first one might have been started during the bucket). None, if there is no rollup yet.
+        """
+        if self._data_change_watcher.changed():
+            self._rollup_coverage_starts.clear()
+            self._rollup_coverage_checks.clear()
+        key = (iri, tier_ms)
+        coverage_start = self._rollup_coverage_starts.get(key)
+        if coverage_start is not None:
+            return coverage_start
+        if (
+            time.monotonic() - self._rollup_coverage_checks.get(key, -math.inf)
+            < ROLLUP_COVERAGE_RETRY_INTERVAL
+        ):
+            return None
+        self._rollup_coverage_checks[key] = time.monotonic()
+
+        query = (
+            f'from(bucket: "{self.bucket}") \n'
+            f"{self._timerange_query(None, None)} \n"
+            f'|> filter(fn: (r) => r["_measurement"] == "{_rollup_measurement(iri, tier_ms)}" '
+            'and r["_field"] == "count") \n'
+            "|> first() \n"
+            '|> keep(columns: ["_time"])'
+        )
+        # pylint: disable=W0703
+        try:
+            tables = self._query_api.query(query=query)
+        except Exception:
+            # Using generic exception on purpose: the raw readings are used instead
+            return None
+        for table in tables:
+            for record in table.records:
+                coverage_start = record.get_time() + timedelta(milliseconds=tier_ms)
+                self._rollup_coverage_starts[key] = coverage_start
+                return coverage_start
+        return None
+
+    def _rollup_tier(
+        self,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        window_ms: int,
+        aligned: bool,
+    ) -> int | None:
+        """
+        Selects the coarsest rollup tier that is at least as fine as the requested window and complete for
+        the requested range of all given time-series (covering the begin and not stale)
+        :param aligned: whether the window has to be a multiple of the tier (e.g. for aggregateWindow)
+        :return: tier in ms or None, if the raw readings have to be used
+        """
+        if self._rollup_aggregator is None or begin_time is None:
+            return None
+        candidates = [
+            tier_ms
+            for tier_ms in self._rollup_aggregator.tiers_ms
+            if tier_ms <= window_ms and (not aligned or window_ms % tier_ms == 0)
+        ]
+        for tier_ms in reversed(candidates):
+            coverage_starts = [
+                self._rollup_coverage_start(iri, tier_ms) for iri in iris
+            ]
+            if any(
+                coverage_start is None or coverage_start > begin_time.astimezone()
+                for coverage_start in coverage_starts
+            ):
+                continue
+            if not self._rollup_is_stale(iris, tier_ms, begin_time, end_time):
+                return tier_ms
+        return None
+
+    def _rollup_timerange_query(
+        self, begin_time: datetime, end_time: datetime | None, tier_ms: int
+    ) -> str:
+        """Range query starting with the bucket containing the begin time"""
+        begin_ms = int(begin_time.astimezone().timestamp() * 1000)
+        return self._timerange_query(
+            datetime.fromtimestamp(
+                (begin_ms - begin_ms % tier_ms) / 1000, tz=timezone.utc
+            ),
+            end_time,
+        )
+
+    def _write_lines(self, lines: List[str]):
+        """
+        Writes a batch of points given in line protocol
+        :raises Exception: if the database is not available
+        """
+        self._write_api.write(bucket=self.bucket, record=lines)
+
     def _timerange_query(self, begin_time: datetime | None, end_time: datetime | None):
         # Max 10 years as InfluxDB does not support unbounded queries
         datetime_min = (
@@ -95,7 +551,7 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             range_query = f"|> range(start: {begin_time.astimezone().isoformat()}, stop: {end_time.astimezone().isoformat()})"
         elif begin_time is None and end_time is not None:
             range_query = f"|> range(start: {datetime_min}, stop: {end_time.astimezone().isoformat()})"
-        elif begin_time is None and end_time is not None:
+        elif begin_time is not None and end_time is None:
             range_query = f"|> range(start: {begin_time.astimezone().isoformat()}, stop: {datetime_max})"
         else:
             range_query = f"|> range(start: {datetime_min}, stop: {datetime_max})"
@@ -121,10 +577,23 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         range_query = self._timerange_query(begin_time, end_time)
 
         if isinstance(aggregation_window_ms, int) and aggregation_window_ms != 0:
+            measurement_filter = f'r["_measurement"] == "{iri}"'
+            # Use a rollup tier (first value per bucket), if available:
+            tier_ms = self._rollup_tier(
+                [iri], begin_time, end_time, aggregation_window_ms, aligned=True
+            )
+            if tier_ms is not None:
+                range_query = self._rollup_timerange_query(
+                    begin_time, end_time, tier_ms
+                )
+                measurement_filter = (
+                    f'r["_measurement"] == "{_rollup_measurement(iri, tier_ms)}" '
+                    'and r["_field"] == "first"'
+                )
             query = (
                 f'from(bucket: "{self.bucket}") \n'
                 f"{range_query} \n"
-                f'|> filter(fn: (r) => r["_measurement"] == "{iri}") \n'
+                f"|> filter(fn: (r) => {measurement_filter}) \n"
                 f"|> aggregateWindow(every: {aggregation_window_ms}ms, fn: first, createEmpty: false)\n"
                 f'|> keep(columns: ["_time", "_value"]) \n'
                 '|> rename(columns: {_time: "time", _value: "value"})'
@@ -159,6 +628,209 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             # Skip this ts
             return None
 
+    # override
+    def read_periods_to_dataframes(
+        self,
+        iris: List[str],
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        aggregation_window_ms: int | None = None,
+    ) -> Dict[str, pd.DataFrame] | None:
+        """
+        Reads all measurements from the sensors with the given IDs in the time period with one query
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :param aggregation_window_ms:
+        :return: Dict: iri -> Dataframe containing all measurements in that period.
+        None if the database is not available
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        dataframes = {iri: pd.DataFrame({"time": [], "value": []}) for iri in iris}
+        if len(iris) == 0:
+            return dataframes
+
+        range_query = self._timerange_query(begin_time, end_time)
+        iris_set = ", ".join([f'"{iri}"' for iri in iris])
+        # Measurement -> iri
+        measurements = {iri: iri for iri in iris}
+
+        if isinstance(aggregation_window_ms, int) and aggregation_window_ms != 0:
+            field_filter = ""
+            # Use a rollup tier (first value per bucket), if available for all time-series:
+            tier_ms = self._rollup_tier(
+                iris, begin_time, end_time, aggregation_window_ms, aligned=True
+            )
+            if tier_ms is not None:
+                range_query = self._rollup_timerange_query(
+                    begin_time, end_time, tier_ms
+                )
+                measurements = {_rollup_measurement(iri, tier_ms): iri for iri in iris}
+                iris_set = ", ".join([f'"{name}"' for name in measurements.keys()])
+                field_filter = ' and r["_field"] == "first"'
+            query = (
+                f'from(bucket: "{self.bucket}") \n'
+                f"{range_query} \n"
+                f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{iris_set}]){field_filter}) \n'
+                f"|> aggregateWindow(every: {aggregation_window_ms}ms, fn: first, createEmpty: false)\n"
+                f'|> keep(columns: ["_time", "_measurement", "_value"]) \n'
+                '|> rename(columns: {_time: "time", _value: "value"})'
+            )
+        else:
+            query = (
+                f'from(bucket: "{self.bucket}") \n'
+                f"{range_query} \n"
+                f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{iris_set}])) \n'
+                f'|> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value") \n'
+                f'|> keep(columns: ["_time", "_measurement", "{READING_FIELD_NAME}"]) \n'
+                '|> rename(columns: {_time: "time", reading: "value"})'
+            )
+
+        try:
+            result = self._query_api.query_data_frame(query=query)
+        except KeyError:
+            # id_uri not found
+            raise IdNotFoundException
+        except NewConnectionError:
+            return None
+
+        # Tables with differing schemas (e.g. value types) are returned as separate dataframes
+        result_dfs = result if isinstance(result, list) else [result]
+        for result_df in result_dfs:
+            if result_df.empty:
+                continue
+            # Split by measurement on the client:
+            for measurement, iri_df in result_df.groupby("_measurement", sort=False):
+                dataframes[measurements[measurement]] = iri_df[
+                    ["time", "value"]
+                ].reset_index(drop=True)
+
+        return dataframes
+
+    # override
+    def read_period_min_max_to_dataframe(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        window_ms: int,
+    ) -> pd.DataFrame | None:
+        """
+        Reads the readings with the minimum and maximum value per window, keeping their actual time.
+        Only numeric readings are considered.
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :param window_ms:
+        :return: Dataframe sorted by time. None if the database is not available
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        range_query = self._timerange_query(begin_time, end_time)
+        window_ms = max(int(window_ms), 1)
+
+        tier_ms = self._rollup_tier(
+            [iri], begin_time, end_time, window_ms, aligned=False
+        )
+        if tier_ms is not None:
+            # Minimum and maximum of the rollup buckets. The time is the start of the bucket
+            # (finer than the window)
+            query = (
+                f'data = from(bucket: "{self.bucket}") \n'
+                f"{self._rollup_timerange_query(begin_time, end_time, tier_ms)} \n"
+                f'|> filter(fn: (r) => r["_measurement"] == "{_rollup_measurement(iri, tier_ms)}") \n'
+                f'minimums = data |> filter(fn: (r) => r["_field"] == "min") |> window(every: {window_ms}ms) |> min() \n'
+                f'maximums = data |> filter(fn: (r) => r["_field"] == "max") |> window(every: {window_ms}ms) |> max() \n'
+                "union(tables: [minimums, maximums]) \n"
+            )
+        else:
+            query = (
+                'import "types" \n'
+                f'data = from(bucket: "{self.bucket}") \n'
+                f"{range_query} \n"
+                f'|> filter(fn: (r) => r["_measurement"] == "{iri}" and r["_field"] == "{READING_FIELD_NAME}") \n'
+                '|> filter(fn: (r) => types.isType(v: r._value, type: "float") '
+                'or types.isType(v: r._value, type: "int")) \n'
+                f"|> window(every: {window_ms}ms) \n"
+                # Selectors keep the time of the selected reading (unlike aggregateWindow):
+                "union(tables: [data |> min(), data |> max()]) \n"
+            )
+        query += (
+            "|> group() \n"
+            '|> keep(columns: ["_time", "_value"]) \n'
+            '|> sort(columns: ["_time"]) \n'
+            '|> rename(columns: {_time: "time", _value: "value"})'
+        )
+
+        try:
+            df = self._query_api.query_data_frame(query=query)
+            if df.empty:
+                return pd.DataFrame({"time": [], "value": []})
+            # The minimum and maximum can be the same reading:
+            return df[["time", "value"]].drop_duplicates().reset_index(drop=True)
+
+        except KeyError:
+            # id_uri not found
+            raise IdNotFoundException
+        except NewConnectionError:
+            # Skip this ts
+            return None
+
+    # override
+    def read_period_iter(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        chunk_size: int,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Reads all measurements from the sensor with the given ID in the time period in chunks.
+        Pages through time (keyset pagination): each query starts right after the last reading of the
+        previous chunk, so that the database does not have to skip already returned readings.
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :param chunk_size: max. count of readings per chunk
+        :return: Generator of Dataframes featuring the columns "time" and "value"
+        :raise IdNotFoundException: if the id_uri is not found
+        """
+        # Max 10 years as InfluxDB does not support unbounded queries
+        cursor = (
+            pd.Timestamp(begin_time.astimezone())
+            if begin_time is not None
+            else pd.Timestamp((datetime.now() - timedelta(days=356 * 10)).astimezone())
+        )
+        stop = (
+            end_time.astimezone().isoformat()
+            if end_time is not None
+            else datetime.now().astimezone().isoformat()
+        )
+
+        while True:
+            query = (
+                f'from(bucket: "{self.bucket}") \n'
+                f"|> range(start: {cursor.isoformat()}, stop: {stop}) \n"
+                f'|> filter(fn: (r) => r["_measurement"] == "{iri}" and r["_field"] == "{READING_FIELD_NAME}") \n'
+                f"|> limit(n: {chunk_size}) \n"
+                '|> keep(columns: ["_time", "_value"]) \n'
+                '|> rename(columns: {_time: "time", _value: "value"})'
+            )
+            try:
+                df = self._query_api.query_data_frame(query=query)
+            except KeyError:
+                # id_uri not found
+                raise IdNotFoundException
+
+            if df.empty:
+                return
+            df = df[["time", "value"]]
+            yield df
+
+            if len(df) < chunk_size:
+                return
+            # Range start is inclusive: continue right after the last reading
+            cursor = pd.Timestamp(df["time"].iloc[-1]) + pd.Timedelta(nanoseconds=1)
+
     # override
     def count_entries_for_period(
         self, iri: str, begin_time: datetime, end_time: datetime
@@ -254,6 +926,112 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
             # Waiting for reconnect...
             return None
 
+    def _statistics_query(
+        self, iris: List[str], begin_time: datetime | None, end_time: datetime | None
+    ) -> str:
+        """
+        Flux query calculating all period statistics for the given measurements at once.
+        Min, max and mean are only calculated for numeric values.
+        """
+        range_query = self._timerange_query(begin_time, end_time)
+        iris_set = ", ".join([f'"{iri}"' for iri in iris])
+
+        def statistic(stream: str, function: str) -> str:
+            return (
+                f"{stream} |> {function}() "
+                f'|> set(key: "statistic", value: "{function}") '
+                '|> group(columns: ["_measurement", "statistic"])'
+            )
+
+        return (
+            'import "types" \n'
+            f'data = from(bucket: "{self.bucket}") \n'
+            f"{range_query} \n"
+            f'|> filter(fn: (r) => contains(value: r["_measurement"], set: [{iris_set}])) \n'
+            "numeric = data \n"
+            '|> filter(fn: (r) => types.isType(v: r._value, type: "float") '
+            'or types.isType(v: r._value, type: "int")) \n'
+            "union(tables: [\n"
+            + ",\n".join(
+                [statistic("data", function) for function in ["count", "first", "last"]]
+                + [
+                    statistic("numeric", function)
+                    for function in ["min", "max", "mean"]
+                ]
+            )
+            + "\n]) \n"
+            '|> keep(columns: ["_measurement", "statistic", "_time", "_value"])'
+        )
+
+    # override
+    def period_statistics_for_iris(
+        self,
+        iris: List[str],
+        begin_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> Dict[str, Dict] | None:
+        """
+        Calculates count, min, max, mean, first and last value for several sensors with one query
+        :param iris:
+        :param begin_time:
+        :param end_time:
+        :return: Dict: iri -> statistics dict. None if the database is not available
+        """
+        statistics = {
+            iri: {
+                "count": 0,
+                "min": None,
+                "max": None,
+                "mean": None,
+                "first": None,
+                "last": None,
+                "first_time": None,
+                "last_time": None,
+            }
+            for iri in iris
+        }
+        if len(iris) == 0:
+            return statistics
+
+        # pylint: disable=W0703
+        try:
+            tables = self._query_api.query(
+                query=self._statistics_query(iris, begin_time, end_time)
+            )
+        except Exception:
+            # Using generic exception on purpose, since there are many different ones occuring, that
+            # Waiting for reconnect...
+            return None
+
+        for table in tables:
+            for record in table.records:
+                iri_statistics = statistics.get(record.get_measurement())
+                if iri_statistics is None:
+                    continue
+                statistic = record["statistic"]
+                iri_statistics[statistic] = record.get_value()
+                if statistic in ["first", "last"]:
+                    iri_statistics[f"{statistic}_time"] = record.get_time()
+
+        return statistics
+
+    # override
+    def period_statistics(
+        self,
+        iri: str,
+        begin_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> Dict | None:
+        """
+        Calculates count, min, max, mean, first and last value with one query
+        :param iri:
+        :param begin_time:
+        :param end_time:
+        :return: statistics dict. None if the database is not available
+        """
+        statistics = self.period_statistics_for_iris([iri], begin_time, end_time)
+        return statistics.get(iri) if statistics is not None else None
+
     def backup(self, backup_path: str):
         logger.info("Backing up InfluxDB...")
 
@@ -300,4 +1078,7 @@ class InfluxDbPersistenceService(TimeseriesPersistenceService):
         subprocess.run(
             ["influx", "restore", backup_path, "--host", self.uri, "-t", self.key]
         )
+        self._rollup_coverage_starts.clear()
+        self._rollup_coverage_checks.clear()
+        notify_timeseries_data_changed()
         logger.info("Finished restoring InfluxDB.")
@@ -0,0 +1,265 @@
+import os
+import struct
+import zlib
+from threading import Lock
+from typing import BinaryIO, Dict, List, Tuple
+
+from util.log import logger
+
+SEGMENT_FILE_SUFFIX = ".wal"
+# Record header: payload length, CRC32 of the payload
+RECORD_HEADER = struct.Struct("<II")
+
+# Position of a read batch: segment sequence number, offset of its first and after its last record, record count
+SpoolCursor = Tuple[int, int, int, int]
+
+
+class InfluxDbWriteSpool:
+    """
+    Append-only on-disk spool for time-series points (in line protocol) that could not be written to the
+    database.
+
+    The spool consists of segment files with increasing sequence numbers. Each record is one point,
+    stored as payload length and CRC32 followed by the UTF-8 encoded line. Points are replayed in the order
+    they were appended. A segment is deleted after it has been replayed completely.
+    Segments are only deleted after replaying, so points may be written twice after a crash. As the
+    points carry their timestamps, this overwrites the identical point in the database.
+
+    When the total size exceeds the limit, the oldest segments are deleted. Segments with an unreadable record
+    before their end (e.g. torn by a failed write) are deleted when reading reaches that record.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int, max_bytes: int):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_bytes = max_bytes
+
+        self._lock = Lock()
+
+        # Sequence number -> (record count, size in bytes) of all existing segments
+        self._segments: Dict[int, List[int]] = dict()
+        self._write_file: BinaryIO | None = None
+        self._write_seq: int | None = None
+        self._read_offset = 0
+        self._read_records = 0
+
+        self.appended_total = 0
+        self.replayed_total = 0
+        self.dropped_total = 0
+
+    def open(self):
+        """
+        Creates the directory and loads existing segments. Called by the writing process only, so that
+        processes only reading from the database do not access the spool.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_segments()
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{SEGMENT_FILE_SUFFIX}")
+
+    def _load_segments(self):
+        """Scans the existing segments, e.g. left over from before a restart"""
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.endswith(SEGMENT_FILE_SUFFIX):
+                continue
+            seq = int(file_name[: -len(SEGMENT_FILE_SUFFIX)])
+            path = self._segment_path(seq)
+            count, valid_size = 0, 0
+            with open(path, "rb") as segment_file:
+                for _ in self._iterate_records(segment_file):
+                    count += 1
+                    valid_size = segment_file.tell()
+            if valid_size < os.path.getsize(path):
+                # Incomplete record at the end (e.g. crash while writing)
+                logger.info(
+                    f"Truncating incomplete record at the end of spool segment {path}"
+                )
+                os.truncate(path, valid_size)
+            if count == 0:
+                os.remove(path)
+                continue
+            self._segments[seq] = [count, valid_size]
+
+        if len(self._segments) > 0:
+            logger.info(
+                f"Found {self.depth()} spooled time-series readings in {self.directory}. "
+                "Will replay them as soon as the database is available."
+            )
+
+    @staticmethod
+    def _iterate_records(segment_file: BinaryIO):
+        while True:
+            header = segment_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, crc = RECORD_HEADER.unpack(header)
+            payload = segment_file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            yield payload.decode("utf-8")
+
+    def append(self, lines: List[str]):
+        """
+        Appends the points to the newest segment
+        :raises OSError: if the points could not be written (e.g. disk full)
+        """
+        if len(lines) == 0:
+            return
+        data = b"".join(
+            RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+            for payload in (line.encode("utf-8") for line in lines)
+        )
+        with self._lock:
+            if (
+                self._write_file is None
+                or self._segments[self._write_seq][1] >= self.segment_max_bytes
+            ):
+                self._rotate()
+            try:
+                self._write_file.write(data)
+                self._write_file.flush()
+                os.fsync(self._write_file.fileno())
+            except OSError:
+                self._discard_partial_append()
+                raise
+            self._segments[self._write_seq][0] += len(lines)
+            self._segments[self._write_seq][1] += len(data)
+            self.appended_total += len(lines)
+
+            self._enforce_size_limit()
+
+    def _discard_partial_append(self):
+        """
+        Removes what a failed append might have written, so that the following records stay readable. Later
+        appends go to a new segment
+        """
+        write_file = self._write_file
+        self._write_file = None
+        # pylint: disable=W0703
+        try:
+            write_file.close()
+        except Exception:
+            # Using generic exception on purpose: the buffered data is discarded by truncating anyway
+            pass
+        try:
+            os.truncate(
+                self._segment_path(self._write_seq), self._segments[self._write_seq][1]
+            )
+        except OSError:
+            # Reading stops at the torn record and skips the rest of the segment (see read_batch)
+            pass
+        self._write_seq = None
+
+    def _rotate(self):
+        if self._write_file is not None:
+            self._write_file.close()
+        self._write_seq = max(self._segments.keys(), default=0) + 1
+        self._write_file = open(self._segment_path(self._write_seq), "ab")
+        self._segments[self._write_seq] = [0, 0]
+
+    def _enforce_size_limit(self):
+        while self.size_bytes() > self.max_bytes and len(self._segments) > 1:
+            oldest_seq = min(self._segments.keys())
+            dropped = self._segments[oldest_seq][0] - (
+                self._read_records if oldest_seq == self._oldest_seq() else 0
+            )
+            self._delete_segment(oldest_seq)
+            self.dropped_total += dropped
+            logger.warning(
+                f"Time-series spool size limit reached: {dropped} spooled readings dropped."
+            )
+
+    def _oldest_seq(self) -> int | None:
+        return min(self._segments.keys(), default=None)
+
+    def _delete_segment(self, seq: int):
+        if seq == self._write_seq:
+            self._write_file.close()
+            self._write_file = None
+            self._write_seq = None
+        if seq == self._oldest_seq():
+            # Reading continues at the begin of the next segment
+            self._read_offset = 0
+            self._read_records = 0
+        os.remove(self._segment_path(seq))
+        self._segments.pop(seq)
+
+    def is_empty(self) -> bool:
+        return self.depth() == 0
+
+    def read_batch(self, max_count: int) -> Tuple[List[str], SpoolCursor | None]:
+        """
+        Reads the oldest points without removing them. Call commit() with the returned cursor after they have
+        been written. Only reads from one segment at a time.
+        Skips the rest of a segment, if it contains an unreadable record (its points are counted as dropped).
+        :return: points, cursor (None, if the spool is empty)
+        :raises OSError: if the segment could not be read
+        """
+        with self._lock:
+            while True:
+                seq = self._oldest_seq()
+                if seq is None:
+                    return [], None
+                lines = []
+                with open(self._segment_path(seq), "rb") as segment_file:
+                    segment_file.seek(self._read_offset)
+                    end_offset = self._read_offset
+                    for line in self._iterate_records(segment_file):
+                        lines.append(line)
+                        end_offset = segment_file.tell()
+                        if len(lines) >= max_count:
+                            break
+                if len(lines) > 0 or (
+                    seq == self._write_seq
+                    and self._read_records >= self._segments[seq][0]
+                ):
+                    return lines, (seq, self._read_offset, end_offset, len(lines))
+
+                # Unreadable record or nothing to read in a segment not written anymore
+                dropped = self._segments[seq][0] - self._read_records
+                self._delete_segment(seq)
+                if dropped == 0:
+                    continue
+                self.dropped_total += dropped
+                logger.warning(
+                    f"Unreadable record in time-series spool segment {self._segment_path(seq)}: "
+                    f"{dropped} spooled readings dropped."
+                )
+
+    def commit(self, cursor: SpoolCursor | None):
+        """
+        Removes the points of a read batch from the spool. Ignored, if the spool changed since reading in a way
+        that invalidates the cursor (e.g. the segment was deleted because of the size limit)
+        """
+        if cursor is None:
+            return
+        seq, start_offset, end_offset, count = cursor
+        with self._lock:
+            if seq != self._oldest_seq() or start_offset != self._read_offset:
+                return
+            self._read_offset = end_offset
+            self._read_records += count
+            self.replayed_total += count
+            if self._read_records >= self._segments[seq][0]:
+                self._delete_segment(seq)
+
+    def depth(self) -> int:
+        """Count of points currently in the spool"""
+        return (
+            sum(segment[0] for segment in self._segments.values()) - self._read_records
+        )
+
+    def size_bytes(self) -> int:
+        return sum(segment[1] for segment in self._segments.values())
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "spool_depth": self.depth(),
+            "spool_segments": len(self._segments),
+            "spool_size_bytes": self.size_bytes(),
+            "spooled_total": self.appended_total,
+            "replayed_total": self.replayed_total,
+            "spool_dropped_total": self.dropped_total,
+        }
@@ -0,0 +1,124 @@
+import json
+import time
+from typing import Dict, List, Tuple
+
+from util.inter_process_cache import memcache
+from util.log import logger
+
+# Time of the last retroactive change of stored time-series data (e.g. restore / import)
+DATA_CHANGE_CACHE_KEY = "timeseries_data_changed"
+# Recently written readings with old timestamps (e.g. late or replayed readings)
+LATE_WRITES_CACHE_KEY = "timeseries_late_writes"
+# Count of late write ranges kept in the inter-process cache
+LATE_WRITES_MAX_ENTRIES = 1000
+# Attempts to update the late write ranges, if other processes update them at the same time
+LATE_WRITES_UPDATE_ATTEMPTS = 10
+# Time to reuse the state read from the inter-process cache (in s)
+DATA_CHANGE_CHECK_INTERVAL = 3
+
+
+def notify_timeseries_data_changed():
+    """
+    Announces that stored time-series data has been replaced (e.g. restore / import), so that all processes
+    invalidate what they derived from it. Can be called from any process
+    """
+    memcache.set(DATA_CHANGE_CACHE_KEY, str(time.time()))
+
+
+def _get_last_data_change() -> float:
+    changed = memcache.get(DATA_CHANGE_CACHE_KEY)
+    return float(changed) if changed is not None else 0
+
+
+def notify_late_timeseries_writes(late_writes: Dict[str, Tuple[int, int]]):
+    """
+    Announces readings written with old timestamps, so that all processes invalidate what they derived from
+    the affected time ranges. Can be called from any process
+    :param late_writes: iri -> earliest and latest time of the written readings (in ms since the epoch)
+    """
+    if len(late_writes) == 0:
+        return
+    for _ in range(LATE_WRITES_UPDATE_ATTEMPTS):
+        state_json, cas_token = memcache.gets(LATE_WRITES_CACHE_KEY)
+        state = (
+            json.loads(state_json)
+            if state_json is not None
+            else {"sequence": 0, "dropped_until": 0, "entries": []}
+        )
+        for iri, (begin_ms, end_ms) in late_writes.items():
+            state["sequence"] += 1
+            state["entries"].append([state["sequence"], iri, begin_ms, end_ms])
+        if len(state["entries"]) > LATE_WRITES_MAX_ENTRIES:
+            dropped = state["entries"][:-LATE_WRITES_MAX_ENTRIES]
+            state["entries"] = state["entries"][-LATE_WRITES_MAX_ENTRIES:]
+            state["dropped_until"] = dropped[-1][0]
+
+        if state_json is None:
+            stored = memcache.add(
+                LATE_WRITES_CACHE_KEY, json.dumps(state), noreply=False
+            )
+        else:
+            stored = memcache.cas(LATE_WRITES_CACHE_KEY, json.dumps(state), cas_token)
+        if stored:
+            return
+    logger.warning(
+        f"Could not announce late writes of {len(late_writes)} time-series: inter-process cache busy"
+    )
+
+
+def _get_late_writes_state() -> Dict:
+    state_json = memcache.get(LATE_WRITES_CACHE_KEY)
+    return (
+        json.loads(state_json)
+        if state_json is not None
+        else {"sequence": 0, "dropped_until": 0, "entries": []}
+    )
+
+
+class TimeseriesDataChangeWatcher:
+    """
+    Detects announced data changes (see notify_timeseries_data_changed and notify_late_timeseries_writes)
+    in the current process. Checks the inter-process cache at most once per check interval
+    """
+
+    def __init__(self):
+        self._last_change = None
+        self._checked = -DATA_CHANGE_CHECK_INTERVAL
+        self._late_writes_sequence = None
+        self._late_writes_checked = -DATA_CHANGE_CHECK_INTERVAL
+
+    def changed(self) -> bool:
+        """
+        :return: True, if the data changed since the last call (not on the first call)
+        """
+        if time.monotonic() - self._checked < DATA_CHANGE_CHECK_INTERVAL:
+            return False
+        self._checked = time.monotonic()
+
+        last_change = _get_last_data_change()
+        changed = self._last_change is not None and last_change != self._last_change
+        self._last_change = last_change
+        return changed
+
+    def get_late_writes(self) -> List[Tuple[str, int, int]] | None:
+        """
+        :return: late writes (iri, earliest and latest time in ms) announced since the last call (none on the
+        first call). None, if some of them are not available anymore, so that everything has to be invalidated
+        """
+        if time.monotonic() - self._late_writes_checked < DATA_CHANGE_CHECK_INTERVAL:
+            return []
+        self._late_writes_checked = time.monotonic()
+
+        state = _get_late_writes_state()
+        last_sequence = self._late_writes_sequence
+        self._late_writes_sequence = state["sequence"]
+        if last_sequence is None:
+            return []
+        if state["dropped_until"] > last_sequence or state["sequence"] < last_sequence:
+            # Dropped meanwhile (or the inter-process cache was restarted)
+            return None
+        return [
+            (iri, begin_ms, end_ms)
+            for sequence, iri, begin_ms, end_ms in state["entries"]
+            if sequence > last_sequence
+        ]
@@ -0,0 +1,128 @@
+"""
+Downsampling of time-series readings for visualization.
+Unlike aggregation windows, the selected readings keep the visual shape (including spikes) of the series.
+"""
+
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+
+class DownsamplingMethods(Enum):
+    # Largest-Triangle-Three-Buckets
+    LTTB = "lttb"
+    # Readings with the minimum and maximum value per bucket
+    MIN_MAX = "min_max"
+
+
+# Count of readings preselected per output reading (min/max per window) before applying LTTB
+LTTB_PRESELECTION_RATIO = 4
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, target_count: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: selects the first and last reading and the reading per bucket,
+    that forms the largest triangle with the previously selected reading and the average of the
+    next bucket.
+    :param x: Sorted x values (e.g. time as integer)
+    :param y: Numeric values
+    :param target_count: Count of readings to select (at least 3)
+    :return: Indices of the selected readings
+    """
+    count = len(x)
+    if target_count >= count or target_count < 3:
+        return np.arange(count)
+
+    # Relative to the first reading to keep the precision (e.g. for nanosecond timestamps):
+    x = (x - x[0]).astype(np.float64)
+    y = y.astype(np.float64)
+
+    # Bucket borders for all readings except the first and last one:
+    borders = np.linspace(1, count - 1, target_count - 1).astype(np.int64)
+    # Average of each bucket (the last bucket is followed by the last reading):
+    bucket_x_avg = np.add.reduceat(x[1:-1], borders[:-1] - 1) / np.diff(borders)
+    bucket_y_avg = np.add.reduceat(y[1:-1], borders[:-1] - 1) / np.diff(borders)
+    next_x_avg = np.append(bucket_x_avg[1:], x[-1])
+    next_y_avg = np.append(bucket_y_avg[1:], y[-1])
+
+    selected = np.empty(target_count, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(target_count - 2):
+        start, end = borders[bucket], borders[bucket + 1]
+        # Doubled triangle areas for all readings of the bucket:
+        areas = np.abs(
+            (x[previous] - next_x_avg[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y_avg[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def min_max_indices(y: np.ndarray, target_count: int) -> np.ndarray:
+    """
+    Selects the readings with the minimum and maximum value of target_count / 2 buckets
+    with the same count of readings
+    :param y: Numeric values
+    :param target_count: Max. count of readings to select
+    :return: Sorted indices of the selected readings
+    """
+    count = len(y)
+    if target_count >= count or target_count < 2:
+        return np.arange(count)
+
+    bucket_count = target_count // 2
+    # Pad to full buckets with values not changing minimum and maximum:
+    bucket_size = -(-count // bucket_count)
+    padding = bucket_count * bucket_size - count
+    y = y.astype(np.float64)
+    buckets_min = np.append(y, np.full(padding, np.inf)).reshape(bucket_count, -1)
+    buckets_max = np.append(y, np.full(padding, -np.inf)).reshape(bucket_count, -1)
+
+    offsets = np.arange(bucket_count) * bucket_size
+    selected = np.concatenate(
+        [
+            offsets + np.argmin(buckets_min, axis=1),
+            offsets + np.argmax(buckets_max, axis=1),
+        ]
+    )
+    return np.unique(selected[selected < count])
+
+
+def downsample_dataframe(
+    df: pd.DataFrame,
+    target_count: int,
+    method: DownsamplingMethods = DownsamplingMethods.LTTB,
+) -> pd.DataFrame:
+    """
+    Reduces the readings to the target count, if there are more.
+    Booleans are treated as 0 and 1, other non-numeric readings are selected evenly spaced.
+    :param df: Dataframe with the columns "time" and "value", sorted by time
+    :return: Dataframe with the selected original readings
+    """
+    if len(df) <= target_count:
+        return df
+
+    values = df["value"].to_numpy()
+    if values.dtype == np.bool_:
+        values = values.astype(np.int8)
+
+    if not np.issubdtype(values.dtype, np.number):
+        indices = np.unique(
+            np.linspace(0, len(df) - 1, target_count).round().astype(np.int64)
+        )
+    elif method == DownsamplingMethods.MIN_MAX:
+        indices = min_max_indices(values, target_count)
+    else:
+        times = (
+            pd.to_datetime(df["time"], utc=True)
+            .to_numpy(dtype="datetime64[ns]")
+            .astype(np.int64)
+        )
+        indices = lttb_indices(times, values, target_count)
+
+    return df.iloc[indices].reset_index(drop=True)
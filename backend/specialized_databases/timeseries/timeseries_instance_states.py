@@ -0,0 +1,68 @@
+import json
+import time
+from typing import Dict
+
+from util.inter_process_cache import memcache
+from util.log import logger
+
+# Buffer and spool metrics of the time-series writes (see DatabasePersistenceServiceContainer)
+WRITE_METRICS_CACHE_KEY = "timeseries_write_metrics"
+
+# Time after which the state of a backend instance is unknown, if it has not been updated (in s)
+INSTANCE_STATE_MAX_AGE = 30
+# Time after which the state of a backend instance is removed, if it has not been updated (in s)
+INSTANCE_STATE_EXPIRY = 3600
+# Attempts to update the states, if other instances update them at the same time
+INSTANCE_STATE_UPDATE_ATTEMPTS = 10
+
+
+def _update_instance_states(key: str, update):
+    for _ in range(INSTANCE_STATE_UPDATE_ATTEMPTS):
+        states_json, cas_token = memcache.gets(key)
+        states = json.loads(states_json) if states_json is not None else dict()
+        update(states)
+        now = time.time()
+        states = {
+            node_id: entry
+            for node_id, entry in states.items()
+            if now - entry["updated"] < INSTANCE_STATE_EXPIRY
+        }
+
+        if states_json is None:
+            stored = memcache.add(key, json.dumps(states), noreply=False)
+        else:
+            stored = memcache.cas(key, json.dumps(states), cas_token)
+        if stored:
+            return
+    logger.warning(f"Could not update {key}: inter-process cache busy")
+
+
+def publish_instance_state(key: str, node_id: str, state: Dict):
+    """
+    Stores the state of one backend instance next to the ones of the other instances sharing the
+    inter-process cache (e.g. sharded runtime connections), instead of overwriting them
+    """
+
+    def update(states: Dict):
+        states[node_id] = {"updated": time.time(), "state": state}
+
+    _update_instance_states(key, update)
+
+
+def remove_instance_state(key: str, node_id: str):
+    """Removes the state of a backend instance that stopped"""
+    _update_instance_states(key, lambda states: states.pop(node_id, None))
+
+
+def get_instance_states(key: str) -> Dict[str, Dict] | None:
+    """
+    :return: node id -> {"updated": time of the last update (s since the epoch), "state": state} for all
+    backend instances. None, if no instance published its state yet (e.g. after restarting the inter-process
+    cache)
+    """
+    states_json = memcache.get(key)
+    return json.loads(states_json) if states_json is not None else None
+
+
+def is_instance_state_current(entry: Dict) -> bool:
+    return time.time() - entry["updated"] < INSTANCE_STATE_MAX_AGE
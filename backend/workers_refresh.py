@@ -0,0 +1,85 @@
+from threading import Thread
+import time
+
+from backend.annotation_detection.AnnotationDetectorContainer import (
+    AnnotationDetectorContainer,
+)
+from backend.runtime_connections.RuntimeConnectionContainer import (
+    RuntimeConnectionContainer,
+)
+from backend.runtime_connections.sharding.ShardCoordinator import ShardCoordinator
+from util.environment_and_configuration import (
+    ConfigGroups,
+    get_configuration_int,
+)
+from util.inter_process_cache import memcache
+from util.log import logger
+
+# Time of the last refresh request (set by the API workers)
+REFRESH_REQUEST_CACHE_KEY = "workers_refresh_requested"
+# Interval for checking for refresh requests (in s)
+REFRESH_REQUEST_POLL_INTERVAL = 1
+
+
+def request_workers_refresh():
+    """
+    Requests refreshing the time-series inputs, runtime connections and annotation detectors right away
+    (e.g. after changing the graph). Can be called from any process
+    """
+    memcache.set(REFRESH_REQUEST_CACHE_KEY, str(time.time()))
+
+
+def _get_last_refresh_request() -> float:
+    requested = memcache.get(REFRESH_REQUEST_CACHE_KEY)
+    return float(requested) if requested is not None else 0
+
+
+def refresh_workers():
+    runtime_con_container: RuntimeConnectionContainer = (
+        RuntimeConnectionContainer.instance()
+    )
+    detectors_container: AnnotationDetectorContainer = (
+        AnnotationDetectorContainer.instance()
+    )
+    changed_ts_iris = runtime_con_container.refresh_connection_inputs_and_handlers()
+    detectors_container.refresh_annotation_detectors(
+        changed_timeseries_iris=changed_ts_iris
+    )
+
+
+def _refresh_workers_thread_loop():
+    """
+    Refreshes the workers if requested, if the shard ownership has to be updated, or otherwise every check interval.
+    Refreshing is cheap, if the graph did not change (see
+    RuntimeConnectionContainer.refresh_connection_inputs_and_handlers)
+    """
+    check_interval = get_configuration_int(
+        group=ConfigGroups.API, key="workers_refresh_check_interval_s"
+    )
+    last_refresh = time.time()
+    while True:
+        time.sleep(REFRESH_REQUEST_POLL_INTERVAL)
+        now = time.time()
+        if (
+            _get_last_refresh_request() < last_refresh
+            and now - last_refresh < check_interval
+            and not ShardCoordinator.instance().rebalance_required()
+        ):
+            continue
+
+        last_refresh = now
+        # pylint: disable=W0703
+        try:
+            refresh_workers()
+        except Exception as exc:
+            # Using generic exception on purpose: retried with the next check
+            logger.warning(f"Refreshing worker services failed: {exc}")
+
+
+def start_workers_refresh_thread():
+    """
+    Thread checking regularly, if timeseries inputs, runtime-connections and annotation detectors have been
+    added / removed / changed
+    """
+    workers_refresh_thread = Thread(target=_refresh_workers_thread_loop)
+    workers_refresh_thread.start()
@@ -0,0 +1,417 @@
+"""
+End-to-end ingest benchmark: readings of an embedded MQTT broker or OPC UA server (or replayed from memory) through
+the runtime connections and time-series inputs to write_measurement of an in-memory persistence service and,
+optionally, to annotation detector stand-ins.
+
+Reports the throughput, the ingest-to-persist latency (p50 / p99, from the source timestamp of the reading) and the
+CPU time per reading of the ingest process (the broker / server runs in a separate process). Runs on a single machine
+without external services, except for the local memcached inter-process cache (started automatically).
+
+Usage (from the project root):
+python -m benchmarks.ingest_benchmark mqtt --topics 100 --keywords 10 --rate 10
+python -m benchmarks.ingest_benchmark opcua --nodes 1000 --rate 1 --sampling-mode SUBSCRIPTION --engine asyncio
+python -m benchmarks.ingest_benchmark replay --series 10 --readings 100000 --detectors 2 --json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from backend.runtime_connections.AsyncioRuntimeEngine import AsyncioRuntimeEngine
+from backend.runtime_connections.RuntimeConnection import RuntimeConnection
+from backend.runtime_connections.TimeseriesHandlerDispatcher import (
+    HandlerQueuePolicies,
+    TimeseriesHandlerDispatcher,
+)
+from backend.runtime_connections.TimeseriesInput import TimeseriesInput
+from backend.runtime_connections.mqtt.AsyncioMqttRuntimeConnection import (
+    AsyncioMqttRuntimeConnection,
+)
+from backend.runtime_connections.mqtt.MqttRuntimeConnection import (
+    MqttRuntimeConnection,
+)
+from backend.runtime_connections.mqtt.MqttTimeseriesInput import MqttTimeseriesInput
+from backend.runtime_connections.opcua.AsyncioOpcuaRuntimeConnection import (
+    AsyncioOpcuaRuntimeConnection,
+)
+from backend.runtime_connections.opcua.OpcuaRuntimeConnection import (
+    OpcuaRuntimeConnection,
+)
+from backend.runtime_connections.opcua.OpcuaTimeseriesInput import OpcuaTimeseriesInput
+from backend.runtime_connections.replay.ReplayRuntimeConnection import (
+    ReplayRuntimeConnection,
+)
+from backend.runtime_connections.replay.ReplayTimeseriesInput import (
+    ReplayTimeseriesInput,
+)
+from benchmarks.stand_ins.BenchmarkPersistenceService import (
+    BenchmarkPersistenceService,
+)
+from benchmarks.stand_ins.DetectorStandIn import DetectorStandIn
+from benchmarks.stand_ins.EmbeddedMqttBroker import (
+    EmbeddedMqttBroker,
+    keyword_name,
+    topic_name,
+)
+from benchmarks.stand_ins.EmbeddedOpcuaServer import (
+    EmbeddedOpcuaServer,
+    node_id_string,
+)
+from graph_domain.main_digital_twin.RuntimeConnectionNode import SamplingModes
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+HOST_ENVIRONMENT_VARIABLE = "BENCHMARK_HOST"
+PORT_ENVIRONMENT_VARIABLE = "BENCHMARK_PORT"
+ENGINES = ["threads", "asyncio"]
+# Max. time for the broker / server to start and for the first reading to be persisted (in s)
+STARTUP_TIMEOUT = 30
+# Max. time for the handlers to catch up with a replay (in s)
+DRAIN_TIMEOUT = 120
+
+CONNECTION_CLASSES = {
+    ("mqtt", "threads"): MqttRuntimeConnection,
+    ("mqtt", "asyncio"): AsyncioMqttRuntimeConnection,
+    ("opcua", "threads"): OpcuaRuntimeConnection,
+    ("opcua", "asyncio"): AsyncioOpcuaRuntimeConnection,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until(condition: Callable[[], bool], timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def _port_open(port: int) -> bool:
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def _create_inputs(args) -> List[TimeseriesInput]:
+    if args.protocol == "mqtt":
+        return [
+            MqttTimeseriesInput(
+                iri=f"benchmark_{topic_number}_{keyword_number}",
+                connection_topic=topic_name(topic_number),
+                connection_keyword=keyword_name(keyword_number),
+                value_type=TimeseriesValueTypes.DECIMAL.value,
+            )
+            for topic_number in range(args.topics)
+            for keyword_number in range(args.keywords)
+        ]
+    if args.protocol == "opcua":
+        return [
+            OpcuaTimeseriesInput(
+                iri=f"benchmark_{node_number}",
+                connection_topic=node_id_string(node_number),
+                connection_keyword=None,
+                value_type=TimeseriesValueTypes.DECIMAL.value,
+            )
+            for node_number in range(args.nodes)
+        ]
+    return [
+        ReplayTimeseriesInput(
+            iri=f"benchmark_replay_{series_number}",
+            connection_topic=f"benchmark_{series_number}",
+            connection_keyword=None,
+            value_type=TimeseriesValueTypes.DECIMAL.value,
+        )
+        for series_number in range(args.series)
+    ]
+
+
+def _create_connection(
+    args, persistence_service: BenchmarkPersistenceService
+) -> RuntimeConnection:
+    connection_settings = dict(
+        iri=f"benchmark_{args.protocol}_connection",
+        host_environment_variable=HOST_ENVIRONMENT_VARIABLE,
+        port_environment_variable=PORT_ENVIRONMENT_VARIABLE,
+        user_environment_variable=None,
+        key_environment_variable=None,
+    )
+    if args.protocol == "mqtt":
+        return CONNECTION_CLASSES[("mqtt", args.engine)](**connection_settings)
+    if args.protocol == "opcua":
+        return CONNECTION_CLASSES[("opcua", args.engine)](
+            sampling_mode=args.sampling_mode,
+            sampling_interval_ms=args.sampling_interval_ms,
+            **connection_settings,
+        )
+
+    # Replays need no host, and read from the persistence service as fast as possible
+    connection_settings["host_environment_variable"] = None
+    connection_settings["port_environment_variable"] = None
+    return ReplayRuntimeConnection(
+        replay_speedup=0, persistence_service=persistence_service, **connection_settings
+    )
+
+
+def _store_replayed_readings(args, persistence_service: BenchmarkPersistenceService):
+    begin = datetime.now().astimezone() - timedelta(
+        milliseconds=args.readings * args.interval_ms
+    )
+    times = [
+        begin + timedelta(milliseconds=i * args.interval_ms)
+        for i in range(args.readings)
+    ]
+    for series_number in range(args.series):
+        persistence_service.store_readings(
+            iri=f"benchmark_{series_number}",
+            times=times,
+            values=[float(i + series_number) for i in range(args.readings)],
+        )
+
+
+def _start_stand_in(
+    args, stop_event: multiprocessing.Event, published_total
+) -> multiprocessing.Process:
+    port = _free_port()
+    os.environ[HOST_ENVIRONMENT_VARIABLE] = "127.0.0.1"
+    os.environ[PORT_ENVIRONMENT_VARIABLE] = str(port)
+
+    if args.protocol == "mqtt":
+        stand_in = EmbeddedMqttBroker(
+            port=port,
+            topics_count=args.topics,
+            keywords_per_topic=args.keywords,
+            messages_per_second=args.rate,
+        )
+    else:
+        stand_in = EmbeddedOpcuaServer(
+            port=port, nodes_count=args.nodes, updates_per_second=args.rate
+        )
+
+    process = multiprocessing.Process(
+        target=stand_in.run, args=(stop_event, published_total), daemon=True
+    )
+    process.start()
+    if not _wait_until(lambda: _port_open(port), STARTUP_TIMEOUT):
+        raise RuntimeError(f"The {args.protocol} stand-in did not start")
+    return process
+
+
+def _dropped_total(engine: str) -> int:
+    """
+    :return: readings dropped by the handler queues and (asyncio engine) the dispatch queues
+    """
+    dropped = sum(
+        handler_metrics["dropped_total"]
+        for handler_metrics in TimeseriesHandlerDispatcher.instance()
+        .get_metrics()
+        .values()
+    )
+    if engine == "asyncio":
+        dropped += AsyncioRuntimeEngine.instance().dropped_total
+    return dropped
+
+
+def run_benchmark(args) -> Dict:
+    """
+    :return: settings and results of the benchmark
+    """
+    persistence_service = BenchmarkPersistenceService(
+        record_latencies=args.protocol != "replay"
+    )
+    # Processes are started before any threads of the connections and handlers:
+    detectors = [
+        DetectorStandIn(number, record_latencies=args.protocol != "replay")
+        for number in range(args.detectors)
+    ]
+    for detector in detectors:
+        detector.start()
+    stop_event = multiprocessing.Event()
+    published_total = multiprocessing.Value("q", 0)
+    stand_in_process = None
+    if args.protocol != "replay":
+        stand_in_process = _start_stand_in(args, stop_event, published_total)
+    else:
+        _store_replayed_readings(args, persistence_service)
+
+    inputs = _create_inputs(args)
+    for ts_input in inputs:
+        ts_input.register_handler(
+            handler_method=persistence_service.write_measurement,
+            handler_id=persistence_service.iri,
+            queue_policy=HandlerQueuePolicies.UNBOUNDED.value,
+        )
+        for detector in detectors:
+            ts_input.register_handler(
+                handler_method=detector.reading_handler,
+                handler_id=detector.input_handler_id,
+            )
+    connection = _create_connection(args, persistence_service)
+    connection.timeseries_inputs = {ts_input.iri: ts_input for ts_input in inputs}
+
+    if args.protocol != "replay":
+        connection.start_connection()
+        if not _wait_until(
+            lambda: persistence_service.written_total > 0, STARTUP_TIMEOUT
+        ):
+            raise RuntimeError("No readings received")
+        time.sleep(args.warmup)
+
+    dropped_begin = _dropped_total(args.engine)
+    published_begin = published_total.value
+    cpu_begin = time.process_time()
+    begin = time.monotonic()
+    persistence_service.recorder.start()
+    for detector in detectors:
+        detector.start_recording()
+
+    if args.protocol == "replay":
+        # Measured until all replayed readings are persisted (or dropped)
+        connection.start_connection()
+        _wait_until(
+            lambda: connection.get_metrics()["finished"]
+            and persistence_service.recorder.count
+            + _dropped_total(args.engine)
+            - dropped_begin
+            >= connection.replayed_readings_total,
+            DRAIN_TIMEOUT,
+        )
+    else:
+        time.sleep(args.duration)
+
+    persistence_service.recorder.stop()
+    elapsed = time.monotonic() - begin
+    cpu = time.process_time() - cpu_begin
+    published = published_total.value - published_begin
+    dropped = _dropped_total(args.engine) - dropped_begin
+    detector_summaries = [detector.stop_recording() for detector in detectors]
+
+    connection.disconnect()
+    for ts_input in inputs:
+        ts_input.remove_all_handlers()
+    stop_event.set()
+    if stand_in_process is not None:
+        stand_in_process.join(timeout=10)
+    for detector in detectors:
+        detector.stop()
+
+    persisted = persistence_service.recorder.get_summary()
+    if args.protocol == "mqtt":
+        offered_readings = published * args.keywords
+    elif args.protocol == "opcua":
+        offered_readings = published
+    else:
+        offered_readings = None
+
+    results = {key: value for key, value in vars(args).items() if key != "json"}
+    results.update(
+        {
+            "time_series": len(inputs),
+            "measured_s": round(elapsed, 3),
+            # Readings generated by the stand-in (OPC UA: value updates, polling may read more or less)
+            "offered_readings_per_s": (
+                round(offered_readings / elapsed)
+                if offered_readings is not None
+                else None
+            ),
+            "persisted_readings_per_s": round(persisted["readings"] / elapsed),
+            "persist_latency_ms_p50": persisted["latency_ms_p50"],
+            "persist_latency_ms_p99": persisted["latency_ms_p99"],
+            "cpu_us_per_reading": (
+                round(cpu / persisted["readings"] * 1000000, 2)
+                if persisted["readings"] > 0
+                else None
+            ),
+            "cpu_cores_used": round(cpu / elapsed, 2),
+            "dropped_readings": dropped,
+            "detector_results": detector_summaries,
+        }
+    )
+    return results
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="End-to-end ingest benchmark without external services"
+    )
+    protocols = parser.add_subparsers(dest="protocol", required=True)
+
+    mqtt_parser = protocols.add_parser(
+        "mqtt", help="readings received from an embedded MQTT broker"
+    )
+    mqtt_parser.add_argument("--topics", type=int, default=100)
+    mqtt_parser.add_argument(
+        "--keywords", type=int, default=10, help="time-series per topic"
+    )
+    mqtt_parser.add_argument(
+        "--rate", type=float, default=10, help="messages per second and topic"
+    )
+
+    opcua_parser = protocols.add_parser(
+        "opcua", help="readings received from an embedded OPC UA server"
+    )
+    opcua_parser.add_argument("--nodes", type=int, default=1000)
+    opcua_parser.add_argument(
+        "--rate", type=float, default=1, help="value updates per second and node"
+    )
+    opcua_parser.add_argument(
+        "--sampling-mode",
+        default=SamplingModes.POLLING.value,
+        choices=[mode.value for mode in SamplingModes],
+    )
+    opcua_parser.add_argument("--sampling-interval-ms", type=int, default=500)
+
+    replay_parser = protocols.add_parser(
+        "replay", help="readings replayed from memory as fast as possible"
+    )
+    replay_parser.add_argument("--series", type=int, default=10)
+    replay_parser.add_argument(
+        "--readings", type=int, default=100000, help="readings per time-series"
+    )
+    replay_parser.add_argument(
+        "--interval-ms", type=int, default=100, help="time between the readings"
+    )
+
+    for protocol_parser in [mqtt_parser, opcua_parser, replay_parser]:
+        protocol_parser.add_argument("--engine", default="threads", choices=ENGINES)
+        protocol_parser.add_argument(
+            "--detectors",
+            type=int,
+            default=0,
+            help="annotation detector stand-ins receiving all readings",
+        )
+        protocol_parser.add_argument(
+            "--json", action="store_true", help="print the results as one JSON line"
+        )
+    # Replays are measured from the first until the last reading
+    for protocol_parser in [mqtt_parser, opcua_parser]:
+        protocol_parser.add_argument(
+            "--warmup", type=float, default=5, help="seconds before measuring"
+        )
+        protocol_parser.add_argument(
+            "--duration", type=float, default=20, help="seconds measured"
+        )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = _parse_arguments()
+    benchmark_results = run_benchmark(arguments)
+    if arguments.json:
+        print(json.dumps(benchmark_results))
+    else:
+        for result_key, result_value in benchmark_results.items():
+            print(f"{result_key:28} {result_value}")
+    # Connection and handler threads are not daemons
+    os._exit(0)
@@ -0,0 +1,186 @@
+import numbers
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from backend.exceptions.IdNotFoundException import IdNotFoundException
+from backend.specialized_databases.timeseries.TimeseriesPersistenceService import (
+    TimeseriesPersistenceService,
+)
+from benchmarks.stand_ins.LatencyRecorder import LatencyRecorder
+
+
+class BenchmarkPersistenceService(TimeseriesPersistenceService):
+    """
+    In-memory stand-in for a time-series database. Written readings are only counted (with their ingest-to-persist
+    latency), so that the database does not limit the measured throughput. Serves readings added in advance for
+    replays
+    """
+
+    # pylint: disable=W0231
+    def __init__(self, iri: str = "benchmark_persistence", record_latencies=True):
+        # No database connection (the base class would require its environment variables)
+        self.iri = iri
+        self.recorder = LatencyRecorder(record_latencies=record_latencies)
+        self.written_total = 0
+        self._stored: Dict[str, pd.DataFrame] = dict()
+        # Backup path -> stored readings at the time of the backup
+        self._backups: Dict[str, Dict[str, pd.DataFrame]] = dict()
+
+    def store_readings(self, iri: str, times: List[datetime], values: List):
+        """Stores readings, that can be read afterwards (e.g. for replays)"""
+        self._stored[iri] = pd.DataFrame(
+            {"time": pd.to_datetime(times), "value": values}
+        )
+
+    # override
+    def write_measurement(
+        self, iri: str, value: float | bool | str, reading_time: datetime = None
+    ):
+        self.written_total += 1
+        self.recorder.record(reading_time)
+
+    def _stored_period(
+        self, iri: str, begin_time: datetime | None, end_time: datetime | None
+    ) -> pd.DataFrame:
+        df = self._stored.get(iri)
+        if df is None:
+            raise IdNotFoundException
+        if begin_time is not None:
+            df = df[df["time"] >= pd.Timestamp(begin_time)]
+        if end_time is not None:
+            df = df[df["time"] < pd.Timestamp(end_time)]
+        return df
+
+    # override
+    def read_period_to_dataframe(
+        self,
+        iri: str,
+        begin_time: datetime,
+        end_time: datetime,
+        aggregation_window_ms: int | None = None,
+    ) -> pd.DataFrame:
+        return self._stored_period(iri, begin_time, end_time)
+
+    # override
+    def read_periods_to_dataframes(
+        self,
+        iris: List[str],
+        begin_time: datetime,
+        end_time: datetime,
+        aggregation_window_ms: int | None = None,
+    ) -> Dict[str, pd.DataFrame] | None:
+        return {
+            iri: (
+                self._stored_period(iri, begin_time, end_time)
+                if iri in self._stored
+                else pd.DataFrame(columns=["time", "value"])
+            )
+            for iri in iris
+        }
+
+    # override
+    def read_period_iter(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        chunk_size: int,
+    ) -> Iterator[pd.DataFrame]:
+        df = self._stored_period(iri, begin_time, end_time)
+        for position in range(0, len(df), chunk_size):
+            yield df.iloc[position : position + chunk_size]
+
+    # override
+    def read_period_min_max_to_dataframe(
+        self,
+        iri: str,
+        begin_time: datetime | None,
+        end_time: datetime | None,
+        window_ms: int,
+    ) -> pd.DataFrame | None:
+        df = self._numeric(self._stored_period(iri, begin_time, end_time))
+        if df.empty:
+            return pd.DataFrame({"time": [], "value": []})
+        # Windows aligned to the epoch (like the windows of the database)
+        windows = df["time"].dt.floor(f"{window_ms}ms")
+        values = df["value"].astype(float)
+        selected = pd.concat(
+            [
+                values.groupby(windows).idxmin(),
+                values.groupby(windows).idxmax(),
+            ]
+        )
+        return (
+            df.loc[sorted(set(selected)), ["time", "value"]]
+            .sort_values("time")
+            .reset_index(drop=True)
+        )
+
+    # override
+    def count_entries_for_period(
+        self, iri: str, begin_time: datetime, end_time: datetime
+    ) -> int:
+        return len(self._stored_period(iri, begin_time, end_time))
+
+    # override
+    def max_value_for_period(
+        self, iri: str, begin_time: datetime = None, end_time: datetime = None
+    ) -> int:
+        return self._stored_period(iri, begin_time, end_time)["value"].max()
+
+    # override
+    def period_statistics(
+        self, iri: str, begin_time: datetime = None, end_time: datetime = None
+    ) -> Dict | None:
+        return self.period_statistics_for_iris([iri], begin_time, end_time).get(iri)
+
+    # override
+    def period_statistics_for_iris(
+        self, iris: List[str], begin_time: datetime = None, end_time: datetime = None
+    ) -> Dict[str, Dict] | None:
+        statistics = dict()
+        for iri in iris:
+            df = (
+                self._stored_period(iri, begin_time, end_time).sort_values("time")
+                if iri in self._stored
+                else pd.DataFrame(columns=["time", "value"])
+            )
+            numeric_values = self._numeric(df)["value"].astype(float)
+            numeric = len(numeric_values) > 0
+            statistics[iri] = {
+                "count": len(df),
+                "min": float(numeric_values.min()) if numeric else None,
+                "max": float(numeric_values.max()) if numeric else None,
+                "mean": float(numeric_values.mean()) if numeric else None,
+                "first": df["value"].iloc[0] if len(df) > 0 else None,
+                "last": df["value"].iloc[-1] if len(df) > 0 else None,
+                "first_time": df["time"].iloc[0] if len(df) > 0 else None,
+                "last_time": df["time"].iloc[-1] if len(df) > 0 else None,
+            }
+        return statistics
+
+    @staticmethod
+    def _numeric(df: pd.DataFrame) -> pd.DataFrame:
+        """Readings with numeric values (like the database, min, max and mean only consider these)"""
+        numeric = df["value"].map(
+            lambda value: isinstance(value, numbers.Real)
+            and not isinstance(value, (bool, np.bool_))
+        )
+        return df.loc[numeric.astype(bool)]
+
+    # override
+    def backup(self, backup_path: str):
+        """Snapshot in memory, identified by the backup path"""
+        self._backups[backup_path] = {
+            iri: df.copy() for iri, df in self._stored.items()
+        }
+
+    # override
+    def restore(self, backup_path: str):
+        backup = self._backups.get(backup_path)
+        if backup is None:
+            raise FileNotFoundError(f"No benchmark backup at {backup_path}")
+        self._stored = {iri: df.copy() for iri, df in backup.items()}
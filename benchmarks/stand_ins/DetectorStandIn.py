@@ -0,0 +1,62 @@
+from multiprocessing import Process, Queue
+from typing import Dict
+
+from benchmarks.stand_ins.LatencyRecorder import LatencyRecorder
+
+# Control messages passed through the input queue, so that they are ordered with the readings
+RECORDING_START = "recording_start"
+RECORDING_STOP = "recording_stop"
+# Max. time for the detector process to report its results (in s)
+RESULTS_TIMEOUT = 60
+
+
+class DetectorStandIn:
+    """
+    Receives readings like an annotation detector: the handler puts them into the input queue of a separate
+    detector process (see AnnotationDetector._reading_handler). The process only records the readings and their
+    ingest-to-detector latency
+    """
+
+    def __init__(self, number: int, record_latencies: bool = True):
+        self.input_handler_id = f"benchmark_detector_{number}"
+        self.record_latencies = record_latencies
+        self._input_queue: Queue = Queue()
+        self._results_queue: Queue = Queue()
+        self._process = Process(target=self._detector_loop, daemon=True)
+
+    def start(self):
+        self._process.start()
+
+    def stop(self):
+        self._input_queue.put(None)
+        self._process.join()
+
+    def reading_handler(self, ts_iri, reading_value, reading_time):
+        # Convert bool values to integers
+        if isinstance(reading_value, bool):
+            reading_value = 1 if reading_value else 0
+        self._input_queue.put((ts_iri, reading_value, reading_time))
+
+    def start_recording(self):
+        self._input_queue.put(RECORDING_START)
+
+    def stop_recording(self) -> Dict:
+        """
+        :return: count of readings received while recording and latency percentiles (see LatencyRecorder)
+        """
+        self._input_queue.put(RECORDING_STOP)
+        return self._results_queue.get(timeout=RESULTS_TIMEOUT)
+
+    def _detector_loop(self):
+        recorder = LatencyRecorder(record_latencies=self.record_latencies)
+        while True:
+            item = self._input_queue.get()
+            if item is None:
+                return
+            if item == RECORDING_START:
+                recorder.start()
+            elif item == RECORDING_STOP:
+                recorder.stop()
+                self._results_queue.put(recorder.get_summary())
+            else:
+                recorder.record(item[2])
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import multiprocessing
+import struct
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import paho.mqtt.client as mqtt
+
+TOPIC_PREFIX = "benchmark/"
+# Interval of publishing the due messages (in s)
+PUBLISH_TICK = 0.01
+# Max. bytes buffered per client. Messages for slower clients are dropped, like by a broker for QoS 0
+MAX_CLIENT_BUFFER = 64 * 1024 * 1024
+
+# MQTT 3.1.1 packet types
+CONNECT = 1
+PUBLISH = 3
+SUBSCRIBE = 8
+UNSUBSCRIBE = 10
+PINGREQ = 12
+DISCONNECT = 14
+
+
+def topic_name(topic_number: int) -> str:
+    return f"{TOPIC_PREFIX}{topic_number}"
+
+
+def keyword_name(keyword_number: int) -> str:
+    return f"v{keyword_number}"
+
+
+def _encode_remaining_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        digit = length % 128
+        length //= 128
+        encoded.append(digit | 0x80 if length > 0 else digit)
+        if length == 0:
+            return bytes(encoded)
+
+
+def _packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    return (
+        bytes([packet_type << 4 | flags]) + _encode_remaining_length(len(body)) + body
+    )
+
+
+def _read_string(body: bytes, position: int) -> Tuple[str, int]:
+    length = struct.unpack(">H", body[position : position + 2])[0]
+    position += 2
+    return body[position : position + length].decode(), position + length
+
+
+async def _read_packet(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    header = (await reader.readexactly(1))[0]
+    length = 0
+    multiplier = 1
+    while True:
+        digit = (await reader.readexactly(1))[0]
+        length += (digit & 0x7F) * multiplier
+        multiplier *= 128
+        if digit & 0x80 == 0:
+            break
+    return header >> 4, await reader.readexactly(length)
+
+
+class EmbeddedMqttBroker:
+    """
+    Minimal MQTT 3.1.1 broker (QoS 0 only, no retained messages or sessions) for benchmarks without external
+    services. Publishes the telemetry messages itself: one JSON message per topic at the given rate, featuring the
+    timestamp of publishing and one value per keyword (the format of MqttTimeseriesInput)
+    """
+
+    def __init__(
+        self,
+        port: int,
+        topics_count: int,
+        keywords_per_topic: int,
+        messages_per_second: float,
+    ):
+        self.port = port
+        self.topics = [topic_name(i) for i in range(topics_count)]
+        self.keywords = [keyword_name(i) for i in range(keywords_per_topic)]
+        self.messages_per_second = messages_per_second
+
+        # Topic filters per client
+        self._subscriptions: Dict[asyncio.StreamWriter, List[str]] = dict()
+        # Subscribed clients per topic (updated with the subscriptions)
+        self._routes: Dict[str, List[asyncio.StreamWriter]] = dict()
+
+    def run(self, stop_event: multiprocessing.Event, published_total):
+        """
+        Runs the broker until the stop event is set (blocking, e.g. as separate process)
+        :param published_total: shared counter (multiprocessing.Value) of the published messages
+        """
+        asyncio.run(self._run(stop_event, published_total))
+
+    async def _run(self, stop_event: multiprocessing.Event, published_total):
+        server = await asyncio.start_server(self._handle_client, "127.0.0.1", self.port)
+        async with server:
+            await self._publish_loop(stop_event, published_total)
+
+    def _update_routes(self):
+        self._routes = {
+            topic: [
+                writer
+                for writer, topic_filters in self._subscriptions.items()
+                if any(
+                    mqtt.topic_matches_sub(topic_filter, topic)
+                    for topic_filter in topic_filters
+                )
+            ]
+            for topic in self.topics
+        }
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self._subscriptions[writer] = []
+        try:
+            while True:
+                packet_type, body = await _read_packet(reader)
+                if packet_type == CONNECT:
+                    writer.write(_packet(2, 0, b"\x00\x00"))
+                elif packet_type in (SUBSCRIBE, UNSUBSCRIBE):
+                    packet_id = body[:2]
+                    position = 2
+                    topic_filters = []
+                    while position < len(body):
+                        topic_filter, position = _read_string(body, position)
+                        topic_filters.append(topic_filter)
+                        if packet_type == SUBSCRIBE:
+                            # Requested QoS (always granted as 0)
+                            position += 1
+                    if packet_type == SUBSCRIBE:
+                        self._subscriptions[writer].extend(topic_filters)
+                        writer.write(
+                            _packet(9, 0, packet_id + b"\x00" * len(topic_filters))
+                        )
+                    else:
+                        self._subscriptions[writer] = [
+                            topic_filter
+                            for topic_filter in self._subscriptions[writer]
+                            if topic_filter not in topic_filters
+                        ]
+                        writer.write(_packet(11, 0, packet_id))
+                    self._update_routes()
+                elif packet_type == PINGREQ:
+                    writer.write(_packet(13, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._subscriptions[writer]
+            self._update_routes()
+            writer.close()
+
+    def _message(self, topic_number: int, message_number: int) -> bytes:
+        message = {
+            keyword: message_number + topic_number + keyword_number / 10
+            for keyword_number, keyword in enumerate(self.keywords)
+        }
+        message["ts"] = datetime.utcnow().isoformat(timespec="microseconds") + "Z"
+        return json.dumps(message).encode()
+
+    async def _publish_loop(self, stop_event: multiprocessing.Event, published_total):
+        begin = time.monotonic()
+        published = 0
+        while not stop_event.is_set():
+            await asyncio.sleep(PUBLISH_TICK)
+            due = int(
+                (time.monotonic() - begin) * self.messages_per_second * len(self.topics)
+            )
+            for message_number in range(published, due):
+                topic_number = message_number % len(self.topics)
+                topic = self.topics[topic_number]
+                packet = None
+                for writer in self._routes.get(topic, []):
+                    if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                        continue
+                    if packet is None:
+                        topic_bytes = topic.encode()
+                        packet = _packet(
+                            PUBLISH,
+                            0,
+                            struct.pack(">H", len(topic_bytes))
+                            + topic_bytes
+                            + self._message(
+                                topic_number, message_number // len(self.topics)
+                            ),
+                        )
+                    writer.write(packet)
+            published = max(published, due)
+            with published_total.get_lock():
+                published_total.value = published
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from datetime import datetime
+
+from asyncua import Server, ua
+
+NAMESPACE_URI = "urn:sindit:benchmark"
+# Interval of writing the due updates (in s)
+UPDATE_TICK = 0.01
+
+
+def node_name(node_number: int) -> str:
+    return f"benchmark_{node_number}"
+
+
+def node_id_string(node_number: int, namespace_index: int = 2) -> str:
+    """Node-id as used for the connection topic of OPC UA time-series"""
+    return f"ns={namespace_index};s={node_name(node_number)}"
+
+
+class EmbeddedOpcuaServer:
+    """
+    OPC UA test server (asyncua) for benchmarks without external services. Provides the given count of decimal
+    variables, each updated at the given rate with the time of the update as source timestamp
+    """
+
+    def __init__(self, port: int, nodes_count: int, updates_per_second: float):
+        self.port = port
+        self.nodes_count = nodes_count
+        self.updates_per_second = updates_per_second
+
+    def run(self, stop_event: multiprocessing.Event, published_total):
+        """
+        Runs the server until the stop event is set (blocking, e.g. as separate process)
+        :param published_total: shared counter (multiprocessing.Value) of the written updates
+        """
+        logging.getLogger("asyncua").setLevel(logging.WARNING)
+        asyncio.run(self._run(stop_event, published_total))
+
+    async def _run(self, stop_event: multiprocessing.Event, published_total):
+        server = Server()
+        await server.init()
+        server.set_endpoint(f"opc.tcp://127.0.0.1:{self.port}/")
+        namespace_index = await server.register_namespace(NAMESPACE_URI)
+        parent = await server.nodes.objects.add_object(namespace_index, "benchmark")
+        node_ids = []
+        for node_number in range(self.nodes_count):
+            node = await parent.add_variable(
+                ua.NodeId(node_name(node_number), namespace_index),
+                node_name(node_number),
+                0.0,
+            )
+            node_ids.append(node.nodeid)
+
+        async with server:
+            begin = time.monotonic()
+            published = 0
+            while not stop_event.is_set():
+                await asyncio.sleep(UPDATE_TICK)
+                due = int(
+                    (time.monotonic() - begin)
+                    * self.updates_per_second
+                    * self.nodes_count
+                )
+                now = datetime.utcnow()
+                for update_number in range(published, due):
+                    node_number = update_number % self.nodes_count
+                    await server.write_attribute_value(
+                        node_ids[node_number],
+                        ua.DataValue(
+                            Value=ua.Variant(
+                                float(update_number // self.nodes_count + node_number),
+                                ua.VariantType.Double,
+                            ),
+                            SourceTimestamp=now,
+                            ServerTimestamp=now,
+                        ),
+                    )
+                published = max(published, due)
+                with published_total.get_lock():
+                    published_total.value = published
@@ -0,0 +1,65 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+
+def reading_age(reading_time: datetime) -> float:
+    """
+    :return: Time since the reading time (in s). Naive reading times are UTC (like the ones of MQTT and OPC UA)
+    """
+    if reading_time.tzinfo is None:
+        reading_time = reading_time.replace(tzinfo=timezone.utc)
+    return time.time() - reading_time.timestamp()
+
+
+def percentile(values: List[float], fraction: float) -> float | None:
+    """
+    :param values: sorted values
+    """
+    if len(values) == 0:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class LatencyRecorder:
+    """
+    Counts the readings arriving at a stage (persistence, detectors) while recording, and records their age
+    """
+
+    def __init__(self, record_latencies: bool = True):
+        # False for readings with historical reading times (replays)
+        self.record_latencies = record_latencies
+        self.recording = False
+        self.count = 0
+        self.latencies: List[float] = []
+
+    def start(self):
+        self.count = 0
+        self.latencies = []
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+
+    def record(self, reading_time: datetime | None):
+        if not self.recording:
+            return
+        self.count += 1
+        if self.record_latencies and reading_time is not None:
+            self.latencies.append(reading_age(reading_time))
+
+    def get_summary(self) -> Dict:
+        """
+        :return: count of readings and latency percentiles (in ms)
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile_ms(fraction: float):
+            value = percentile(latencies, fraction)
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            "readings": self.count,
+            "latency_ms_p50": percentile_ms(0.5),
+            "latency_ms_p99": percentile_ms(0.99),
+        }
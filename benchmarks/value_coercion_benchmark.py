@@ -0,0 +1,136 @@
+"""
+Measures the ingest throughput of time-series inputs (readings per second on one core) per value type.
+Handlers are not registered, so that only receiving, converting, filtering and the hot window are measured.
+The conversion alone is compared to the former per-reading type dispatch.
+
+Usage (from the project root): python -m benchmarks.value_coercion_benchmark
+"""
+
+import time
+from datetime import datetime, timedelta
+from math import floor
+
+from backend.runtime_connections.mqtt.MqttTimeseriesInput import MqttTimeseriesInput
+from backend.runtime_connections.value_coercion import value_converter, values_converter
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+READINGS_COUNT = 200000
+
+SAMPLE_VALUES = {
+    TimeseriesValueTypes.DECIMAL.value: [0.5, 1, "2.5"],
+    TimeseriesValueTypes.INT.value: [1, 2.7, "3"],
+    TimeseriesValueTypes.BOOL.value: [True, 0.0, "true"],
+    TimeseriesValueTypes.STRING.value: ["a", 1, 2.5],
+}
+
+
+def _readings(value_type: str):
+    start = datetime(2022, 1, 1)
+    samples = SAMPLE_VALUES[value_type]
+    times = [start + timedelta(milliseconds=i) for i in range(READINGS_COUNT)]
+    values = [samples[i % len(samples)] for i in range(READINGS_COUNT)]
+    return times, values
+
+
+def _legacy_convert(value_type: str, reading_value):
+    """Former conversion of TimeseriesInput.handle_reading (type resolved per reading)"""
+    if value_type == TimeseriesValueTypes.STRING.value:
+        reading_value = str(reading_value)
+    elif value_type == TimeseriesValueTypes.DECIMAL.value:
+        reading_value = float(reading_value)
+    elif value_type == TimeseriesValueTypes.INT.value:
+        reading_value = floor(float(reading_value))
+    elif value_type == TimeseriesValueTypes.BOOL.value:
+        if isinstance(reading_value, bool):
+            pass
+        elif isinstance(reading_value, float):
+            reading_value = bool(reading_value)
+        elif isinstance(reading_value, str):
+            reading_value = (
+                reading_value == "True"
+                or reading_value == "true"
+                or reading_value == "t"
+            )
+    return reading_value
+
+
+def benchmark_conversion(value_type: str):
+    """
+    :return: readings per second for the former conversion, the resolved converter and the batched converter
+    """
+    _, values = _readings(value_type)
+
+    begin = time.process_time()
+    for value in values:
+        _legacy_convert(value_type, value)
+    legacy_duration = time.process_time() - begin
+
+    convert = value_converter(value_type)
+    begin = time.process_time()
+    for value in values:
+        convert(value)
+    converter_duration = time.process_time() - begin
+
+    convert_many = values_converter(value_type)
+    begin = time.process_time()
+    for i in range(0, READINGS_COUNT, 1000):
+        convert_many(values[i : i + 1000])
+    batch_duration = time.process_time() - begin
+
+    return (
+        READINGS_COUNT / legacy_duration,
+        READINGS_COUNT / converter_duration,
+        READINGS_COUNT / batch_duration,
+    )
+
+
+def benchmark_handle_reading(value_type: str) -> float:
+    """
+    :return: readings per second
+    """
+    ts_input = MqttTimeseriesInput(
+        iri=f"benchmark_{value_type}",
+        connection_topic="benchmark",
+        connection_keyword="value",
+        value_type=value_type,
+    )
+    times, values = _readings(value_type)
+
+    begin = time.process_time()
+    for reading_time, value in zip(times, values):
+        ts_input.handle_reading(reading_time=reading_time, reading_value=value)
+    return READINGS_COUNT / (time.process_time() - begin)
+
+
+def benchmark_handle_readings(value_type: str) -> float:
+    """
+    Batched variant
+    :return: readings per second
+    """
+    ts_input = MqttTimeseriesInput(
+        iri=f"benchmark_batch_{value_type}",
+        connection_topic="benchmark",
+        connection_keyword="value",
+        value_type=value_type,
+    )
+    times, values = _readings(value_type)
+
+    begin = time.process_time()
+    for i in range(0, READINGS_COUNT, 1000):
+        ts_input.handle_readings(times[i : i + 1000], values[i : i + 1000])
+    return READINGS_COUNT / (time.process_time() - begin)
+
+
+if __name__ == "__main__":
+    print("Readings per second (one core):")
+    print(
+        f"{'type':8} {'former':>12} {'converter':>12} {'batched':>12}"
+        f" {'handle_reading':>15} {'handle_readings':>16}"
+    )
+    for value_type in SAMPLE_VALUES:
+        legacy, converter, batch = benchmark_conversion(value_type)
+        print(
+            f"{value_type:8} {legacy:>12,.0f} {converter:>12,.0f} {batch:>12,.0f}"
+            f" {benchmark_handle_reading(value_type):>15,.0f}"
+            f" {benchmark_handle_readings(value_type):>16,.0f}"
+        )
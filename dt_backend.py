@@ -11,7 +11,6 @@ import time
 import uvicorn
 
 from dateutil import tz
-from threading import Thread
 from backend.annotation_detection.AnnotationDetectorContainer import (
     AnnotationDetectorContainer,
 )
@@ -21,6 +20,7 @@ from util.environment_and_configuration import (
 )
 from backend.api.api import app
 from backend.cleanup_thread import start_storage_cleanup_thread
+from backend.workers_refresh import refresh_workers, start_workers_refresh_thread
 from backend.knowledge_graph.KnowledgeGraphPersistenceService import (
     KnowledgeGraphPersistenceService,
 )
@@ -29,6 +29,7 @@ from backend.knowledge_graph.dao.TimeseriesNodesDao import TimeseriesNodesDao
 from backend.runtime_connections.RuntimeConnectionContainer import (
     RuntimeConnectionContainer,
 )
+from backend.runtime_connections.sharding.ShardCoordinator import ShardCoordinator
 from backend.specialized_databases.DatabasePersistenceServiceContainer import (
     DatabasePersistenceServiceContainer,
 )
@@ -100,28 +101,6 @@ def init_database_data_if_not_available():
         logger.info("Finished initilization.")
 
 
-def refresh_workers():
-    runtime_con_container: RuntimeConnectionContainer = (
-        RuntimeConnectionContainer.instance()
-    )
-    detectors_container: AnnotationDetectorContainer = (
-        AnnotationDetectorContainer.instance()
-    )
-    runtime_con_container.refresh_connection_inputs_and_handlers()
-    detectors_container.refresh_annotation_detectors()
-
-
-def refresh_workers_thread_loop():
-
-    while True:
-        time.sleep(120)
-        logger.info("Refreshing worker services...")
-
-        refresh_workers()
-
-        logger.info("Done refreshing worker services.")
-
-
 # #############################################################################
 # Launch backend
 # #############################################################################
@@ -145,6 +124,9 @@ if __name__ == "__main__":
     )
     logger.info("Done initializing specialized databases.")
 
+    # Join the backend instances sharing the runtime connections (if sharded)
+    ShardCoordinator.instance().start_lease_thread()
+
     logger.info(
         "Loading worker services: time-series inputs and connections as well as annotation detectors..."
     )
@@ -152,18 +134,25 @@ if __name__ == "__main__":
     logger.info("Done loading worker services.")
 
     # Thread checking regulary, if timeseries inputs, runtime-connections and annotation detectors have been added / removed
-    workers_refresh_thread = Thread(target=refresh_workers_thread_loop)
-    workers_refresh_thread.start()
+    start_workers_refresh_thread()
 
     # Start cleanup thread deleting obsolete backups:
     start_storage_cleanup_thread()
 
     # Start getting the connectivity status for runtime connections
     RuntimeConnectionContainer.instance().start_active_connections_status_thread()
+
+    # Start publishing the hot windows of recent readings requested by the API workers
+    RuntimeConnectionContainer.instance().start_hot_windows_publish_thread()
     # Start getting the connectivity status for runtime connections
 
     AnnotationDetectorContainer.instance().start_active_detectors_status_thread()
 
+    # Start getting the buffer and spool status of the time-series writes
+    DatabasePersistenceServiceContainer.instance().start_write_metrics_status_thread(
+        node_id=ShardCoordinator.instance().node_id
+    )
+
     # Run fast API
     # noinspection PyTypeChecker
     uvicorn.run(
@@ -173,3 +162,7 @@ if __name__ == "__main__":
         workers=4,
         access_log=False,
     )
+
+    # Hand the runtime connections over to the other instances right away
+    ShardCoordinator.instance().leave()
+    DatabasePersistenceServiceContainer.instance().stop_write_metrics_status_thread()
@@ -1,5 +1,4 @@
-from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterator, Tuple
 import json
 from util.log import logger
 import time
@@ -12,6 +11,7 @@ from util.environment_and_configuration import (
     get_configuration,
     get_environment_variable,
 )
+from util import timeseries_wire_format
 
 API_URI = (
     get_environment_variable("FAST_API_HOST")
@@ -54,28 +54,126 @@ def get_json(relative_path: str, retries: int = -1, timeout: int = 30, **kwargs)
                 _handle_request_exception(i)
 
 
-def get_dataframe(relative_path: str, **kwargs):
+def get_dataframe(relative_path: str, retries: int = -1, timeout: int = 30, **kwargs):
     """
-    Get request to the specified api endpoint. Deserializes to dataframe
+    Get request to the specified api endpoint. Deserializes to dataframe.
+    Requests the binary time-series format, which is used if the endpoint supports it (JSON otherwise)
     :param relative_path:
     :param retries: how often to retry if the call failed. Negative numbners mean (about) unlimited.
     :return:
     """
-    df_dict = get_json(relative_path=relative_path, **kwargs)
+    range_limit = retries + 1 if retries >= 0 else 999999999999999999999999
+    for i in range(range_limit):
+        try:
+            response = _get_dataframe_response(relative_path, timeout, **kwargs)
+            return _dataframe_from_response(response)
+        except ReqExc:
+            if i < retries:
+                _handle_request_exception(i)
 
-    df = pd.DataFrame.from_dict(df_dict)
 
-    # Convert string timestamp to actual tz data type
-    df["time"] = df["time"].map(
-        lambda t_string: datetime.strptime(t_string, "%Y-%m-%dT%H:%M:%S.%fZ")
+def get_dataframe_and_count(
+    relative_path: str, retries: int = -1, timeout: int = 30, **kwargs
+) -> Tuple[pd.DataFrame | None, int | None]:
+    """
+    Get request to a time-series range endpoint, that returns the count of readings in the range (before
+    downsampling) with the dataframe (see /timeseries/range with include_count)
+    :param relative_path:
+    :param retries: how often to retry if the call failed. Negative numbners mean (about) unlimited.
+    :return: dataframe, count of readings (None, if not returned). None, None if the database is not available
+    """
+    range_limit = retries + 1 if retries >= 0 else 999999999999999999999999
+    for i in range(range_limit):
+        try:
+            response = _get_dataframe_response(
+                relative_path, timeout, include_count=True, **kwargs
+            )
+            if not response.ok:
+                return None, None
+            readings_count = response.headers.get(
+                timeseries_wire_format.READINGS_COUNT_HEADER
+            )
+            return (
+                _dataframe_from_response(response),
+                int(readings_count) if readings_count is not None else None,
+            )
+        except ReqExc:
+            if i < retries:
+                _handle_request_exception(i)
+    return None, None
+
+
+def _get_dataframe_response(
+    relative_path: str, timeout: int, **kwargs
+) -> requests.Response:
+    return requests.get(
+        API_URI + relative_path,
+        params=kwargs,
+        timeout=timeout,
+        headers={"Accept": f"{timeseries_wire_format.MEDIA_TYPE}, application/json"},
     )
-    # Set UTC timezone (trans)
-    df["time"] = df["time"].map(lambda t: t.tz_localize("UTC"))
 
-    df["time"] = df["time"].map(
-        lambda t: t.tz_convert(
+
+def _dataframe_from_response(response: requests.Response) -> pd.DataFrame:
+    if response.headers.get("content-type", "").startswith(
+        timeseries_wire_format.MEDIA_TYPE
+    ):
+        df = timeseries_wire_format.decode_dataframe(response.content)
+        df["time"] = df["time"].dt.tz_convert(
             get_configuration(group=ConfigGroups.FRONTEND, key="timezone")
         )
+        return df
+
+    df_dict = response.json()
+    if isinstance(df_dict, str):
+        # Sometimes, the json is still represented as string instead of dict
+        df_dict = json.loads(df_dict)
+
+    return _dataframe_from_dict(df_dict)
+
+
+def get_dataframes(relative_path: str, **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    Get request to the specified api endpoint returning several dataframes (e.g. for multiple
+    time-series). Deserializes to a dict of dataframes
+    :param relative_path:
+    :return: Dict: key -> dataframe
+    """
+    dfs_dict = get_json(relative_path=relative_path, **kwargs)
+
+    return {key: _dataframe_from_dict(df_dict) for key, df_dict in dfs_dict.items()}
+
+
+def iter_dataframes(
+    relative_path: str, timeout: int = 300, **kwargs
+) -> Iterator[pd.DataFrame]:
+    """
+    Get request to the specified streaming api endpoint (binary format). Deserializes each chunk to a
+    dataframe while it is received, so that the whole response is never held in memory
+    :param relative_path:
+    :return: Generator of dataframes
+    """
+    with requests.get(
+        API_URI + relative_path,
+        params={**kwargs, "response_format": timeseries_wire_format.FORMAT_BINARY},
+        timeout=timeout,
+        stream=True,
+    ) as response:
+        timezone = get_configuration(group=ConfigGroups.FRONTEND, key="timezone")
+        for df in timeseries_wire_format.decode_stream(response.raw.read):
+            df["time"] = df["time"].dt.tz_convert(timezone)
+            yield df
+
+
+def _dataframe_from_dict(df_dict: Dict) -> pd.DataFrame:
+    df = pd.DataFrame.from_dict(df_dict)
+
+    if df.empty:
+        return pd.DataFrame(columns=["time", "value"])
+
+    # Convert string timestamps (UTC) to actual tz data type
+    df["time"] = pd.to_datetime(df["time"], utc=True).dt.tz_convert(
+        get_configuration(group=ConfigGroups.FRONTEND, key="timezone")
     )
 
     return df
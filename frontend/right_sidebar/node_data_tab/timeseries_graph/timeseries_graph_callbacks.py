@@ -21,13 +21,13 @@ from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesNodeFlat
 from util.environment_and_configuration import (
     ConfigGroups,
     get_configuration,
-    get_configuration_float,
+    get_configuration_int,
 )
 from util.log import logger
 
 sensor_ID = None
 
-TIMESERIES_MAX_DISPLAYED_ENTRIES = get_configuration_float(
+TIMESERIES_MAX_DISPLAYED_ENTRIES = get_configuration_int(
     group=ConfigGroups.FRONTEND, key="timeseries_max_displayed_entries"
 )
 
@@ -284,45 +284,21 @@ def update_timeseries_graph(
             tzinfo=selector_tz,
         )
 
-    # API call for the count of readings
-    readings_count_string = api_client.get_json(
-        relative_path="/timeseries/entries_count",
+    # API call for the readings (downsampled by the backend to avoid loading to large readings datasets).
+    # The count of readings in the range is returned with them
+    data, readings_count = api_client.get_dataframe_and_count(
+        relative_path="/timeseries/range",
         iri=selected_el.iri,
         duration=duration.total_seconds(),
         date_time_str=date_time.isoformat(),
+        target_count=TIMESERIES_MAX_DISPLAYED_ENTRIES,
+        downsampling="lttb",
     )
-    if readings_count_string is None:
+    if data is None:
         # DB not available?
         return fig, "Database could not be reached.", None
-
-    readings_count = int(readings_count_string)
-
-    # Filtering to avoid loading to large readings datasets
-    if readings_count > TIMESERIES_MAX_DISPLAYED_ENTRIES:
-        if duration.total_seconds() > timedelta(days=2).total_seconds():
-            # More than two days -> use hourly aggregation
-            aggregation_window_s = timedelta(hours=1).total_seconds()
-        elif duration.total_seconds() > timedelta(hours=6).total_seconds():
-            aggregation_window_s = timedelta(minutes=10).total_seconds()
-        elif duration.total_seconds() > timedelta(hours=2).total_seconds():
-            aggregation_window_s = timedelta(minutes=1).total_seconds()
-        elif duration.total_seconds() > timedelta(minutes=10).total_seconds():
-            aggregation_window_s = timedelta(seconds=1).total_seconds()
-        else:
-            aggregation_window_s = timedelta(milliseconds=100).total_seconds()
-
-        aggregation_window_ms = int(aggregation_window_s * 1000)
-    else:
-        aggregation_window_ms = None
-
-    # API call for the readings
-    data = api_client.get_dataframe(
-        relative_path="/timeseries/range",
-        iri=selected_el.iri,
-        duration=duration.total_seconds(),
-        date_time_str=date_time.isoformat(),
-        aggregation_window_ms=aggregation_window_ms,
-    )
+    if readings_count is None:
+        readings_count = len(data)
 
     fig.add_trace(
         trace={
@@ -369,12 +345,12 @@ def update_timeseries_graph(
     aggregate_info_str = (
         html.Div(
             [
-                html.Div("Aggregated view! ", style={"font-weight": "bold"}),
-                f"Only showing first readings per {timedelta(milliseconds=aggregation_window_ms)} (h:m:s).",
+                html.Div("Downsampled view! ", style={"font-weight": "bold"}),
+                f"Only showing {len(data)} readings preserving the shape of the time-series.",
             ],
             style={"padding-top": "5px"},
         )
-        if aggregation_window_ms is not None
+        if readings_count > len(data)
         else ""
     )
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
 
 from dataclasses_json import dataclass_json
@@ -19,11 +20,25 @@ LABEL = NodeTypes.RUNTIME_CONNECTION.value
 class RuntimeConnectionTypes(Enum):
     OPC_UA = "OPC_UA"
     MQTT = "MQTT"
+    # Replays stored readings of other time-series (e.g. for testing detectors, load generation)
+    REPLAY = "REPLAY"
 
 
 REALTIME_CONNECTION_TYPES = [con_type.value for con_type in RuntimeConnectionTypes]
 
 
+class SamplingModes(Enum):
+    # Every node is read each sampling interval
+    POLLING = "POLLING"
+    # The server reports changes (larger than the deadband) sampled at the sampling interval
+    SUBSCRIPTION = "SUBSCRIPTION"
+    # Nodes with a deadband or a long sampling interval are subscribed, the others polled
+    HYBRID = "HYBRID"
+
+
+SAMPLING_MODES = [mode.value for mode in SamplingModes]
+
+
 @dataclass
 @dataclass_json
 class RuntimeConnectionNode(BaseNode):
@@ -49,6 +64,18 @@ class RuntimeConnectionNode(BaseNode):
     # Type of connection
     type: str = Property()
 
+    # Sampling of the inputs, if not specified by the timeseries nodes (OPC UA only, optional):
+    sampling_mode: str | None = Property(default=None)
+    sampling_interval_ms: int | None = Property(default=None)
+    # Min. absolute change of a value to be reported (subscriptions only)
+    deadband: float | None = Property(default=None)
+
+    # Replay (REPLAY only, optional): period of the stored readings (ISO 8601, None: from the first / until the
+    # last reading) and speed relative to real time (None: real time, 0: as fast as possible)
+    replay_begin: str | None = Property(default=None)
+    replay_end: str | None = Property(default=None)
+    replay_speedup: float | None = Property(default=None)
+
     # Info: the actual host, port and if required passwords are not provided by the context-graph but via environmental variables instead
 
     def validate_metamodel_conformance(self):
@@ -61,13 +88,41 @@ class RuntimeConnectionNode(BaseNode):
         if self.type is None:
             raise GraphNotConformantToMetamodelError(self, f"Missing connection type.")
 
-        if self.host_environment_variable is None:
+        # Replays do not connect to a host:
+        if (
+            self.host_environment_variable is None
+            and self.type != RuntimeConnectionTypes.REPLAY.value
+        ):
             raise GraphNotConformantToMetamodelError(self, f"Missing host.")
 
-        if self.port_environment_variable is None:
+        if (
+            self.port_environment_variable is None
+            and self.type != RuntimeConnectionTypes.REPLAY.value
+        ):
             raise GraphNotConformantToMetamodelError(self, f"Missing port.")
 
         if not self.type in REALTIME_CONNECTION_TYPES:
             raise GraphNotConformantToMetamodelError(
                 self, f"Unrecognized connection type."
             )
+
+        if self.sampling_mode is not None and not self.sampling_mode in SAMPLING_MODES:
+            raise GraphNotConformantToMetamodelError(
+                self,
+                f"Unrecognized sampling mode: {self.sampling_mode}. Known modes: {SAMPLING_MODES}.",
+            )
+
+        for replay_time in [self.replay_begin, self.replay_end]:
+            if replay_time is None:
+                continue
+            try:
+                datetime.fromisoformat(replay_time)
+            except ValueError:
+                raise GraphNotConformantToMetamodelError(
+                    self, f"Replay begin / end not in ISO 8601 format: {replay_time}."
+                )
+
+        if self.replay_speedup is not None and self.replay_speedup < 0:
+            raise GraphNotConformantToMetamodelError(
+                self, f"Negative replay speed-up: {self.replay_speedup}."
+            )
@@ -55,6 +55,19 @@ class TimeseriesNodeFlat(BaseNode):
     # Type of the value stored per time
     value_type: str = Property(default=TimeseriesValueTypes.DECIMAL.value)
 
+    # Sampling, overriding the runtime connection (optional):
+    sampling_interval_ms: int | None = Property(default=None)
+    # Reduction of the handled readings (optional, see TimeseriesIngestFilter):
+    # Min. absolute change of a value to be reported
+    deadband: float | None = Property(default=None)
+    # Min. change relative to the last value (e.g. 0.01 for 1 %)
+    deadband_relative: float | None = Property(default=None)
+    # Only readings with changed values
+    only_changes: bool | None = Property(default=None)
+    # Min. time between handled readings and max. time (heartbeat for unchanged values)
+    min_write_interval_ms: int | None = Property(default=None)
+    max_write_interval_ms: int | None = Property(default=None)
+
     # Extracted features
     _feature_dict: str | None = Property(key="feature_dict")
     _reduced_feature_list: str | None = Property(key="reduced_feature_list")
@@ -19,6 +19,9 @@ from similarity_pipeline.similarity_pipeline_status_manager import (
 )
 from util.log import logger
 
+# Larger time-series are decimated to this count of readings for the feature extraction
+MAX_FEATURE_EXTRACTION_ENTRIES = 10000
+
 
 # #############################################################################
 # Timeseries feature extraction
@@ -72,32 +75,40 @@ def similarity_pipeline_1_ts_feature_extraction():
             f"\n\nAnalyzing timeseries {i} of {len(timeseries_nodes)}: {timeseries_node.id_short}"
         )
         # Note that this can result in very large ranges, if enough data is present!
-        ts_entry_count = timeseries_endpoints.get_timeseries_entries_count(
+        ts_statistics = timeseries_endpoints.get_timeseries_period_statistics(
             iri=timeseries_node.iri,
             date_time=comparison_end_date_time,
             duration=comparison_duration,
         )
+        ts_entry_count = (
+            ts_statistics.get("count", 0) if ts_statistics is not None else 0
+        )
         logger.info(f"Total entry count: {ts_entry_count}")
 
-        if ts_entry_count > 10000:
-            logger.warning(
-                f"Skipped extracting features for {timeseries_node.caption} because it has over 10000 entries."
-            )
-            continue
-
         # Separate datatypes: Decimal and Integer is the standard, bool to int (0 and 1) and string time-series are ignored
         if timeseries_node.value_type in [
             TimeseriesValueTypes.DECIMAL.value,
             TimeseriesValueTypes.INT.value,
             TimeseriesValueTypes.BOOL.value,
         ]:
-            logger.info("Loading dataframe...")
-            ts_range_df = timeseries_endpoints.get_timeseries_range(
-                iri=timeseries_node.iri,
-                date_time=comparison_end_date_time,
-                duration=comparison_duration,
-                aggregation_window_ms=None,  # raw values
-            )
+            if ts_entry_count > MAX_FEATURE_EXTRACTION_ENTRIES:
+                logger.info(
+                    f"Loading dataframe in chunks and decimating to {MAX_FEATURE_EXTRACTION_ENTRIES} entries..."
+                )
+                ts_range_df = _read_decimated_range(
+                    iri=timeseries_node.iri,
+                    date_time=comparison_end_date_time,
+                    duration=comparison_duration,
+                    entry_count=ts_entry_count,
+                )
+            else:
+                logger.info("Loading dataframe...")
+                ts_range_df = timeseries_endpoints.get_timeseries_range(
+                    iri=timeseries_node.iri,
+                    date_time=comparison_end_date_time,
+                    duration=comparison_duration,
+                    aggregation_window_ms=None,  # raw values
+                )
 
             # Add id row that is required by tsfresh
             ts_range_df.insert(loc=0, column="id", value=0)
@@ -152,3 +163,28 @@ def similarity_pipeline_1_ts_feature_extraction():
     SimilarityPipelineStatusManager.instance().set_active(
         active=False, stage="time_series_feature_extraction"
     )
+
+
+def _read_decimated_range(
+    iri: str, date_time: datetime, duration: float, entry_count: int
+) -> pd.DataFrame:
+    """
+    Reads the range chunk by chunk and keeps every n-th reading, so that at most
+    MAX_FEATURE_EXTRACTION_ENTRIES readings are held in memory.
+    Evenly spaced readings keep the statistical and spectral properties used as features
+    (in contrast to e.g. preserving only extreme values).
+    """
+    step = -(-entry_count // MAX_FEATURE_EXTRACTION_ENTRIES)
+    decimated_chunks = []
+    position = 0
+    for chunk in timeseries_endpoints.get_timeseries_range_iter(
+        iri=iri, date_time=date_time, duration=duration
+    ):
+        # Continue the step pattern across chunk borders:
+        first_index = -position % step
+        decimated_chunks.append(chunk.iloc[first_index::step])
+        position += len(chunk)
+
+    if len(decimated_chunks) == 0:
+        return pd.DataFrame(columns=["time", "value"])
+    return pd.concat(decimated_chunks, ignore_index=True)
@@ -0,0 +1,111 @@
+import json
+import math
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List
+
+from synthetic_factory.PlantSpecification import PlantSpecification
+
+
+class AnomalyPatterns(Enum):
+    # Short peak (bell-shaped)
+    SPIKE = "SPIKE"
+    # Linear deviation, growing until the end of the occurrence
+    DRIFT = "DRIFT"
+    # Value frozen at the begin of the occurrence
+    STUCK = "STUCK"
+    # Fast oscillation (4 periods per occurrence)
+    OSCILLATION = "OSCILLATION"
+
+
+@dataclass
+class ScriptedAnomaly:
+    """
+    Anomaly pattern injected into sensors of one asset. The shape only depends on the progress within the
+    occurrence, so that repeated occurrences look alike and can be learned by the annotation detectors
+    """
+
+    asset_iri: str
+    pattern: str
+    start_s: float
+    duration_s: float
+    # None: only one occurrence
+    repeat_every_s: float | None = None
+    # Deviation relative to the gain of the sensors
+    magnitude: float = 1.0
+    # None: all sensors of the asset
+    sensor_iris: List[str] | None = None
+
+    @classmethod
+    def from_dict(cls, anomaly_dict: Dict, plant: PlantSpecification):
+        """
+        :param anomaly_dict: script entry. "asset" can be the iri or the number of the asset in the plant
+        """
+        asset = anomaly_dict["asset"]
+        if isinstance(asset, int):
+            asset = plant.assets[asset].iri
+        elif asset not in [plant_asset.iri for plant_asset in plant.assets]:
+            raise ValueError(f"Asset of the anomaly not part of the plant: {asset}")
+
+        pattern = anomaly_dict["pattern"].upper()
+        if pattern not in [known_pattern.value for known_pattern in AnomalyPatterns]:
+            raise ValueError(f"Unknown anomaly pattern: {pattern}")
+
+        anomaly = cls(
+            asset_iri=asset,
+            pattern=pattern,
+            start_s=float(anomaly_dict["start_s"]),
+            duration_s=float(anomaly_dict["duration_s"]),
+            repeat_every_s=anomaly_dict.get("repeat_every_s"),
+            magnitude=float(anomaly_dict.get("magnitude", 1.0)),
+            sensor_iris=anomaly_dict.get("sensors"),
+        )
+        if anomaly.duration_s <= 0:
+            raise ValueError("The duration of anomalies has to be positive")
+        if (
+            anomaly.repeat_every_s is not None
+            and anomaly.repeat_every_s < anomaly.duration_s
+        ):
+            raise ValueError("Anomalies can not repeat before their end")
+        return anomaly
+
+    def occurrence_begin(self, elapsed_s: float) -> float | None:
+        """
+        :return: begin (elapsed seconds) of the occurrence active at the given time, or None
+        """
+        if elapsed_s < self.start_s:
+            return None
+        if self.repeat_every_s is None:
+            begin = self.start_s
+        else:
+            begin = (
+                self.start_s
+                + math.floor((elapsed_s - self.start_s) / self.repeat_every_s)
+                * self.repeat_every_s
+            )
+        return begin if elapsed_s < begin + self.duration_s else None
+
+    def deviation(self, progress: float) -> float:
+        """
+        :param progress: position within the occurrence (0 to 1)
+        :return: deviation relative to the gain of the sensors (not used for stuck values)
+        """
+        if self.pattern == AnomalyPatterns.SPIKE.value:
+            return self.magnitude * math.exp(-(((progress - 0.5) / 0.1) ** 2) / 2)
+        if self.pattern == AnomalyPatterns.DRIFT.value:
+            return self.magnitude * progress
+        if self.pattern == AnomalyPatterns.OSCILLATION.value:
+            return self.magnitude * math.sin(2 * math.pi * 4 * progress)
+        return 0
+
+
+def load_anomaly_script(path: str, plant: PlantSpecification) -> List[ScriptedAnomaly]:
+    """
+    Loads a JSON list of anomalies, e.g.:
+    [{"asset": 3, "pattern": "SPIKE", "start_s": 60, "duration_s": 10, "repeat_every_s": 300, "magnitude": 0.8}]
+    """
+    with open(path, "r", encoding="utf-8") as script_file:
+        return [
+            ScriptedAnomaly.from_dict(anomaly_dict, plant)
+            for anomaly_dict in json.load(script_file)
+        ]
@@ -0,0 +1,357 @@
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from graph_domain.factory_graph_types import NodeTypes, RelationshipTypes
+from graph_domain.main_digital_twin.RuntimeConnectionNode import RuntimeConnectionTypes
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+
+IRI_PREFIX = "www.sintef.no/aas_identifiers/synthetic_factory/"
+MQTT_TOPIC_PREFIX = "synthetic_factory/"
+OPC_UA_NAMESPACE_INDEX = 2
+
+# Connections of generated plants (names of the environment variables, like in the graph)
+MQTT_CONNECTION_IRI = IRI_PREFIX + "connections/mqtt"
+OPC_UA_CONNECTION_IRI = IRI_PREFIX + "connections/opc_ua"
+MQTT_HOST_ENVIRONMENT_VARIABLE = "SYNTHETIC_FACTORY_MQTT_HOST"
+MQTT_PORT_ENVIRONMENT_VARIABLE = "SYNTHETIC_FACTORY_MQTT_PORT"
+OPC_UA_HOST_ENVIRONMENT_VARIABLE = "SYNTHETIC_FACTORY_OPC_UA_HOST"
+OPC_UA_PORT_ENVIRONMENT_VARIABLE = "SYNTHETIC_FACTORY_OPC_UA_PORT"
+# Time-series database of generated plants (the one of the learning factory)
+DATABASE_CONNECTION_PROPERTIES = {
+    "iri": IRI_PREFIX + "databases/synthetic_factory_influx_db",
+    "id_short": "synthetic_factory_influx_db",
+    "caption": "Synthetic Factory InfluxDB Connection",
+    "description": "Provides access to timeseries data via InfluxDB",
+    "type": "INFLUX_DB",
+    "host_environment_variable": "INFLUX_DB_HOST",
+    "port_environment_variable": "INFLUX_DB_PORT",
+    "key_environment_variable": "INFLUX_DB_TOKEN",
+    "database": "sindit",
+    "group": "sindit",
+}
+
+# Count of assets per production line. The assets of one line share their work cycle, shifted along the line
+ASSETS_PER_LINE = 10
+
+# Sensor kinds: value type and signal parameters (base, gain with the load of the asset, amplitude and period of
+# slow fluctuations, noise)
+SENSOR_KINDS = {
+    "temperature": (TimeseriesValueTypes.DECIMAL.value, 35, 20, 2, 600, 0.2),
+    "power": (TimeseriesValueTypes.DECIMAL.value, 0.4, 4.5, 0.1, 120, 0.05),
+    "vibration": (TimeseriesValueTypes.DECIMAL.value, 0.05, 1.5, 0.02, 30, 0.08),
+    "position": (TimeseriesValueTypes.INT.value, 0, 800, 0, 60, 2),
+    "pressure": (TimeseriesValueTypes.DECIMAL.value, 5.5, 1.2, 0.1, 300, 0.03),
+    "running": (TimeseriesValueTypes.BOOL.value, 0, 1, 0, 60, 0),
+}
+
+
+@dataclass
+class ConnectionSpecification:
+    iri: str
+    type: str
+    host_environment_variable: str
+    port_environment_variable: str
+
+
+@dataclass
+class SensorSpecification:
+    """
+    Sensor publishing base + gain * load of its asset + amplitude * sin(2 pi t / period + phase) + noise
+    """
+
+    iri: str
+    id_short: str
+    caption: str
+    connection_iri: str
+    connection_topic: str
+    connection_keyword: str | None
+    value_type: str
+    base: float
+    gain: float
+    amplitude: float
+    period_s: float
+    phase: float
+    noise: float
+
+
+@dataclass
+class AssetSpecification:
+    iri: str
+    id_short: str
+    caption: str
+    # Work cycle (load between 0 and 1) all sensors of the asset follow
+    cycle_s: float
+    cycle_offset_s: float
+    sensors: List[SensorSpecification] = field(default_factory=list)
+
+
+def _sensor_parameters(
+    rng: random.Random, kind: str, value_type: str | None = None
+) -> Dict:
+    (
+        kind_value_type,
+        base,
+        gain,
+        amplitude,
+        period_s,
+        noise,
+    ) = SENSOR_KINDS[kind]
+    # Each sensor slightly different
+    return {
+        "value_type": value_type if value_type is not None else kind_value_type,
+        "base": base * rng.uniform(0.8, 1.2),
+        "gain": gain * rng.uniform(0.8, 1.2),
+        "amplitude": amplitude * rng.uniform(0.5, 1.5),
+        "period_s": period_s * rng.uniform(0.7, 1.3),
+        "phase": rng.uniform(0, 6.283),
+        "noise": noise * rng.uniform(0.5, 1.5),
+    }
+
+
+def _kind_for_value_type(rng: random.Random, value_type: str) -> str:
+    if value_type == TimeseriesValueTypes.BOOL.value:
+        return "running"
+    if value_type == TimeseriesValueTypes.INT.value:
+        return "position"
+    return rng.choice(["temperature", "power", "vibration", "pressure"])
+
+
+def _cypher_properties(properties: Dict) -> str:
+    return (
+        "{"
+        + ", ".join(
+            f"{key}: {json.dumps(value)}"
+            for key, value in properties.items()
+            if value is not None
+        )
+        + "}"
+    )
+
+
+@dataclass
+class PlantSpecification:
+    """
+    Assets, their sensors and the runtime connections of a simulated plant. Generated by size, or taken from the
+    knowledge graph. The signal parameters are derived from the seed and the sensor iri, so that a plant always
+    produces the same kind of signals
+    """
+
+    assets: List[AssetSpecification]
+    connections: List[ConnectionSpecification]
+
+    @classmethod
+    def from_size(
+        cls,
+        assets_count: int,
+        sensors_per_asset: int,
+        opc_ua_share: float = 0.3,
+        seed: int = 0,
+    ):
+        """
+        :param opc_ua_share: share of the sensors provided via OPC UA (the others via MQTT)
+        """
+        connections = [
+            ConnectionSpecification(
+                iri=MQTT_CONNECTION_IRI,
+                type=RuntimeConnectionTypes.MQTT.value,
+                host_environment_variable=MQTT_HOST_ENVIRONMENT_VARIABLE,
+                port_environment_variable=MQTT_PORT_ENVIRONMENT_VARIABLE,
+            ),
+            ConnectionSpecification(
+                iri=OPC_UA_CONNECTION_IRI,
+                type=RuntimeConnectionTypes.OPC_UA.value,
+                host_environment_variable=OPC_UA_HOST_ENVIRONMENT_VARIABLE,
+                port_environment_variable=OPC_UA_PORT_ENVIRONMENT_VARIABLE,
+            ),
+        ]
+        kinds = list(SENSOR_KINDS.keys())
+        assets = []
+        line_cycle_s = None
+        for asset_number in range(assets_count):
+            line_rng = random.Random(f"{seed}:line:{asset_number // ASSETS_PER_LINE}")
+            line_cycle_s = line_rng.uniform(20, 60)
+            asset_id = f"asset_{asset_number}"
+            asset = AssetSpecification(
+                iri=f"{IRI_PREFIX}machines/{asset_id}",
+                id_short=asset_id,
+                caption=f"Asset {asset_number}",
+                cycle_s=line_cycle_s,
+                # Workpieces move downstream along the line:
+                cycle_offset_s=-(asset_number % ASSETS_PER_LINE)
+                * line_cycle_s
+                / ASSETS_PER_LINE,
+            )
+            for sensor_number in range(sensors_per_asset):
+                kind = kinds[sensor_number % len(kinds)]
+                sensor_id = f"{asset_id}_{kind}_{sensor_number}"
+                iri = f"{IRI_PREFIX}sensors/{sensor_id}"
+                rng = random.Random(f"{seed}:{iri}")
+                if rng.random() < opc_ua_share:
+                    connection_iri = OPC_UA_CONNECTION_IRI
+                    topic = f"ns={OPC_UA_NAMESPACE_INDEX};s={asset_id}.{sensor_id}"
+                    keyword = None
+                else:
+                    connection_iri = MQTT_CONNECTION_IRI
+                    topic = MQTT_TOPIC_PREFIX + asset_id
+                    keyword = sensor_id
+                asset.sensors.append(
+                    SensorSpecification(
+                        iri=iri,
+                        id_short=sensor_id,
+                        caption=f"{asset.caption} {kind.capitalize()} {sensor_number}",
+                        connection_iri=connection_iri,
+                        connection_topic=topic,
+                        connection_keyword=keyword,
+                        **_sensor_parameters(rng, kind),
+                    )
+                )
+            assets.append(asset)
+
+        return cls(assets=assets, connections=connections)
+
+    @classmethod
+    def from_knowledge_graph(cls, seed: int = 0):
+        """
+        Simulates the assets of the knowledge graph with their MQTT and OPC UA time-series
+        """
+        # Imported here, as only required (and connecting to the graph) for this variant
+        from backend.knowledge_graph.dao.AssetNodesDao import AssetNodesDao
+
+        assets = []
+        connections: Dict[str, ConnectionSpecification] = dict()
+        simulated_types = [
+            RuntimeConnectionTypes.MQTT.value,
+            RuntimeConnectionTypes.OPC_UA.value,
+        ]
+        for asset_number, asset_node in enumerate(
+            AssetNodesDao.instance().get_assets_deep()
+        ):
+            asset_rng = random.Random(f"{seed}:{asset_node.iri}")
+            cycle_s = asset_rng.uniform(20, 60)
+            asset = AssetSpecification(
+                iri=asset_node.iri,
+                id_short=asset_node.id_short,
+                caption=asset_node.caption,
+                cycle_s=cycle_s,
+                cycle_offset_s=asset_rng.uniform(0, cycle_s),
+            )
+            for ts_node in asset_node.timeseries:
+                connection_node = ts_node.runtime_connection
+                if (
+                    connection_node is None
+                    or connection_node.type not in simulated_types
+                ):
+                    continue
+                if (
+                    connection_node.type == RuntimeConnectionTypes.MQTT.value
+                    and not ts_node.connection_keyword
+                ):
+                    # Whole message as value: not simulated
+                    continue
+                connections[connection_node.iri] = ConnectionSpecification(
+                    iri=connection_node.iri,
+                    type=connection_node.type,
+                    host_environment_variable=connection_node.host_environment_variable,
+                    port_environment_variable=connection_node.port_environment_variable,
+                )
+                rng = random.Random(f"{seed}:{ts_node.iri}")
+                asset.sensors.append(
+                    SensorSpecification(
+                        iri=ts_node.iri,
+                        id_short=ts_node.id_short,
+                        caption=ts_node.caption,
+                        connection_iri=connection_node.iri,
+                        connection_topic=ts_node.connection_topic,
+                        connection_keyword=(
+                            ts_node.connection_keyword
+                            if connection_node.type == RuntimeConnectionTypes.MQTT.value
+                            else None
+                        ),
+                        **_sensor_parameters(
+                            rng,
+                            _kind_for_value_type(rng, ts_node.value_type),
+                            value_type=ts_node.value_type,
+                        ),
+                    )
+                )
+            assets.append(asset)
+
+        return cls(assets=assets, connections=list(connections.values()))
+
+    @property
+    def sensors(self) -> List[SensorSpecification]:
+        return [sensor for asset in self.assets for sensor in asset.sensors]
+
+    def to_cypher(self) -> str:
+        """
+        :return: Cypher statement creating the plant as knowledge graph instance (assets, time-series, connections
+        and the time-series database), e.g. to let the backend ingest a generated plant
+        """
+        elements = [
+            f"(database:{NodeTypes.DATABASE_CONNECTION.value} "
+            f"{_cypher_properties(DATABASE_CONNECTION_PROPERTIES)})"
+        ]
+        connection_variables = dict()
+        for connection_number, connection in enumerate(self.connections):
+            connection_variables[connection.iri] = f"connection_{connection_number}"
+            id_short = connection.iri.split("/")[-1]
+            elements.append(
+                f"({connection_variables[connection.iri]}:{NodeTypes.RUNTIME_CONNECTION.value} "
+                + _cypher_properties(
+                    {
+                        "iri": connection.iri,
+                        "id_short": id_short,
+                        "caption": f"Synthetic Factory {connection.type}",
+                        "type": connection.type,
+                        "host_environment_variable": connection.host_environment_variable,
+                        "port_environment_variable": connection.port_environment_variable,
+                    }
+                )
+                + ")"
+            )
+
+        sensor_number = 0
+        for asset_number, asset in enumerate(self.assets):
+            elements.append(
+                f"(asset_{asset_number}:{NodeTypes.ASSET.value} "
+                + _cypher_properties(
+                    {
+                        "iri": asset.iri,
+                        "id_short": asset.id_short,
+                        "caption": asset.caption,
+                    }
+                )
+                + ")"
+            )
+            for sensor in asset.sensors:
+                elements.append(
+                    f"(asset_{asset_number})-[:{RelationshipTypes.HAS_TIMESERIES.value}]->"
+                    f"(sensor_{sensor_number}:{NodeTypes.TIMESERIES_INPUT.value} "
+                    + _cypher_properties(
+                        {
+                            "iri": sensor.iri,
+                            "id_short": sensor.id_short,
+                            "caption": sensor.caption,
+                            "connection_topic": sensor.connection_topic,
+                            "connection_keyword": (
+                                sensor.connection_keyword
+                                if sensor.connection_keyword is not None
+                                else ""
+                            ),
+                            "value_type": sensor.value_type,
+                        }
+                    )
+                    + ")"
+                )
+                elements.append(
+                    f"(sensor_{sensor_number})-[:{RelationshipTypes.RUNTIME_ACCESS.value}]->"
+                    f"({connection_variables[sensor.connection_iri]})"
+                )
+                elements.append(
+                    f"(sensor_{sensor_number})-[:{RelationshipTypes.TIMESERIES_DB_ACCESS.value}]->(database)"
+                )
+                sensor_number += 1
+
+        return "CREATE " + ",\n".join(elements)
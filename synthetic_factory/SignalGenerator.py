@@ -0,0 +1,138 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+from synthetic_factory.AnomalyScript import AnomalyPatterns, ScriptedAnomaly
+from synthetic_factory.PlantSpecification import PlantSpecification
+
+# Steepness of the work cycle (0 to 1): idle and working phases with short transitions
+CYCLE_STEEPNESS = 4
+# Correlation of the noise between consecutive samples
+NOISE_CORRELATION = 0.8
+
+
+class SignalGenerator:
+    """
+    Calculates the values of all sensors of a plant at once (vectorized, so that plants far larger than the
+    learning factory can be simulated). Sensors of one asset are correlated via the work cycle of the asset; assets of
+    one production line via the shifted cycles. Scripted anomalies are added on top
+    """
+
+    def __init__(
+        self,
+        plant: PlantSpecification,
+        anomalies: List[ScriptedAnomaly] | None = None,
+        seed: int = 0,
+    ):
+        self.sensors = plant.sensors
+        self._rng = np.random.default_rng(seed)
+
+        asset_numbers = {asset.iri: number for number, asset in enumerate(plant.assets)}
+        self._cycle_s = np.array([asset.cycle_s for asset in plant.assets])
+        self._cycle_offset_s = np.array(
+            [asset.cycle_offset_s for asset in plant.assets]
+        )
+        self._sensor_asset = np.array(
+            [asset_numbers[asset.iri] for asset in plant.assets for _ in asset.sensors],
+            dtype=int,
+        )
+        self._base = np.array([sensor.base for sensor in self.sensors])
+        self._gain = np.array([sensor.gain for sensor in self.sensors])
+        self._amplitude = np.array([sensor.amplitude for sensor in self.sensors])
+        self._angular_frequency = np.array(
+            [2 * np.pi / sensor.period_s for sensor in self.sensors]
+        )
+        self._phase = np.array([sensor.phase for sensor in self.sensors])
+        self._noise = np.array([sensor.noise for sensor in self.sensors])
+        self._noise_state = np.zeros(len(self.sensors))
+
+        # Sensors affected by each anomaly
+        sensor_numbers = {
+            sensor.iri: number for number, sensor in enumerate(self.sensors)
+        }
+        self._anomalies: List[Tuple[ScriptedAnomaly, np.ndarray]] = []
+        for anomaly in anomalies if anomalies is not None else []:
+            if anomaly.sensor_iris is not None:
+                affected = [sensor_numbers[iri] for iri in anomaly.sensor_iris]
+            else:
+                affected = [
+                    number
+                    for number in range(len(self.sensors))
+                    if self._sensor_asset[number] == asset_numbers[anomaly.asset_iri]
+                ]
+            self._anomalies.append((anomaly, np.array(affected, dtype=int)))
+        # Frozen values of the active stuck anomalies
+        self._stuck_values: Dict[int, Tuple[float, np.ndarray]] = dict()
+
+        self._integer_sensors = np.array(
+            [
+                sensor.value_type == TimeseriesValueTypes.INT.value
+                for sensor in self.sensors
+            ]
+        )
+        self._boolean_sensors = np.array(
+            [
+                sensor.value_type == TimeseriesValueTypes.BOOL.value
+                for sensor in self.sensors
+            ]
+        )
+        self._string_sensors = np.array(
+            [
+                sensor.value_type == TimeseriesValueTypes.STRING.value
+                for sensor in self.sensors
+            ]
+        )
+
+    def values(self, elapsed_s: float) -> np.ndarray:
+        """
+        :param elapsed_s: seconds since the begin of the simulation (calls have to be in chronological order)
+        :return: raw (decimal) values of all sensors, in the order of PlantSpecification.sensors
+        """
+        load = 0.5 + 0.5 * np.tanh(
+            CYCLE_STEEPNESS
+            * np.sin(2 * np.pi * (elapsed_s + self._cycle_offset_s) / self._cycle_s)
+        )
+        self._noise_state = NOISE_CORRELATION * self._noise_state + self._noise * (
+            self._rng.standard_normal(len(self.sensors))
+        )
+        values = (
+            self._base
+            + self._gain * load[self._sensor_asset]
+            + self._amplitude
+            * np.sin(self._angular_frequency * elapsed_s + self._phase)
+            + self._noise_state
+        )
+
+        for anomaly_number, (anomaly, affected) in enumerate(self._anomalies):
+            begin = anomaly.occurrence_begin(elapsed_s)
+            if begin is None:
+                self._stuck_values.pop(anomaly_number, None)
+                continue
+            if anomaly.pattern == AnomalyPatterns.STUCK.value:
+                stuck_begin, stuck_values = self._stuck_values.get(
+                    anomaly_number, (None, None)
+                )
+                if stuck_begin != begin:
+                    stuck_values = values[affected].copy()
+                    self._stuck_values[anomaly_number] = (begin, stuck_values)
+                values[affected] = stuck_values
+            else:
+                values[affected] += self._gain[affected] * anomaly.deviation(
+                    (elapsed_s - begin) / anomaly.duration_s
+                )
+
+        return values
+
+    def typed_values(self, values: np.ndarray) -> List[float | int | bool | str]:
+        """
+        :return: values converted to the value types of the sensors (as published)
+        """
+        typed = values.tolist()
+        for number in np.flatnonzero(self._integer_sensors):
+            typed[number] = int(round(typed[number]))
+        for number in np.flatnonzero(self._boolean_sensors):
+            typed[number] = bool(typed[number] > 0.5)
+        for number in np.flatnonzero(self._string_sensors):
+            typed[number] = f"{typed[number]:.3f}"
+        return typed
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import paho.mqtt.client as mqtt
+from asyncua import Node, Server, ua
+
+from graph_domain.main_digital_twin.RuntimeConnectionNode import RuntimeConnectionTypes
+from graph_domain.main_digital_twin.TimeseriesNode import TimeseriesValueTypes
+from synthetic_factory.AnomalyScript import ScriptedAnomaly
+from synthetic_factory.PlantSpecification import (
+    ConnectionSpecification,
+    PlantSpecification,
+)
+from synthetic_factory.SignalGenerator import SignalGenerator
+from util.environment_and_configuration import (
+    get_environment_variable,
+    get_environment_variable_int,
+)
+from util.log import logger
+
+DEFAULT_MQTT_HOST = "localhost"
+DEFAULT_MQTT_PORT = 1883
+DEFAULT_OPC_UA_PORT = 4840
+NAMESPACE_URI_PREFIX = "urn:sindit:synthetic_factory:"
+TIMESTAMP_JSON_KEYWORD = "ts"
+# Interval of logging the publishing statistics (in s)
+STATISTICS_INTERVAL = 10
+
+OPC_UA_VARIANT_TYPES = {
+    TimeseriesValueTypes.DECIMAL.value: ua.VariantType.Double,
+    TimeseriesValueTypes.INT.value: ua.VariantType.Int64,
+    TimeseriesValueTypes.BOOL.value: ua.VariantType.Boolean,
+    TimeseriesValueTypes.STRING.value: ua.VariantType.String,
+}
+
+
+class SyntheticFactorySimulator:
+    """
+    Publishes the signals of a simulated plant: MQTT messages (one JSON message per topic, the format of the
+    learning factory) to the broker of each MQTT connection, and OPC UA variables via one embedded server per
+    OPC UA connection. Hosts and ports are taken from the environment variables named by the connections
+    """
+
+    def __init__(
+        self,
+        plant: PlantSpecification,
+        anomalies: List[ScriptedAnomaly] | None = None,
+        sampling_interval_ms: int = 1000,
+        seed: int = 0,
+        occurrences_log_path: str | None = None,
+    ):
+        """
+        :param occurrences_log_path: JSON-lines file the begin and end of each injected anomaly occurrence is
+        appended to (ground truth for the annotation detectors)
+        """
+        self.plant = plant
+        self.anomalies = anomalies if anomalies is not None else []
+        self.sampling_interval_ms = sampling_interval_ms
+        self.occurrences_log_path = occurrences_log_path
+        self._generator = SignalGenerator(plant, self.anomalies, seed=seed)
+
+        connection_types = {
+            connection.iri: connection.type for connection in plant.connections
+        }
+        # MQTT: sensor numbers per connection and topic, to publish one message per topic
+        self._mqtt_messages: Dict[str, Dict[str, List[Tuple[int, str]]]] = dict()
+        # OPC UA: sensor numbers per connection
+        self._opcua_sensors: Dict[str, List[int]] = dict()
+        for number, sensor in enumerate(self._generator.sensors):
+            if (
+                connection_types[sensor.connection_iri]
+                == RuntimeConnectionTypes.MQTT.value
+            ):
+                self._mqtt_messages.setdefault(
+                    sensor.connection_iri, dict()
+                ).setdefault(sensor.connection_topic, []).append(
+                    (number, sensor.connection_keyword)
+                )
+            else:
+                self._opcua_sensors.setdefault(sensor.connection_iri, []).append(number)
+
+        self._mqtt_clients: Dict[str, mqtt.Client] = dict()
+        self._opcua_servers: Dict[str, Server] = dict()
+        # OPC UA nodes per connection, in the order of the sensor numbers
+        self._opcua_nodes: Dict[str, List[Node]] = dict()
+        self._logged_occurrences: Dict[int, float] = dict()
+
+    def run(self, duration_s: float | None = None):
+        """
+        Publishes until the duration has passed (blocking)
+        :param duration_s: None: until interrupted
+        """
+        logging.getLogger("asyncua").setLevel(logging.WARNING)
+        asyncio.run(self._run(duration_s))
+
+    def _connection(self, iri: str) -> ConnectionSpecification:
+        return next(
+            connection for connection in self.plant.connections if connection.iri == iri
+        )
+
+    def _connect_mqtt(self):
+        for connection_iri in self._mqtt_messages:
+            connection = self._connection(connection_iri)
+            host = get_environment_variable(
+                connection.host_environment_variable,
+                optional=True,
+                default=DEFAULT_MQTT_HOST,
+            )
+            port = get_environment_variable_int(
+                connection.port_environment_variable,
+                optional=True,
+                default=DEFAULT_MQTT_PORT,
+            )
+            client = mqtt.Client()
+            client.connect(host, port)
+            client.loop_start()
+            self._mqtt_clients[connection_iri] = client
+            logger.info(
+                f"Publishing {len(self._mqtt_messages[connection_iri])} MQTT topics to {host}:{port}"
+            )
+
+    async def _start_opcua_servers(self):
+        for connection_iri, sensor_numbers in self._opcua_sensors.items():
+            connection = self._connection(connection_iri)
+            port = get_environment_variable_int(
+                connection.port_environment_variable,
+                optional=True,
+                default=DEFAULT_OPC_UA_PORT,
+            )
+            server = Server()
+            await server.init()
+            server.set_endpoint(f"opc.tcp://0.0.0.0:{port}/")
+
+            node_ids = [
+                ua.NodeId.from_string(self._generator.sensors[number].connection_topic)
+                for number in sensor_numbers
+            ]
+            # Namespaces up to the ones used by the node-ids of the graph
+            namespace_count = len(await server.get_namespace_array())
+            for namespace_index in range(
+                namespace_count,
+                max([node_id.NamespaceIndex for node_id in node_ids] + [1]) + 1,
+            ):
+                await server.register_namespace(
+                    f"{NAMESPACE_URI_PREFIX}{namespace_index}"
+                )
+
+            asset_per_sensor = {
+                sensor.iri: asset
+                for asset in self.plant.assets
+                for sensor in asset.sensors
+            }
+            asset_objects = dict()
+            nodes = []
+            for number, node_id in zip(sensor_numbers, node_ids):
+                sensor = self._generator.sensors[number]
+                asset = asset_per_sensor[sensor.iri]
+                if asset.iri not in asset_objects:
+                    asset_objects[asset.iri] = await server.nodes.objects.add_object(
+                        node_id.NamespaceIndex, asset.id_short
+                    )
+                variant_type = OPC_UA_VARIANT_TYPES[sensor.value_type]
+                nodes.append(
+                    await asset_objects[asset.iri].add_variable(
+                        node_id,
+                        sensor.id_short,
+                        ua.get_default_value(variant_type),
+                        varianttype=variant_type,
+                    )
+                )
+
+            await server.start()
+            self._opcua_servers[connection_iri] = server
+            self._opcua_nodes[connection_iri] = nodes
+            logger.info(f"Providing {len(nodes)} OPC UA variables on port {port}")
+
+    async def _run(self, duration_s: float | None):
+        self._connect_mqtt()
+        await self._start_opcua_servers()
+        logger.info(
+            f"Simulating {len(self.plant.assets)} assets with {len(self._generator.sensors)} sensors "
+            f"every {self.sampling_interval_ms} ms"
+        )
+
+        interval_s = self.sampling_interval_ms / 1000
+        begin = time.monotonic()
+        begin_time = datetime.utcnow()
+        next_tick = 0
+        published = 0
+        skipped_ticks = 0
+        statistics_time = begin
+        try:
+            while duration_s is None or next_tick * interval_s < duration_s:
+                elapsed_s = next_tick * interval_s
+                await asyncio.sleep(max(0.0, begin + elapsed_s - time.monotonic()))
+
+                reading_time = begin_time + timedelta(seconds=elapsed_s)
+                values = self._generator.typed_values(self._generator.values(elapsed_s))
+                published += self._publish_mqtt(reading_time, values)
+                published += await self._write_opcua(reading_time, values)
+                self._log_occurrences(elapsed_s, begin_time)
+
+                # Skip the ticks missed while publishing (e.g. plant too large for the interval)
+                next_tick += 1
+                due_tick = int((time.monotonic() - begin) / interval_s)
+                if due_tick > next_tick:
+                    skipped_ticks += due_tick - next_tick
+                    next_tick = due_tick
+
+                now = time.monotonic()
+                if now - statistics_time >= STATISTICS_INTERVAL:
+                    logger.info(
+                        f"Published {published / (now - statistics_time):.0f} readings/s, "
+                        f"{skipped_ticks} ticks skipped"
+                    )
+                    published = 0
+                    skipped_ticks = 0
+                    statistics_time = now
+        finally:
+            for client in self._mqtt_clients.values():
+                client.loop_stop()
+                client.disconnect()
+            for server in self._opcua_servers.values():
+                await server.stop()
+
+    def _publish_mqtt(self, reading_time: datetime, values: List) -> int:
+        timestamp = reading_time.isoformat(timespec="milliseconds") + "Z"
+        published = 0
+        for connection_iri, messages in self._mqtt_messages.items():
+            client = self._mqtt_clients[connection_iri]
+            for topic, sensors in messages.items():
+                message = {keyword: values[number] for number, keyword in sensors}
+                message[TIMESTAMP_JSON_KEYWORD] = timestamp
+                client.publish(topic, json.dumps(message))
+                published += len(sensors)
+        return published
+
+    async def _write_opcua(self, reading_time: datetime, values: List) -> int:
+        published = 0
+        for connection_iri, sensor_numbers in self._opcua_sensors.items():
+            server = self._opcua_servers[connection_iri]
+            for node, number in zip(self._opcua_nodes[connection_iri], sensor_numbers):
+                await server.write_attribute_value(
+                    node.nodeid,
+                    ua.DataValue(
+                        Value=ua.Variant(
+                            values[number],
+                            OPC_UA_VARIANT_TYPES[
+                                self._generator.sensors[number].value_type
+                            ],
+                        ),
+                        SourceTimestamp=reading_time,
+                        ServerTimestamp=reading_time,
+                    ),
+                )
+            published += len(sensor_numbers)
+        return published
+
+    def _log_occurrences(self, elapsed_s: float, begin_time: datetime):
+        for anomaly_number, anomaly in enumerate(self.anomalies):
+            occurrence_begin = anomaly.occurrence_begin(elapsed_s)
+            if (
+                occurrence_begin is None
+                or self._logged_occurrences.get(anomaly_number) == occurrence_begin
+            ):
+                continue
+            self._logged_occurrences[anomaly_number] = occurrence_begin
+            occurrence = {
+                "asset_iri": anomaly.asset_iri,
+                "pattern": anomaly.pattern,
+                "begin": (begin_time + timedelta(seconds=occurrence_begin)).isoformat(),
+                "end": (
+                    begin_time
+                    + timedelta(seconds=occurrence_begin + anomaly.duration_s)
+                ).isoformat(),
+            }
+            logger.info(f"Injecting anomaly: {occurrence}")
+            if self.occurrences_log_path is not None:
+                with open(
+                    self.occurrences_log_path, "a", encoding="utf-8"
+                ) as occurrences_file:
+                    occurrences_file.write(json.dumps(occurrence) + "\n")
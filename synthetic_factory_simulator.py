@@ -0,0 +1,90 @@
+"""
+Synthetic factory simulator: publishes correlated signals of a generated plant (or of the assets in the knowledge
+graph) via MQTT and embedded OPC UA servers, with scripted anomalies for the annotation detectors.
+
+Examples:
+Plant 10x the size of the learning factory, exported for the backend first:
+    python synthetic_factory_simulator.py --assets 60 --sensors-per-asset 8 --export-cypher synthetic_factory.cypher
+    python synthetic_factory_simulator.py --assets 60 --sensors-per-asset 8 --anomalies anomalies.json
+Simulating the instance in the knowledge graph (instead of the real factory):
+    python synthetic_factory_simulator.py --from-graph --sampling-interval-ms 500
+
+Hosts and ports are taken from the environment variables named by the runtime connections
+(SYNTHETIC_FACTORY_MQTT_HOST / _PORT and SYNTHETIC_FACTORY_OPC_UA_PORT for generated plants).
+"""
+
+import argparse
+
+from synthetic_factory.AnomalyScript import load_anomaly_script
+from synthetic_factory.PlantSpecification import PlantSpecification
+from synthetic_factory.SyntheticFactorySimulator import SyntheticFactorySimulator
+from util.log import logger
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(description="Synthetic factory simulator")
+    parser.add_argument("--assets", type=int, default=6)
+    parser.add_argument("--sensors-per-asset", type=int, default=8)
+    parser.add_argument(
+        "--opc-ua-share",
+        type=float,
+        default=0.3,
+        help="Share of the generated sensors provided via OPC UA (the others via MQTT)",
+    )
+    parser.add_argument(
+        "--from-graph",
+        action="store_true",
+        help="Simulate the assets of the knowledge graph instead of generating a plant",
+    )
+    parser.add_argument("--anomalies", help="JSON file with the anomaly script")
+    parser.add_argument(
+        "--occurrences-log",
+        help="JSON-lines file to append the injected anomaly occurrences to",
+    )
+    parser.add_argument("--sampling-interval-ms", type=int, default=1000)
+    parser.add_argument(
+        "--duration", type=float, help="Seconds to run (default: endless)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--export-cypher",
+        help="Write the plant as knowledge graph instance (cypher) to the given file and exit",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_arguments()
+
+    if args.from_graph:
+        plant = PlantSpecification.from_knowledge_graph(seed=args.seed)
+    else:
+        plant = PlantSpecification.from_size(
+            assets_count=args.assets,
+            sensors_per_asset=args.sensors_per_asset,
+            opc_ua_share=args.opc_ua_share,
+            seed=args.seed,
+        )
+
+    if args.export_cypher is not None:
+        with open(args.export_cypher, "w", encoding="utf-8") as cypher_file:
+            cypher_file.write(plant.to_cypher())
+        logger.info(
+            f"Exported {len(plant.assets)} assets with {len(plant.sensors)} sensors to {args.export_cypher}"
+        )
+        return
+
+    anomalies = (
+        load_anomaly_script(args.anomalies, plant) if args.anomalies is not None else []
+    )
+    SyntheticFactorySimulator(
+        plant=plant,
+        anomalies=anomalies,
+        sampling_interval_ms=args.sampling_interval_ms,
+        seed=args.seed,
+        occurrences_log_path=args.occurrences_log,
+    ).run(duration_s=args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Compact columnar binary format for time-series readings, used between the API and the frontend.
+
+Layout (little-endian):
+    header:  magic "SDTS", version (uint8), value type (uint8), 2 bytes padding, count (uint64)
+    times:   count x int64 (nanoseconds since epoch, UTC)
+    values:  float64 / int64: count x 8 bytes, bool: count x uint8,
+             string: (count + 1) x int64 offsets followed by the UTF-8 encoded strings
+
+All sections start at multiples of 8 bytes, so that they can be decoded without copying.
+
+Streams of chunks consist of frames: frame length (uint64) followed by one encoded dataframe.
+"""
+
+import struct
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+MEDIA_TYPE = "application/vnd.sindit.timeseries"
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+# Response header with the count of readings in the requested range (before downsampling), if requested
+READINGS_COUNT_HEADER = "X-Readings-Count"
+
+MAGIC = b"SDTS"
+VERSION = 1
+HEADER = struct.Struct("<4sBBxxQ")
+FRAME_HEADER = struct.Struct("<Q")
+
+VALUE_TYPE_FLOAT = 0
+VALUE_TYPE_INT = 1
+VALUE_TYPE_BOOL = 2
+VALUE_TYPE_STRING = 3
+
+
+def wants_binary(response_format: str | None, accept_header: str | None) -> bool:
+    """
+    Whether the binary format has been requested by a query parameter or the accept header
+    """
+    if response_format is not None:
+        return response_format == FORMAT_BINARY
+    return accept_header is not None and MEDIA_TYPE in accept_header
+
+
+def encode_dataframe(df: pd.DataFrame) -> bytes:
+    """
+    Encodes a dataframe with the columns "time" and "value"
+    :raise ValueError: if the values have an unsupported type (e.g. mixed types)
+    """
+    count = len(df)
+    if count == 0:
+        return HEADER.pack(MAGIC, VERSION, VALUE_TYPE_FLOAT, 0)
+
+    times = (
+        pd.to_datetime(df["time"], utc=True)
+        .to_numpy(dtype="datetime64[ns]")
+        .astype("<i8")
+    )
+    values = df["value"].to_numpy()
+
+    if values.dtype == np.bool_:
+        value_type = VALUE_TYPE_BOOL
+        values_bytes = values.astype(np.uint8).tobytes()
+        # Align the end to 8 bytes:
+        values_bytes += b"\0" * (-len(values_bytes) % 8)
+    elif np.issubdtype(values.dtype, np.integer):
+        value_type = VALUE_TYPE_INT
+        values_bytes = values.astype("<i8").tobytes()
+    elif np.issubdtype(values.dtype, np.floating):
+        value_type = VALUE_TYPE_FLOAT
+        values_bytes = values.astype("<f8").tobytes()
+    elif all(isinstance(value, str) for value in values):
+        value_type = VALUE_TYPE_STRING
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(count + 1, dtype="<i8")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        values_bytes = offsets.tobytes() + b"".join(encoded)
+    else:
+        raise ValueError(
+            f"Unsupported value type for the binary format: {values.dtype}"
+        )
+
+    return (
+        HEADER.pack(MAGIC, VERSION, value_type, count) + times.tobytes() + values_bytes
+    )
+
+
+def decode_dataframe(data: bytes) -> pd.DataFrame:
+    """
+    Decodes the binary format to a dataframe with the columns "time" (UTC) and "value".
+    Numeric values are not copied (read-only arrays backed by the given buffer).
+    :raise ValueError: if the data is not in the binary format
+    """
+    magic, version, value_type, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a time-series in the binary wire format")
+
+    offset = HEADER.size
+    times = np.frombuffer(data, dtype="<i8", count=count, offset=offset)
+    offset += count * 8
+
+    if value_type == VALUE_TYPE_FLOAT:
+        values = np.frombuffer(data, dtype="<f8", count=count, offset=offset)
+    elif value_type == VALUE_TYPE_INT:
+        values = np.frombuffer(data, dtype="<i8", count=count, offset=offset)
+    elif value_type == VALUE_TYPE_BOOL:
+        values = np.frombuffer(data, dtype=np.bool_, count=count, offset=offset)
+    elif value_type == VALUE_TYPE_STRING:
+        offsets = np.frombuffer(data, dtype="<i8", count=count + 1, offset=offset)
+        strings_start = offset + (count + 1) * 8
+        values = np.array(
+            [
+                data[strings_start + begin : strings_start + end].decode("utf-8")
+                for begin, end in zip(offsets[:-1], offsets[1:])
+            ],
+            dtype=object,
+        )
+    else:
+        raise ValueError(f"Unknown value type {value_type}")
+
+    return pd.DataFrame(
+        {
+            "time": pd.DatetimeIndex(times.view("datetime64[ns]"), tz="UTC"),
+            "value": values,
+        }
+    )
+
+
+def encode_stream_frame(df: pd.DataFrame) -> bytes:
+    """Encodes one chunk of a stream"""
+    encoded = encode_dataframe(df)
+    return FRAME_HEADER.pack(len(encoded)) + encoded
+
+
+def decode_stream(read: Callable[[int], bytes]) -> Iterator[pd.DataFrame]:
+    """
+    Decodes a stream of frames
+    :param read: Function reading up to the given count of bytes (e.g. file.read). Returns b"" at the end
+    :raise ValueError: if the stream ends within a frame
+    """
+
+    def read_exactly(size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            part = read(size - len(data))
+            if not part:
+                break
+            data += part
+        return bytes(data)
+
+    while True:
+        frame_header = read_exactly(FRAME_HEADER.size)
+        if len(frame_header) == 0:
+            return
+        if len(frame_header) < FRAME_HEADER.size:
+            raise ValueError("Time-series stream ended within a frame")
+        (frame_size,) = FRAME_HEADER.unpack(frame_header)
+        frame = read_exactly(frame_size)
+        if len(frame) < frame_size:
+            raise ValueError("Time-series stream ended within a frame")
+        yield decode_dataframe(frame)